@@ -1,2 +1,50 @@
+from flask import Flask
 from .routes import mod
 from . import utils
+from .matching import BatchMatcher
+from .models import User, UserFeed
+from .utils.Outbox import start_workers
+from .utils.LocationBuffer import LocationFlusher
+
+
+def create_app():
+    """
+    application factory, called once in every worker process
+    so that connections are opened after fork
+    :returns: flask application
+    """
+    utils.init_connections()
+    app = Flask(__name__)
+    app.register_blueprint(mod)
+    return app
+
+
+def start_services():
+    """
+    start the background matcher, outbox workers and
+    location flusher of this process, they use mongoengine
+    so it is connected first whichever app the process serves
+    :returns: list of started threads
+    """
+    utils.init_connections()
+    threads = []
+    matching = utils.config.get('matching', {})
+    interval = matching.get('batch_interval')
+    if interval:
+        matcher = BatchMatcher(interval=interval, lock=utils.redis,
+                               lock_ttl=matching.get('lock_ttl'),
+                               live=matching.get('live_index', False))
+        matcher.start()
+        threads.append(matcher)
+
+    threads += start_workers(utils.outbox, {"sms": utils.sms_job},
+                             count=utils.config.get('outbox', {}).get('workers', 4))
+    threads += start_workers(utils.feed_outbox, {"refresh": UserFeed.refresh_job},
+                             on_fail=UserFeed.refresh_failed,
+                             count=utils.config.get('feeds', {}).get('workers', 2))
+
+    flusher = LocationFlusher(utils.location_buffer, User.write_locations,
+                              **utils.config.get('locations', {}))
+    flusher.start()
+    threads.append(flusher)
+    return threads
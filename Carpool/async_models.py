@@ -0,0 +1,235 @@
+"""
+asyncio counterparts of the queries in models.py, used by async_routes.py
+
+documents are read with motor and built with _from_son, the reads and the
+json shared with the sync app are the plans of models.py, run here with
+motor, references are never dereferenced lazily
+"""
+import time as _time
+
+from pymongo.errors import BulkWriteError
+
+from .models import User, RideRequest, Ride, RideMatching, UserFeed, Load, Find, _ref, CANDIDATE_OVERFETCH, \
+    page_filter
+from .utils import async_clients, outbox, feed_outbox, find_locations_async, user_cache, location_buffer, \
+    request_points
+
+
+async def _find_one(document, query):
+    doc = await async_clients.collection(document).find_one(query)
+    return document._from_son(doc) if doc else None
+
+
+async def _find(document, query, sort=None, limit=None):
+    cursor = async_clients.collection(document).find(query)
+    if sort:
+        cursor = cursor.sort(sort)
+    if limit:
+        cursor = cursor.limit(limit)
+    return [document._from_son(doc) async for doc in cursor]
+
+
+async def _load(document, ids):
+    """ load documents by id with a single $in query """
+    docs = await _find(document, {'_id': {'$in': list(set(ids))}})
+    return {doc.pk: doc for doc in docs}
+
+
+async def _execute(operation):
+    if isinstance(operation, Load):
+        return await _load(operation.document, operation.ids)
+    if isinstance(operation, Find):
+        return await _find(operation.document, operation.query, limit=operation.limit)
+    return await find_locations_async(operation.queries)
+
+
+async def run(plan):
+    """ same as models.run with motor """
+    result = None
+    while True:
+        try:
+            operation = plan.send(result)
+        except StopIteration as e:
+            return e.value
+        result = await _execute(operation)
+
+
+async def _insert(document):
+    """ :returns: the inserted document, as it would be read back """
+    document.validate()
+    son = document.to_mongo()
+    await async_clients.collection(type(document)).insert_one(son)
+    return type(document)._from_son(son)
+
+
+async def find_user(email):
+    """ same as User.find_with_email """
+    key = user_cache.key(email.lower())
+    son = await user_cache.get_async(key, async_clients.redis)
+    if son is not None:
+        return User._from_son(son)
+
+    user = await _find_one(User, {'email': email.lower()})
+    if user:
+        await user_cache.set_async(key, user.cache_entry(), async_clients.redis)
+    return user
+
+
+async def register_user(email, first_name, last_name, profile_picture, phone_number):
+    user = await _insert(User(email=email.lower(), first_name=first_name,
+                              last_name=last_name, profile_picture=profile_picture,
+                              phone_number=phone_number))
+    await user_cache.delete_async(user_cache.key(user.email), async_clients.redis)
+    return user
+
+
+async def buffer_locations(pings):
+    """
+    same as LocationBuffer.push_many for (user, lon, lat, at) pings
+    :returns: number of buffered pings
+    """
+    return await location_buffer.push_many_async(
+        async_clients.redis, ((user.uid, user.email, lon, lat, at) for user, lon, lat, at in pings))
+
+
+async def send_text(user, text_message):
+    """ queue a text message, delivered by the outbox workers """
+    return await outbox.enqueue_async(
+        async_clients.redis, "sms", {"to": f"+1{user.phone_number}", "body": text_message})
+
+
+async def create_request(by_user, time, before_flex, after_flex,
+                         location_lon, location_lat, dest_lon, dest_lat):
+    req = await _insert(RideRequest(
+        by_user=by_user, location=[location_lon, location_lat],
+        destination=[dest_lon, dest_lat], at_time=time, before_flex=before_flex,
+        after_flex=after_flex, start=time - before_flex * 60, end=time + after_flex * 60))
+    await request_points.add_many_async(async_clients.redis, [req.index_entry()])
+    return req
+
+
+async def sync_request_index():
+    """ same as RideRequest.sync_index """
+    requests = await _find(RideRequest, {'end': {'$gte': _time.time()}})
+    entries = [req.index_entry() for req in requests]
+    await request_points.add_many_async(async_clients.redis, entries)
+    return len(entries)
+
+
+async def find_candidates(lon, lat, radius, start, end, limit=50):
+    """ same as RideRequest.find_candidates """
+    ranked = await request_points.query_async(async_clients.redis, lon, lat, radius,
+                                              start, end, CANDIDATE_OVERFETCH * limit)
+    return await run(RideRequest.candidates_plan(ranked, start, end, limit))
+
+
+async def create_ride(by_user, start, end, location_lon, location_lat, dest_lon, dest_lat):
+    ride = await _insert(Ride(by_user=by_user, start=start, end=end,
+                              location=[location_lon, location_lat],
+                              destination=[dest_lon, dest_lat]))
+    await schedule_refresh(ride)
+    return ride
+
+
+async def find_ride(uid):
+    return await _find_one(Ride, {'_id': uid})
+
+
+async def bulk_create_matches(matches):
+    """ same as RideMatching.bulk_create """
+    if not matches:
+        return []
+
+    try:
+        upserted = (await async_clients.collection(RideMatching).bulk_write(
+            RideMatching.upserts(matches), ordered=False)).upserted_ids
+    except BulkWriteError as e:
+        upserted = RideMatching.duplicate_upserts(e)
+    return [matches[i] for i in upserted]
+
+
+async def notify_matched(matches, driver):
+    """ text the rider of every new match """
+    riders = await _load(User, [_ref(match, 'rider') for match in matches])
+    for match in matches:
+        rider = riders[_ref(match, 'rider')]
+        await send_text(
+            rider, f"""{rider.first_name}, we have matched your ride with {driver.first_name}, please confirm your pool""")
+
+
+async def find_match(ride, rider):
+    return await _find_one(RideMatching, {'ride': ride.pk, 'rider': rider.pk})
+
+
+async def set_match_status(match, status):
+    match.status = status.value
+    await async_clients.collection(RideMatching).update_one(
+        {'_id': match.pk}, {'$set': {'status': match.status}})
+
+
+async def delete_match(match):
+    await async_clients.collection(RideMatching).delete_one({'_id': match.pk})
+
+
+async def matches_json(matches):
+    """ same as RideMatching.bulk_json for a list of matches """
+    return await run(RideMatching.json_plan(matches))
+
+
+# the document, query and json plan of each paginated list
+def user_requests(user):
+    return RideRequest, {'by_user': user.pk}, RideRequest.json_plan
+
+
+def user_rides(user):
+    return Ride, {'by_user': user.pk}, Ride.json_plan
+
+
+def ride_matches(ride):
+    return RideMatching, RideMatching.query(ride=ride), RideMatching.json_plan
+
+
+def rider_matches(user):
+    return RideMatching, {'rider': user.pk}, RideMatching.json_plan
+
+
+def driver_matches(user):
+    return RideMatching, {'driver': user.pk}, RideMatching.json_plan
+
+
+async def page(document, query, serialize, limit=None, after=None):
+    """
+    one keyset page ordered by the page_key of the document then uid,
+    see routes.paginate
+    :raises ValueError: if the after cursor is malformed
+    """
+    if after:
+        query = {'$and': [query, page_filter(document, after)]}
+    sort = [(document.page_key, 1), ('_id', 1)]
+    return await run(serialize(await _find(document, query, sort=sort, limit=limit)))
+
+
+async def get_feed(user):
+    """ same as UserFeed.get """
+    feed = UserFeed.parse(await async_clients.redis.hgetall(UserFeed._key(user)))
+    return feed if feed is not None else await rebuild_feed(user)
+
+
+async def rebuild_feed(user):
+    """ same as UserFeed.rebuild """
+    mapping = await run(UserFeed.rebuild_plan(user))
+    pipe = async_clients.redis.pipeline()
+    pipe.delete(UserFeed._key(user))
+    pipe.hset(UserFeed._key(user), mapping=mapping)
+    await pipe.execute()
+    return UserFeed.parse(mapping)
+
+
+async def schedule_refresh(ride):
+    """ same as UserFeed.schedule_refresh, the feed workers do the refresh """
+    await feed_outbox.enqueue_async(async_clients.redis, "refresh", {"ride": ride.uid})
+
+
+async def remove_ride(user, ride):
+    """ same as UserFeed.remove_ride """
+    await async_clients.redis.hdel(UserFeed._key(user), ride.uid)
@@ -0,0 +1,327 @@
+from quart import Quart, Blueprint, jsonify, abort, request, Response
+from pymongo.errors import DuplicateKeyError
+from .models import RideRequest, RideMatching, RideMatchingStatus, page_cursor, page_filter
+from .routes import STREAM_CHUNK_SIZE, page_args
+from .utils import async_clients, init_connections, find_location_async, find_business_async
+from . import async_models as db
+import json
+
+# same urls and json as the routes blueprint, served by an asgi server
+async_mod = Blueprint("async_routes", __name__)
+
+
+def create_async_app():
+    """
+    asyncio application factory, the clients are opened by each
+    worker once its event loop is running
+    :returns: quart application
+    """
+    app = Quart(__name__)
+    app.register_blueprint(async_mod)
+    return app
+
+
+@async_mod.before_app_serving
+async def open_clients():
+    # the background services of the worker write through mongoengine
+    init_connections()
+    await async_clients.open()
+    await db.sync_request_index()
+
+
+@async_mod.after_app_serving
+async def close_clients():
+    await async_clients.close()
+
+
+async def paginate(document, query, serialize):
+    """ same as routes.paginate """
+    try:
+        limit, after = page_args(request.args)
+        if after:
+            page_filter(document, after)
+    except ValueError as e:
+        return abort(400, str(e))
+
+    if request.args.get('stream'):
+        return Response(_stream(document, query, serialize, limit, after),
+                        mimetype='application/json')
+
+    items = await db.page(document, query, serialize, limit, after)
+    response = jsonify(items)
+    if len(items) == limit:
+        response.headers['X-Next-Cursor'] = page_cursor(document, items[-1])
+    return response
+
+
+async def _stream(document, query, serialize, limit, after):
+    yield '['
+    sent = 0
+    while not limit or sent < limit:
+        size = min(STREAM_CHUNK_SIZE, limit - sent) if limit else STREAM_CHUNK_SIZE
+        items = await db.page(document, query, serialize, size, after)
+        for item in items:
+            yield (',' if sent else '') + json.dumps(item)
+            sent += 1
+
+        if len(items) < size:
+            break
+        after = page_cursor(document, items[-1])
+    yield ']'
+
+
+@async_mod.route('/user/<email>', methods=['GET'])
+async def get_user_info(email):
+
+    user = await db.find_user(email)
+    if not user:
+        return abort(404, "user not found")
+
+    return jsonify(user.make_json())
+
+
+@async_mod.route("/user", methods=['POST'])
+async def register_user():
+
+    data = await request.get_json()
+    try:
+        user = await db.register_user(email=data.get('email'), first_name=data.get('first_name'),
+                                      last_name=data.get('last_name'),
+                                      phone_number=data.get('phone_number'),
+                                      profile_picture=data.get('profile_picture'))
+    except DuplicateKeyError:
+        return abort(409, "email already registered")
+
+    try:
+        await db.send_text(user, f"Hey {user.first_name.capitalize()}, thank you for registering on InstaPool!")
+    except Exception as e:
+        print(e)
+
+    return jsonify(user.make_json())
+
+
+@async_mod.route('/user/<email>/location', methods=['UPDATE'])
+async def update_user_location(email):
+
+    user = await db.find_user(email)
+    if not user:
+        return abort(404, "user not found")
+
+    data = await request.get_json()
+    longitude = data['location']['longitude']
+    latitude = data['location']['latitude']
+
+    await db.buffer_locations([(user, longitude, latitude, data.get('time'))])
+    user.location = [longitude, latitude]
+
+    return jsonify(user.make_json())
+
+
+@async_mod.route('/location/batch', methods=['POST'])
+async def update_locations():
+
+    pings = (await request.get_json()).get('pings', [])
+    users = {email: await db.find_user(email) for email in {ping['email'] for ping in pings}}
+
+    accepted = await db.buffer_locations(
+        (users[ping['email']], ping['location']['longitude'],
+         ping['location']['latitude'], ping.get('time'))
+        for ping in pings if users[ping['email']])
+
+    return jsonify({"accepted": accepted,
+                    "unknown": [email for email, user in users.items() if not user]})
+
+
+@async_mod.route('/user/<email>/ride/request', methods=['POST'])
+async def request_new_ride(email):
+
+    user = await db.find_user(email)
+    data = await request.get_json()
+
+    if not user:
+        return abort(404, "user not found")
+
+    req = await db.create_request(
+        by_user=user, time=data.get('time'), before_flex=data.get('before_flex'),
+        after_flex=data.get('after_flex'),
+        location_lon=data['location']['longitude'], location_lat=data['location']['latitude'],
+        dest_lon=data['destination']['longitude'], dest_lat=data['destination']['latitude'])
+
+    return jsonify(req.make_json(user=user))
+
+
+@async_mod.route('/user/<email>/ride/request', methods=['GET'])
+async def get_ride_requests(email):
+
+    user = await db.find_user(email)
+    if not user:
+        return abort(404, "user not found")
+
+    return await paginate(*db.user_requests(user))
+
+
+@async_mod.route('/user/<email>/ride', methods=['POST'])
+async def post_new_ride(email):
+
+    user = await db.find_user(email)
+    if not user:
+        return abort(404, "user not found")
+
+    data = json.loads((await request.get_data()).decode())
+
+    ride = await db.create_ride(
+        by_user=user, start=data['start'], end=data['end'],
+        location_lon=data['location']['longitude'], location_lat=data['location']['latitude'],
+        dest_lon=data['destination']['longitude'], dest_lat=data['destination']['latitude'])
+
+    return jsonify(ride.make_json(user=user))
+
+
+@async_mod.route('/user/<email>/ride', methods=['GET'])
+async def get_user_rides(email):
+
+    user = await db.find_user(email)
+    if not user:
+        return abort(404, "user not found")
+
+    return await paginate(*db.user_rides(user))
+
+
+@async_mod.route('/user/<email>/ride/<ride_id>/match', methods=['POST'])
+async def start_matching_ride(email, ride_id):
+
+    driver = await db.find_user(email)
+    if not driver:
+        return abort(404, "driver not found")
+
+    ride = await db.find_ride(ride_id)
+    matched_requests = await db.find_candidates(
+        lon=ride.location['coordinates'][0], lat=ride.location['coordinates'][1],
+        radius=50 * 1000, start=ride.start, end=ride.end)
+
+    new_matches = await db.bulk_create_matches([
+        RideMatching(driver=ride._data['by_user'], rider=req._data['by_user'],
+                     ride=ride, request=req, cost=cost)
+        for req, cost in zip(matched_requests, RideRequest.calculate_costs(matched_requests))])
+
+    await db.notify_matched(new_matches, driver)
+
+    document, query, serialize = db.ride_matches(ride)
+    return jsonify(await db.page(document, query, serialize))
+
+
+@async_mod.route('/user/<email>/ride/<ride_id>/match', methods=['GET'])
+async def get_matching_rides(email, ride_id):
+
+    user = await db.find_user(email)
+    if not user:
+        return abort(404, "user not found")
+
+    ride = await db.find_ride(ride_id)
+    return await paginate(*db.ride_matches(ride))
+
+
+@async_mod.route('/user/<email>/ride/rider/matches', methods=['GET'])
+async def get_rider_match_offers(email):
+
+    user = await db.find_user(email)
+    if not user:
+        return abort(404, "user not found")
+
+    return await paginate(*db.rider_matches(user))
+
+
+@async_mod.route('/user/<email>/ride/driver/matches', methods=['GET'])
+async def get_driver_match_offers(email):
+
+    user = await db.find_user(email)
+    if not user:
+        return abort(404, "user not found")
+
+    return await paginate(*db.driver_matches(user))
+
+
+@async_mod.route('/user/<email>/ride/<ride_id>/match/accept', methods=['POST'])
+async def accept_ride_match(email, ride_id):
+
+    user = await db.find_user(email)
+    if not user:
+        return abort(404, "user not found")
+
+    ride = await db.find_ride(ride_id)
+    ride_match = await db.find_match(ride, user)
+    if not ride_match:
+        return abort(404)
+
+    await db.set_match_status(ride_match, RideMatchingStatus.accepted)
+    await db.schedule_refresh(ride)
+    return jsonify((await db.matches_json([ride_match]))[0])
+
+
+@async_mod.route('/user/<email>/ride/<ride_id>/match/reject', methods=['POST'])
+async def reject_ride_match(email, ride_id):
+
+    user = await db.find_user(email)
+    if not user:
+        return abort(404, "user not found")
+
+    ride = await db.find_ride(ride_id)
+    ride_match = await db.find_match(ride, user)
+    if not ride_match:
+        return abort(404)
+
+    await db.set_match_status(ride_match, RideMatchingStatus.rejected)
+    await db.remove_ride(user, ride)
+    await db.schedule_refresh(ride)
+    result = (await db.matches_json([ride_match]))[0]
+    await db.delete_match(ride_match)
+    return jsonify(result)
+
+
+@async_mod.route('/user/<email>/feed', methods=['GET'])
+async def get_user_feed(email):
+
+    user = await db.find_user(email)
+    if not user:
+        return abort(404, "user not found")
+
+    if request.args.get('rebuild'):
+        return jsonify(await db.rebuild_feed(user))
+
+    return jsonify(await db.get_feed(user))
+
+
+@async_mod.route('/geo/address', methods=['GET'])
+async def get_address():
+
+    address = (await request.get_json()).get('address')
+    coordinates = (await find_location_async({"address": address}))['geometry']['location']
+
+    return jsonify(coordinates)
+
+
+@async_mod.route('/geo/coordinate', methods=['GET'])
+async def get_coordinate():
+
+    data = await request.get_json()
+    lat = data.get('lat')
+    lang = data.get('lang')
+
+    address = (await find_location_async({"latlng": f"{lat}, {lang}"}))['formatted_address']
+
+    return jsonify({"address": address})
+
+
+@async_mod.route('/geo/business/<business_name>', methods=['GET'])
+async def find_business_by_name(business_name):
+
+    location = (await request.get_json()).get("location")
+    business = await find_business_async({"radius": 10000,
+                                          "name": business_name,
+                                          "location": f"{location['lat']},{location['long']}"})
+
+    if not business:
+        return abort(404, "No business found")
+    return jsonify({"location": business["geometry"]["location"],
+                    "name": business["name"],
+                    "vicinity": business["vicinity"]})
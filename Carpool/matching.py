@@ -0,0 +1,222 @@
+from threading import Thread, Event
+from secrets import token_hex
+import time
+
+import numpy as np
+
+from .models import Ride, RideRequest, RideMatching, RideMatchingStatus, _coords, _ref_id
+from .utils import request_points, pricing as default_pricing
+from .utils.Pricing import cost_matrix, EARTH_RADIUS
+
+
+def _arrays(documents, **fields):
+    """
+    :param fields: array name and document attribute
+    :returns: dictionary of arrays for Pricing.cost_matrix
+    """
+    arrays = {name: [getattr(doc, field) for doc in documents] for name, field in fields.items()}
+    arrays['location'] = [_coords(doc.location) for doc in documents]
+    arrays['destination'] = [_coords(doc.destination) for doc in documents]
+    return arrays
+
+
+def build_cost_matrix(rides, requests, radius=50 * 1000, nearby=None, pricing=None, chunk=256):
+    """
+    cost of every viable (ride, request) pair, rides are sorted by latitude
+    and priced chunk at a time against the requests in the latitude band
+    and time span of the chunk, so the market is never priced as a whole
+    pairs with no overlapping window or a pickup outside radius are left out
+    :param nearby: optional list of the request uids within radius of
+        each ride, pairs outside of it are left out
+    :param pricing: pricing function, defaults to utils.pricing
+    :param chunk: number of rides priced at once
+    :returns: list of (cost, ride index, request index)
+    """
+    if not rides or not requests:
+        return []
+
+    req_lat = np.array([_coords(req.location)[1] for req in requests], dtype=float)
+    req_start = np.array([req.start for req in requests], dtype=float)
+    req_end = np.array([req.end for req in requests], dtype=float)
+    by_lat = np.argsort(req_lat, kind='stable')
+    sorted_lat = req_lat[by_lat]
+    # no pickup within radius is further apart in latitude
+    band = np.degrees(radius / EARTH_RADIUS)
+
+    ride_order = sorted(range(len(rides)), key=lambda i: _coords(rides[i].location)[1])
+    result = []
+    for k in range(0, len(ride_order), chunk):
+        ride_idx = ride_order[k:k + chunk]
+        lats = [_coords(rides[i].location)[1] for i in ride_idx]
+        low = np.searchsorted(sorted_lat, min(lats) - band, side='left')
+        high = np.searchsorted(sorted_lat, max(lats) + band, side='right')
+        req_idx = by_lat[low:high]
+        req_idx = req_idx[(req_start[req_idx] <= max(rides[i].end for i in ride_idx)) &
+                          (req_end[req_idx] >= min(rides[i].start for i in ride_idx))]
+        if not len(req_idx):
+            continue
+
+        pairs = _pair_costs([rides[i] for i in ride_idx], [requests[j] for j in req_idx], radius,
+                            [nearby[i] for i in ride_idx] if nearby is not None else None,
+                            pricing)
+        result += [(cost, ride_idx[i], int(req_idx[j])) for cost, i, j in pairs]
+    return result
+
+
+def _pair_costs(rides, requests, radius, nearby, pricing):
+    """ build_cost_matrix over a single dense matrix """
+    pickup, costs = cost_matrix(_arrays(rides, start='start'),
+                                _arrays(requests, start='start', time='at_time'),
+                                pricing or default_pricing)
+
+    ride_start = np.array([ride.start for ride in rides], dtype=float)[:, None]
+    ride_end = np.array([ride.end for ride in rides], dtype=float)[:, None]
+    req_start = np.array([req.start for req in requests], dtype=float)[None, :]
+    req_end = np.array([req.end for req in requests], dtype=float)[None, :]
+    viable = (pickup <= radius) & (req_start <= ride_end) & (req_end >= ride_start)
+
+    # owners are compared by id, without dereferencing them
+    ride_owners = np.array([_ref_id(ride._data['by_user']) for ride in rides], dtype=object)
+    req_owners = np.array([_ref_id(req._data['by_user']) for req in requests], dtype=object)
+    viable &= ride_owners[:, None] != req_owners[None, :]
+
+    if nearby is not None:
+        uids = np.array([req.uid for req in requests], dtype=object)
+        viable &= np.array([np.isin(uids, list(near)) for near in nearby]).reshape(viable.shape)
+
+    i, j = np.nonzero(viable)
+    return list(zip(costs[i, j].tolist(), i.tolist(), j.tolist()))
+
+
+def solve_assignment(matrix, seats=3, taken=None):
+    """
+    assign every request to at most one ride, and every ride
+    to at most seats requests, cheapest pairs first
+    :param matrix: list of (cost, ride index, request index)
+    :param taken: optional list of the seats already taken in each ride
+    :returns: list of (cost, ride index, request index)
+    """
+    used_seats = dict(enumerate(taken)) if taken else dict()
+    assigned = set()
+    result = []
+    for cost, i, j in sorted(matrix, key=lambda x: x[0]):
+        if j in assigned or used_seats.get(i, 0) >= seats:
+            continue
+        assigned.add(j)
+        used_seats[i] = used_seats.get(i, 0) + 1
+        result.append((cost, i, j))
+    return result
+
+
+def batch_match(start, end, radius=50 * 1000, seats=3, notify=True, live=False):
+    """
+    match every open ride and request in the [start, end] time slice
+    :param live: prefilter the requests near each ride with request_points
+    :returns: list of created matches
+    """
+    rides = list(Ride.objects(start__lte=end, end__gte=start))
+    # seats taken by the matches of earlier runs
+    taken = RideMatching.seats_taken(rides)
+    rides = [ride for ride in rides if taken.get(ride.pk, 0) < seats]
+    requests = list(RideRequest.objects(start__lte=end, end__gte=start))
+    # only the requests of the slice are checked for an earlier match
+    matched = set(RideMatching._get_collection().distinct('request', {
+        'request': {'$in': [req.uid for req in requests]},
+        'status': {'$in': [RideMatchingStatus.pending.value,
+                           RideMatchingStatus.accepted.value]}}))
+    requests = [req for req in requests if req.uid not in matched]
+
+    if not rides or not requests:
+        return []
+
+    nearby = None
+    if live:
+        nearby = [request_points.members_within(*_coords(ride.location), radius, ride.start, ride.end)
+                  for ride in rides]
+
+    assignment = solve_assignment(build_cost_matrix(rides, requests, radius, nearby), seats,
+                                  [taken.get(ride.pk, 0) for ride in rides])
+    matches = []
+    for cost, i, j in assignment:
+        match = RideMatching(driver=rides[i].by_user, rider=requests[j].by_user,
+                             ride=rides[i], request=requests[j], cost=cost,
+                             status=RideMatchingStatus.pending.value)
+        matches.append(match)
+
+    matches = RideMatching.bulk_create(matches)
+
+    if notify:
+        for match in matches:
+            try:
+                match.rider.send_text(
+                    f"{match.rider.first_name}, we have matched your ride with {match.driver.first_name}, please confirm your pool")
+            except Exception as e:
+                print(e)
+
+    return matches
+
+
+# shorten the lock to the rest of the interval, only if it is still ours
+_RELEASE_LOCK = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('pexpire', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+
+class BatchMatcher(Thread):
+
+    LOCK = "matching:lock"
+
+    def __init__(self, interval=60, horizon=3600, lock=None, lock_ttl=None, **kwargs):
+        """
+        periodically run batch_match in the background
+        :param interval: seconds between runs
+        :param horizon: size of the matched time slice in seconds
+        :param lock: optional redis client, when several processes run a
+            matcher only the one taking the lock runs in each interval
+        :param lock_ttl: seconds the lock is held while running, longer than
+            the longest run so that no other process starts meanwhile, it
+            only matters if the process dies, defaults to 10 intervals
+        :param kwargs: passed to batch_match
+        """
+        super().__init__(daemon=True)
+        self._interval = interval
+        self._horizon = horizon
+        self._lock = lock
+        self._lock_ttl = lock_ttl or 10 * interval
+        self._kwargs = kwargs
+        self._stopped = Event()
+
+    def _acquire(self):
+        """ :returns: token of the taken lock, None if another process holds it """
+        token = token_hex(8)
+        if self._lock.set(self.LOCK, token, nx=True, ex=max(1, int(self._lock_ttl))):
+            return token
+        return None
+
+    def _release(self, token, started):
+        """ keep the lock until one interval after the run started """
+        remaining = int((started + self._interval - time.time()) * 1000)
+        self._lock.eval(_RELEASE_LOCK, 1, self.LOCK, token, max(1, remaining))
+
+    def run(self):
+        while not self._stopped.wait(self._interval):
+            now = time.time()
+            try:
+                token = None
+                if self._lock is not None:
+                    token = self._acquire()
+                    if token is None:
+                        continue
+                try:
+                    batch_match(now, now + self._horizon, **self._kwargs)
+                finally:
+                    if token is not None:
+                        self._release(token, now)
+            except Exception as e:
+                print(e)
+
+    def stop(self):
+        self._stopped.set()
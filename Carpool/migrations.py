@@ -0,0 +1,93 @@
+"""
+one-off data migrations, each one cleans up a collection so that the
+unique index it then builds can be created, run them before deploying
+
+    python -m Carpool.migrations emails matchings
+"""
+import sys
+
+from . import utils
+from .models import User, Ride, RideRequest, RideMatching, RideMatchingStatus, UserFeed
+
+# the match kept for a duplicated (ride, request) pair, best first
+_STATUS_RANK = {RideMatchingStatus.accepted.value: 0,
+                RideMatchingStatus.pending.value: 1,
+                RideMatchingStatus.rejected.value: 2}
+
+
+def _raw(document):
+    """
+    pymongo collection of a document class, unlike _get_collection
+    it does not build the indexes, which fail on duplicated values
+    """
+    return document._get_db()[document._get_collection_name()]
+
+
+def normalize_emails():
+    """
+    lowercase user emails and merge the users whose emails only differ
+    by case into one, the user whose email is already lowercase or else
+    the first one, references to the merged users are moved to it,
+    then build the unique index
+    :returns: number of merged users
+    """
+    users = _raw(User)
+    groups = dict()
+    for doc in users.find({}, {'email': 1}).sort('_id', 1):
+        groups.setdefault(doc['email'].lower(), []).append(doc)
+
+    merged = 0
+    for email, docs in groups.items():
+        kept = next((doc for doc in docs if doc['email'] == email), docs[0])
+        duplicates = [doc['_id'] for doc in docs if doc is not kept]
+        if duplicates:
+            for document, fields in ((Ride, ['by_user']), (RideRequest, ['by_user']),
+                                     (RideMatching, ['driver', 'rider'])):
+                for field in fields:
+                    _raw(document).update_many({field: {'$in': duplicates}}, {'$set': {field: kept['_id']}})
+            users.delete_many({'_id': {'$in': duplicates}})
+            utils.user_positions.remove(*duplicates)
+            merged += len(duplicates)
+
+        if kept['email'] != email:
+            users.update_one({'_id': kept['_id']}, {'$set': {'email': email}})
+        utils.user_cache.delete(utils.user_cache.key(email))
+        for doc in docs:
+            UserFeed.invalidate(User(uid=doc['_id']))
+
+    User.ensure_indexes()
+    return merged
+
+
+def dedupe_matchings():
+    """
+    keep a single match of every (ride, request) pair, accepted
+    before pending before rejected, then build the unique index
+    :returns: number of removed matches
+    """
+    matchings = _raw(RideMatching)
+    groups = matchings.aggregate([
+        {'$group': {'_id': {'ride': '$ride', 'request': '$request'},
+                    'matches': {'$push': {'_id': '$_id', 'status': '$status'}},
+                    'count': {'$sum': 1}}},
+        {'$match': {'count': {'$gt': 1}}}])
+
+    removed = 0
+    for group in groups:
+        ranked = sorted(group['matches'], key=lambda m: (_STATUS_RANK.get(m.get('status'), 3), m['_id']))
+        removed += matchings.delete_many({'_id': {'$in': [m['_id'] for m in ranked[1:]]}}).deleted_count
+
+    RideMatching.ensure_indexes()
+    return removed
+
+
+MIGRATIONS = {
+    'emails': normalize_emails,
+    'matchings': dedupe_matchings,
+}
+
+
+if __name__ == "__main__":
+    utils.init_connections()
+    for name in sys.argv[1:] or MIGRATIONS:
+        print(name, MIGRATIONS[name]())
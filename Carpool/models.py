@@ -1,14 +1,100 @@
 from mongoengine import *
 from enum import Enum
+from collections import namedtuple
 from secrets import token_hex
-from .utils import twilio_client, config
-from geopy import distance
+from .utils import outbox, feed_outbox, redis, find_locations, user_cache, user_positions, request_points, \
+    location_buffer, pricing
+from .utils.Pricing import trip_costs
+from bson import DBRef
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+import time as _time
+import json as _json
+
+
+# mongo error code of a unique index violation
+DUPLICATE_KEY = 11000
+# nearest requests read from each time bucket of request_points per
+# candidate wanted, some of them are dropped by the exact window check
+CANDIDATE_OVERFETCH = 4
+
+
+def _ref_id(ref):
+    """ id of a reference field value, dereferenced or not """
+    return ref.id if isinstance(ref, DBRef) else ref.pk
+
+
+def _coords(point):
+    """ [lon, lat] of a PointField value """
+    return point['coordinates'] if type(point) is dict else point
+
+
+def _decode(value):
+    return value.decode() if isinstance(value, bytes) else value
+
+
+def _ref(document, field):
+    """ id of a reference field, without dereferencing it """
+    return _ref_id(document._data[field])
+
+
+def _load(document, ids):
+    """ load documents by id with a single $in query """
+    return {doc.pk: doc for doc in document.objects(pk__in=list(set(ids))).no_dereference()}
+
+
+# the reads and serializations shared with async_models.py are written
+# once as plans, generators that yield these operations, receive their
+# result and return their own, each app runs them with its own driver
+Load = namedtuple('Load', 'document ids')  # -> dictionary of id and document
+# -> list of documents, query is a raw filter and limit optional
+Find = namedtuple('Find', 'document query limit', defaults=(None,))
+Geocode = namedtuple('Geocode', 'queries')  # -> list of find_locations results
+
+
+def _execute(operation):
+    if isinstance(operation, Load):
+        return _load(operation.document, operation.ids)
+    if isinstance(operation, Find):
+        found = operation.document.objects(__raw__=operation.query)
+        return list(found.limit(operation.limit) if operation.limit else found)
+    return find_locations(operation.queries)
+
+
+def page_cursor(document, item):
+    """
+    cursor of the page after a serialized item, paginated lists are
+    ordered by the page_key of their document with the uid as tie-breaker
+    """
+    return f"{item[document.page_key]!r}:{item['uid']}"
+
+
+def page_filter(document, after):
+    """
+    raw filter of the documents after a page_cursor
+    :raises ValueError: if the cursor is malformed
+    """
+    value, _, uid = after.rpartition(':')
+    value = float(value)
+    key = document.page_key
+    return {'$or': [{key: {'$gt': value}}, {key: value, '_id': {'$gt': uid}}]}
+
+
+def run(plan):
+    """ run a plan with mongoengine, see async_models.run for motor """
+    result = None
+    while True:
+        try:
+            operation = plan.send(result)
+        except StopIteration as e:
+            return e.value
+        result = _execute(operation)
 
 
 class User(Document):
 
     uid = StringField(primary_key=True, default=lambda: token_hex(5))
-    email = StringField(required=True)
+    email = StringField(required=True, unique=True)
     first_name = StringField(required=True)
     last_name = StringField(required=True)
     profile_picture = StringField(required=False)
@@ -16,6 +102,8 @@ class User(Document):
 
     # coordinated [x, y], longitude and latitude
     location = PointField(auto_index=True)
+    # timestamp of the stored location, older buffered pings are dropped
+    location_at = FloatField(required=False)
 
     @classmethod
     def register(cls, email, first_name, last_name, profile_picture, phone_number):
@@ -30,24 +118,78 @@ class User(Document):
 
     @classmethod
     def find_with_email(cls, email):
+        """ resolve a user through user_cache, falling back to mongo """
+        key = user_cache.key(email.lower())
+        son = user_cache.get(key)
+        if son is not None:
+            return cls._from_son(son)
+
         try:
             user = cls.objects.get(email=email.lower())
         except DoesNotExist as e:
             return None
+        user_cache.set(key, user.cache_entry())
         return user
 
-    def update_location(self, lon, lat):
+    def cache_entry(self):
+        """ json serializable document stored in user_cache """
+        return self.to_mongo().to_dict()
+
+    def save(self, *args, **kwargs):
+        result = super().save(*args, **kwargs)
+        user_cache.delete(user_cache.key(self.email))
+        return result
+
+    def delete(self, *args, **kwargs):
+        user_cache.delete(user_cache.key(self.email))
+        return super().delete(*args, **kwargs)
+
+    def update_location(self, lon, lat, at=None):
+        """
+        buffer a location ping, written to mongo by write_locations,
+        async_models.buffer_locations is the same for the async app
+        :param at: optional client timestamp of the ping
+        """
         self.location = [lon, lat]
-        self.save()
+        location_buffer.push(self.uid, self.email, lon, lat, at)
+
+    @classmethod
+    def find_within(cls, lon, lat, radius, limit=50):
+        """
+        users whose live position is within radius, nearest first,
+        served from user_positions, radius is in meters
+        """
+        ranked = user_positions.query(lon, lat, radius, limit)
+        found = {user.uid: user for user in cls.objects(uid__in=[uid for uid, _ in ranked])}
+        return [found[uid] for uid, _ in ranked if uid in found]
+
+    @classmethod
+    def write_locations(cls, pings):
+        """
+        store buffered location pings with a single bulk write,
+        a ping older than the stored location is ignored
+        :param pings: dictionary of uid and ping, see LocationBuffer
+        """
+        if not pings:
+            return
+
+        collection = cls._get_collection()
+        collection.bulk_write([UpdateOne(
+            {'_id': uid, '$or': [{'location_at': None}, {'location_at': {'$lt': ping['at']}}]},
+            {'$set': {'location': {'type': 'Point', 'coordinates': [ping['lon'], ping['lat']]},
+                      'location_at': ping['at']}})
+            for uid, ping in pings.items()], ordered=False)
+
+        # only mirror the pings that were not dropped as out of order, the
+        # stored users replace their cached entries so active users stay cached
+        stored = {doc['_id']: cls._from_son(doc) for doc in collection.find({'_id': {'$in': list(pings)}})}
+        user_positions.add_many((uid, ping['lon'], ping['lat'], None) for uid, ping in pings.items()
+                                if uid in stored and stored[uid].location_at == ping['at'])
+        user_cache.set_many({user_cache.key(user.email): user.cache_entry() for user in stored.values()})
 
     def send_text(self, text_message):
-        (twilio_client
-         .messages
-         .create(
-             body=text_message,
-             to=f"+1{self.phone_number}",
-             from_=config['twilio']['from_number']
-         ))
+        """ queue a text message, delivered by the outbox workers """
+        return outbox.enqueue("sms", {"to": f"+1{self.phone_number}", "body": text_message})
 
     def send_push(self, push_data):
         pass
@@ -78,6 +220,8 @@ class User(Document):
 
 class RideRequest(Document):
 
+    page_key = 'start'
+
     uid = StringField(primary_key=True, default=lambda: token_hex(5))
     by_user = ReferenceField(User)
     at_time = FloatField(required=True)
@@ -103,36 +247,117 @@ class RideRequest(Document):
         req.start = time - before_flex * 60
         req.end = time + after_flex * 60
         req.save()
+        request_points.add(*req.index_entry())
         return req
 
+    def delete(self, *args, **kwargs):
+        request_points.remove(self.uid, self.start, self.end)
+        return super().delete(*args, **kwargs)
+
+    def index_entry(self):
+        """ (uid, lon, lat, start, end) tuple stored in request_points """
+        lon, lat = _coords(self.location)
+        return self.uid, lon, lat, self.start, self.end
+
+    @classmethod
+    def find_open(cls, now=None):
+        """ requests whose flex window has not ended yet """
+        return cls.objects(end__gte=now if now is not None else _time.time())
+
+    @classmethod
+    def sync_index(cls):
+        """
+        add the open requests to request_points, members added meanwhile
+        by other workers are kept, returns indexed count
+        """
+        entries = [req.index_entry() for req in cls.find_open()]
+        request_points.add_many(entries)
+        return len(entries)
+
+    @classmethod
+    def check_index(cls):
+        """ compare request_points with mongo, returns (missing, stale) uids """
+        request_points.expire()
+        indexed = request_points.members()
+        open_requests = {req.uid for req in cls.find_open()}
+        return open_requests - indexed, indexed - open_requests
+
     @classmethod
     def find_for_user(cls, user):
         return cls.objects(by_user=user)
 
     @classmethod
-    def find_within(cls, lon, lat, radius):
-        """ radius is in meters """
-        return cls.objects(location__near=[lon, lat], location__max_distance=radius)
+    def find_within(cls, lon, lat, radius, live=False, limit=50, start=None, end=None):
+        """
+        radius is in meters, live=True answers from request_points
+        instead of mongo, as a list of the requests nearest first whose
+        window overlaps [start, end], now by default
+        """
+        if not live:
+            return cls.objects(location__near=[lon, lat], location__max_distance=radius)
+
+        now = _time.time()
+        ranked = request_points.query(lon, lat, radius, start if start is not None else now,
+                                      end if end is not None else now, limit)
+        found = {req.uid: req for req in cls.objects(uid__in=[uid for uid, _ in ranked])}
+        return [found[uid] for uid, _ in ranked if uid in found]
+
+    @classmethod
+    def find_candidates(cls, lon, lat, radius, start, end, limit=50):
+        """
+        find requests within radius whose flex window overlaps [start, end],
+        nearest first and bounded by limit, the nearest requests of the time
+        buckets of the window come from the request_points index shared by
+        all workers and mongo only checks their exact window
+        radius is in meters
+        """
+        ranked = request_points.query(lon, lat, radius, start, end, CANDIDATE_OVERFETCH * limit)
+        return run(cls.candidates_plan(ranked, start, end, limit))
 
     @classmethod
-    def find_within_time(cls, lon, lat, radius, start, end):
-        """ radius is in meters """
-        return cls.objects(location__near=[lon, lat], location__max_distance=radius)
-                           # start__ge=start, end__lt=end)
+    def candidates_plan(cls, ranked, start, end, limit):
+        """
+        plan of find_candidates once request_points was queried, the
+        ranked uids are checked nearest first, limit at a time
+        :param ranked: list of (uid, distance) nearest first
+        """
+        candidates = []
+        for i in range(0, len(ranked), limit):
+            uids = [uid for uid, _ in ranked[i:i + limit]]
+            found = yield Find(cls, {'_id': {'$in': uids}, 'start': {'$lte': end},
+                                     'end': {'$gte': start}}, limit)
+            found = {req.uid: req for req in found}
+            candidates += [found[uid] for uid in uids if uid in found]
+            if len(candidates) >= limit:
+                break
+        return candidates[:limit]
 
     def calculate_cost(self):
-        # todo process this
+        return self.calculate_costs([self])[0]
 
-        dist = distance.vincenty(
-            (self.location['coordinates'][0], self.location['coordinates'][1]),
-            (self.destination['coordinates'][0], self.destination['coordinates'][1])
-        ).km
-        return 0.4 * dist
+    @classmethod
+    def calculate_costs(cls, requests):
+        """ cost of each request on its own, computed at once with utils.pricing """
+        if not requests:
+            return []
+        return trip_costs([_coords(req.location) for req in requests],
+                          [_coords(req.destination) for req in requests], pricing).tolist()
 
-    def make_json(self):
+    @classmethod
+    def bulk_json(cls, requests):
+        """ serialize a queryset of requests with one query for their users """
+        return run(cls.json_plan(list(requests.no_dereference())))
+
+    @classmethod
+    def json_plan(cls, requests):
+        """ plan of bulk_json for a list of requests """
+        users = yield Load(User, [_ref(req, 'by_user') for req in requests])
+        return [req.make_json(user=users[_ref(req, 'by_user')]) for req in requests]
+
+    def make_json(self, user=None):
         json = {
             "uid": self.uid,
-            "user": self.by_user.make_json(),
+            "user": (user or self.by_user).make_json(),
             "start": self.start,
             "end": self.end,
             "time": self.at_time,
@@ -164,6 +389,8 @@ class RideRequest(Document):
 
 class Ride(Document):
 
+    page_key = 'start'
+
     uid = StringField(primary_key=True, default=lambda: token_hex(5))
     by_user = ReferenceField(User)
     location = PointField(auto_index=True)
@@ -182,17 +409,29 @@ class Ride(Document):
         ride.location = [location_lon, location_lat]
         ride.destination = [dest_lon, dest_lat]
         ride.save()
+        UserFeed.schedule_refresh(ride)
         return ride
 
     @classmethod
     def find_for_user(cls, user):
         return cls.objects(by_user=user)
 
-    def make_json(self):
+    @classmethod
+    def bulk_json(cls, rides):
+        """ serialize a queryset of rides with one query for their users """
+        return run(cls.json_plan(list(rides.no_dereference())))
+
+    @classmethod
+    def json_plan(cls, rides):
+        """ plan of bulk_json for a list of rides """
+        users = yield Load(User, [_ref(ride, 'by_user') for ride in rides])
+        return [ride.make_json(user=users[_ref(ride, 'by_user')]) for ride in rides]
+
+    def make_json(self, user=None):
 
         json = {
             "uid": self.uid,
-            "user": self.by_user.make_json(),
+            "user": (user or self.by_user).make_json(),
             "start": self.start,
             "end": self.end
         }
@@ -235,6 +474,15 @@ class RideMatching(Document):
     request = ReferenceField(RideRequest)
     cost = FloatField()
     status = StringField()
+    created = FloatField(default=_time.time)
+
+    page_key = 'created'
+
+    meta = {
+        'indexes': [
+            {'fields': ['ride', 'request'], 'unique': True},
+        ]
+    }
 
     @classmethod
     def create(cls, driver, rider, ride, request, cost):
@@ -248,13 +496,79 @@ class RideMatching(Document):
         match.save()
         return match
 
+    @classmethod
+    def bulk_create(cls, matches):
+        """
+        insert many matches with a single bulk write, pairs of
+        (ride, request) that already have a match are left untouched
+        :returns: list of the newly inserted matches
+        """
+        if not matches:
+            return []
+
+        try:
+            upserted = cls._get_collection().bulk_write(cls.upserts(matches), ordered=False).upserted_ids
+        except BulkWriteError as e:
+            upserted = cls.duplicate_upserts(e)
+        return [matches[i] for i in upserted]
+
+    @classmethod
+    def upserts(cls, matches):
+        """ bulk write operations inserting matches whose pair is new """
+        operations = []
+        for match in matches:
+            if not match.status:
+                match.status = RideMatchingStatus.pending.value
+            doc = match.to_mongo()
+            operations.append(UpdateOne(
+                {'ride': doc['ride'], 'request': doc['request']},
+                {'$setOnInsert': doc}, upsert=True))
+        return operations
+
+    @staticmethod
+    def duplicate_upserts(error):
+        """
+        upserted ids of a bulk write of upserts that only failed on
+        duplicate keys, a concurrent upsert inserted those pairs first
+        :param error: BulkWriteError, raised again on any other error
+        :returns: dictionary of operation index and upserted id
+        """
+        details = error.details
+        if details.get('writeConcernErrors') or any(
+                e['code'] != DUPLICATE_KEY for e in details['writeErrors']):
+            raise error
+        return {upsert['index']: upsert['_id'] for upsert in details['upserted']}
+
+    @classmethod
+    def seats_taken(cls, rides):
+        """
+        number of pending and accepted matches of each ride
+        :returns: dictionary of ride id and count, rides without a match are left out
+        """
+        counts = cls._get_collection().aggregate([
+            {'$match': {'ride': {'$in': [ride.pk for ride in rides]},
+                        'status': {'$in': [RideMatchingStatus.pending.value,
+                                           RideMatchingStatus.accepted.value]}}},
+            {'$group': {'_id': '$ride', 'count': {'$sum': 1}}}])
+        return {doc['_id']: doc['count'] for doc in counts}
+
+    @classmethod
+    def query(cls, ride=None, status=None):
+        """ raw filter of the matches of a ride and or with a status """
+        query = {}
+        if ride is not None:
+            query['ride'] = ride.pk
+        if status is not None:
+            query['status'] = status.value
+        return query
+
     @classmethod
     def find_with_driver(cls, driver):
         return cls.objects(driver=driver)
 
     @classmethod
     def find_with_rider(cls, rider, status=None):
-        if status is not None:
+        if status is None:
             return cls.objects(rider=rider)
         else:
             return cls.objects(rider=rider, status=status.value)
@@ -273,20 +587,217 @@ class RideMatching(Document):
     def accept(self):
         self.status = RideMatchingStatus.accepted.value
         self.save()
+        UserFeed.schedule_refresh(self.ride)
 
     def reject(self):
         self.status = RideMatchingStatus.rejected.value
         self.save()
+        UserFeed.remove_ride(self.rider, self.ride)
+        UserFeed.schedule_refresh(self.ride)
 
-    def make_json(self):
+    @classmethod
+    def bulk_json(cls, matches):
+        """
+        serialize a queryset of matches with a constant number of queries,
+        one $in query per referenced collection
+        """
+        return run(cls.json_plan(list(matches.no_dereference())))
+
+    @classmethod
+    def json_plan(cls, matches):
+        """ plan of bulk_json for a list of matches """
+        rides = yield Load(Ride, [_ref(m, 'ride') for m in matches])
+        requests = yield Load(RideRequest, [_ref(m, 'request') for m in matches])
+
+        user_ids = [_ref(m, 'rider') for m in matches] + [_ref(m, 'driver') for m in matches]
+        user_ids += [_ref(x, 'by_user') for x in list(rides.values()) + list(requests.values())]
+        users = yield Load(User, user_ids)
+
+        result = []
+        for m in matches:
+            ride = rides[_ref(m, 'ride')]
+            request = requests[_ref(m, 'request')]
+            result.append(m.make_json(
+                rider=users[_ref(m, 'rider')], driver=users[_ref(m, 'driver')],
+                ride=ride, ride_user=users[_ref(ride, 'by_user')],
+                request=request, request_user=users[_ref(request, 'by_user')]))
+        return result
+
+    def make_json(self, rider=None, driver=None, ride=None, ride_user=None,
+                  request=None, request_user=None):
         json = {
             "uid": self.uid,
-            "rider": self.rider.make_json(),
-            "driver": self.driver.make_json(),
-            "ride": self.ride.make_json(),
-            "request": self.request.make_json(),
+            "rider": (rider or self.rider).make_json(),
+            "driver": (driver or self.driver).make_json(),
+            "ride": (ride or self.ride).make_json(user=ride_user),
+            "request": (request or self.request).make_json(user=request_user),
             "cost": self.cost,
-            "status": self.status
+            "status": self.status,
+            "created": self.created
         }
 
         return json
+
+
+class UserFeed:
+    """
+    materialized per user feed, stored as a redis hash of
+    ride uid -> feed item and updated as rides and matches change
+    """
+
+    _built = "__built__"
+
+    @classmethod
+    def _key(cls, user):
+        return f"feed:{user.uid}"
+
+    @classmethod
+    def _items_plan(cls, rides):
+        """
+        plan of the feed items for a list of (ride, owner, entries), where
+        entries are (user, location, destination) of the users who see the ride
+        :returns: list of (ride, user, item)
+        """
+        queries = []
+        for ride, owner, entries in rides:
+            for user, location, destination in entries:
+                queries.append({"latlng": f"{location['coordinates'][1]}, {location['coordinates'][0]}"})
+                queries.append({"latlng": f"{destination['coordinates'][1]}, {destination['coordinates'][0]}"})
+        addresses = iter((yield Geocode(queries)))
+
+        accepted = yield Find(RideMatching, {'ride': {'$in': [ride.pk for ride, _, _ in rides]},
+                                             'status': RideMatchingStatus.accepted.value})
+        accepted_json = yield from RideMatching.json_plan(accepted)
+        matches = {}
+        for match, match_json in zip(accepted, accepted_json):
+            matches.setdefault(_ref(match, 'ride'), []).append(match_json)
+
+        items = []
+        for ride, owner, entries in rides:
+            ride_json = ride.make_json(user=owner)
+            for user, location, destination in entries:
+                items.append((ride, user, {'ride': ride_json,
+                                           'pickup': next(addresses)['formatted_address'],
+                                           'destination': next(addresses)['formatted_address'],
+                                           'matches': matches.get(ride.pk, [])}))
+        return items
+
+    @classmethod
+    def _entries_plan(cls, ride):
+        """ plan of the owner and (user, location, destination) of everyone who sees the ride """
+        accepted = yield Find(RideMatching, RideMatching.query(ride=ride, status=RideMatchingStatus.accepted))
+        requests = yield Load(RideRequest, [_ref(m, 'request') for m in accepted])
+        users = yield Load(User, [_ref(ride, 'by_user')] + [_ref(m, 'rider') for m in accepted])
+
+        owner = users[_ref(ride, 'by_user')]
+        entries = [(owner, ride.location, ride.destination)]
+        for match in accepted:
+            request = requests[_ref(match, 'request')]
+            entries.append((users[_ref(match, 'rider')], request.location, request.destination))
+        return owner, entries
+
+    @classmethod
+    def refresh_plan(cls, ride):
+        """ plan of the items of a ride in the feed of everyone who sees it """
+        owner, entries = yield from cls._entries_plan(ride)
+        return (yield from cls._items_plan([(ride, owner, entries)]))
+
+    @classmethod
+    def rebuild_plan(cls, user):
+        """ plan of the hash mapping of a user's feed, see rebuild """
+        owned = yield Find(Ride, {'by_user': user.pk})
+        rides = {ride.uid: (ride, [(user, ride.location, ride.destination)]) for ride in owned}
+
+        accepted = yield Find(RideMatching, {'rider': user.pk, 'status': RideMatchingStatus.accepted.value})
+        match_rides = yield Load(Ride, [_ref(m, 'ride') for m in accepted])
+        requests = yield Load(RideRequest, [_ref(m, 'request') for m in accepted])
+        for match in accepted:
+            ride = match_rides[_ref(match, 'ride')]
+            if ride.uid not in rides:
+                request = requests[_ref(match, 'request')]
+                rides[ride.uid] = (ride, [(user, request.location, request.destination)])
+
+        owners = yield Load(User, [_ref(ride, 'by_user') for ride, _ in rides.values()])
+        items = yield from cls._items_plan([(ride, owners[_ref(ride, 'by_user')], entries)
+                                            for ride, entries in rides.values()])
+
+        mapping = {cls._built: 1}
+        for ride, _, item in items:
+            mapping[ride.uid] = _json.dumps(item)
+        return mapping
+
+    @classmethod
+    def parse(cls, items):
+        """
+        :param items: the hash of a feed as read from redis
+        :returns: the feed sorted by start, None if it was never built
+        """
+        items = {_decode(uid): item for uid, item in items.items()}
+        if cls._built not in items:
+            return None
+
+        del items[cls._built]
+        feed = [_json.loads(item) for item in items.values()]
+        return sorted(feed, key=lambda x: x['ride']['start'] or 0)
+
+    @classmethod
+    def get(cls, user):
+        """ read a user's feed, rebuilding it if it was never built """
+        feed = cls.parse(redis.hgetall(cls._key(user)))
+        return feed if feed is not None else cls.rebuild(user)
+
+    @classmethod
+    def rebuild(cls, user):
+        """ rebuild a user's feed from mongo """
+        mapping = run(cls.rebuild_plan(user))
+        pipe = redis.pipeline()
+        pipe.delete(cls._key(user))
+        pipe.hmset(cls._key(user), mapping)
+        pipe.execute()
+        return cls.parse(mapping)
+
+    @classmethod
+    def invalidate(cls, user):
+        """ drop a user's feed so the next read rebuilds it """
+        redis.delete(cls._key(user))
+
+    @classmethod
+    def refresh_ride(cls, ride):
+        """
+        update the item of a ride in the feed of everyone who sees it,
+        geocoding errors are raised and the feeds are left untouched
+        """
+        items = run(cls.refresh_plan(ride))
+        pipe = redis.pipeline()
+        for _, user, item in items:
+            pipe.hset(cls._key(user), ride.uid, _json.dumps(item))
+        pipe.execute()
+
+    @classmethod
+    def schedule_refresh(cls, ride):
+        """ refresh a ride in the background, see refresh_job """
+        feed_outbox.enqueue("refresh", {"ride": ride.uid})
+
+    @classmethod
+    def refresh_job(cls, payload):
+        """
+        handler of the refresh jobs of the feed_outbox, a raised error
+        retries the refresh with backoff
+        """
+        ride = Ride.objects(uid=payload["ride"]).first()
+        if ride is not None:
+            cls.refresh_ride(ride)
+
+    @classmethod
+    def refresh_failed(cls, message):
+        """ drop the feeds of a ride whose refresh kept failing, reads rebuild them """
+        ride = Ride.objects(uid=message["payload"]["ride"]).first()
+        if ride is not None:
+            _, entries = run(cls._entries_plan(ride))
+            for user, _, _ in entries:
+                cls.invalidate(user)
+
+    @classmethod
+    def remove_ride(cls, user, ride):
+        """ remove a ride from a user's feed """
+        redis.hdel(cls._key(user), ride.uid)
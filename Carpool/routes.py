@@ -1,12 +1,82 @@
-from flask import Blueprint, jsonify, abort, request
+from flask import Blueprint, jsonify, abort, request, Response, stream_with_context
 from .models import *
 from .utils import find_location
 import json
-from pprint import pprint
-from .utils import find_location, find_business
+from .utils import find_business, location_buffer
 
 mod = Blueprint("routes", __name__)
 
+STREAM_CHUNK_SIZE = 100
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+
+def page_args(args):
+    """
+    limit and after cursor of a paginated request, pages default to
+    DEFAULT_PAGE_SIZE items and hold at most MAX_PAGE_SIZE, streams
+    are only limited when asked to
+    :raises ValueError: if the limit is below 1
+    """
+    limit = args.get('limit', type=int)
+    if limit is not None and limit < 1:
+        raise ValueError("limit must be at least 1")
+    if not args.get('stream'):
+        limit = min(limit or DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE)
+    return limit, args.get('after')
+
+
+def paginate(queryset, serialize):
+    """
+    keyset paginated list response, ordered by the page_key of the
+    document then uid, see page_cursor
+    takes optional limit and after (cursor of the last item seen) query
+    parameters, the cursor of the next page is returned in the
+    X-Next-Cursor header, stream=1 encodes the results chunk by chunk instead
+    """
+    document = queryset._document
+    queryset = queryset.order_by(document.page_key, 'uid')
+    try:
+        limit, after = page_args(request.args)
+        page = queryset.filter(__raw__=page_filter(document, after)) if after else queryset
+    except ValueError as e:
+        return abort(400, str(e))
+
+    if request.args.get('stream'):
+        return Response(stream_with_context(_stream(queryset, serialize, limit, after)),
+                        mimetype='application/json')
+
+    items = serialize(page.limit(limit))
+
+    response = jsonify(items)
+    if len(items) == limit:
+        response.headers['X-Next-Cursor'] = page_cursor(document, items[-1])
+    return response
+
+
+def _stream(queryset, serialize, limit, after):
+    """ yield a json array, serializing one chunk of documents at a time """
+    document = queryset._document
+    yield '['
+    sent = 0
+    while not limit or sent < limit:
+        size = min(STREAM_CHUNK_SIZE, limit - sent) if limit else STREAM_CHUNK_SIZE
+        page = queryset.filter(__raw__=page_filter(document, after)) if after else queryset
+        items = serialize(page.limit(size))
+        for item in items:
+            yield (',' if sent else '') + json.dumps(item)
+            sent += 1
+
+        if len(items) < size:
+            break
+        after = page_cursor(document, items[-1])
+    yield ']'
+
+
+@mod.record_once
+def sync_request_index(state):
+    RideRequest.sync_index()
+
 
 @mod.route('/user/<email>', methods=['GET'])
 def get_user_info(email):
@@ -28,9 +98,12 @@ def register_user():
     phone_number = data.get('phone_number')
     profile_picture = data.get('profile_picture')
 
-    user = User.register(email=email, first_name=first_name,
-                         last_name=last_name, phone_number=phone_number,
-                         profile_picture=profile_picture)
+    try:
+        user = User.register(email=email, first_name=first_name,
+                             last_name=last_name, phone_number=phone_number,
+                             profile_picture=profile_picture)
+    except NotUniqueError:
+        return abort(409, "email already registered")
 
     try:
         user.send_text(f"Hey {user.first_name.capitalize()}, thank you for registering on InstaPool!")
@@ -49,11 +122,28 @@ def update_user_location(email):
 
     longitude = request.json['location']['longitude']
     latitude = request.json['location']['latitude']
-    user.update_location(lon=longitude, lat=latitude)
+
+    # written to mongo by the location flusher, latest ping wins
+    user.update_location(longitude, latitude, request.json.get('time'))
 
     return jsonify(user.make_json())
 
 
+@mod.route('/location/batch', methods=['POST'])
+def update_locations():
+
+    pings = request.json.get('pings', [])
+    users = {email: User.find_with_email(email) for email in {ping['email'] for ping in pings}}
+
+    accepted = location_buffer.push_many(
+        (users[ping['email']].uid, users[ping['email']].email,
+         ping['location']['longitude'], ping['location']['latitude'], ping.get('time'))
+        for ping in pings if users[ping['email']])
+
+    return jsonify({"accepted": accepted,
+                    "unknown": [email for email, user in users.items() if not user]})
+
+
 @mod.route('/user/<email>/ride/request', methods=['POST'])
 def request_new_ride(email):
 
@@ -89,7 +179,7 @@ def get_ride_requests(email):
         return abort(404, "user not found")
 
     requests = RideRequest.find_for_user(user)
-    return jsonify(list(map(lambda x: x.make_json(), requests)))
+    return paginate(requests, RideRequest.bulk_json)
 
 
 @mod.route('/user/<email>/ride', methods=['POST'])
@@ -127,7 +217,7 @@ def get_user_rides(email):
         return abort(404, "user not found")
 
     rides = Ride.find_for_user(user)
-    return jsonify(list(map(lambda x: x.make_json(), rides)))
+    return paginate(rides, Ride.bulk_json)
 
 
 @mod.route('/user/<email>/ride/<ride_id>/match', methods=['POST'])
@@ -146,24 +236,24 @@ def start_matching_ride(email, ride_id):
     print("here 2")
 
     ride = Ride.objects.get(uid=ride_id)
-    matched_requests = RideRequest.find_within_time(
+    matched_requests = RideRequest.find_candidates(
         lon=ride.location['coordinates'][0], lat=ride.location['coordinates'][1],
         radius=50 * 1000, start=ride.start, end=ride.end)
 
     print("matched", matched_requests)
 
-    for req in matched_requests:
-        match = RideMatching.create(
-            driver=ride.by_user, rider=req.by_user,
-            ride=ride, request=req, cost=req.calculate_cost())
+    new_matches = RideMatching.bulk_create([
+        RideMatching(driver=ride.by_user, rider=req.by_user,
+                     ride=ride, request=req, cost=cost)
+        for req, cost in zip(matched_requests, RideRequest.calculate_costs(matched_requests))])
 
-        # todo notify match
-        req.by_user.send_text(
-            f"""{req.by_user.first_name}, we have matched your ride with {driver.first_name}, please confirm your pool"""
+    for match in new_matches:
+        match.rider.send_text(
+            f"""{match.rider.first_name}, we have matched your ride with {driver.first_name}, please confirm your pool"""
         )
 
     matches = RideMatching.find_with_ride(ride)
-    return jsonify(list(map(lambda x: x.make_json(), matches)))
+    return jsonify(RideMatching.bulk_json(matches))
 
 
 @mod.route('/user/<email>/ride/<ride_id>/match', methods=['GET'])
@@ -175,7 +265,7 @@ def get_matching_rides(email, ride_id):
 
     ride = Ride.objects.get(uid=ride_id)
     matches = RideMatching.find_with_ride(ride)
-    return jsonify(list(map(lambda x: x.make_json(), matches)))
+    return paginate(matches, RideMatching.bulk_json)
 
 
 @mod.route('/user/<email>/ride/rider/matches', methods=['GET'])
@@ -186,7 +276,7 @@ def get_rider_match_offers(email):
         return abort(404, "user not found")
 
     matches = RideMatching.objects(rider=user)
-    return jsonify(list(map(lambda x: x.make_json(), matches)))
+    return paginate(matches, RideMatching.bulk_json)
 
 
 @mod.route('/user/<email>/ride/driver/matches', methods=['GET'])
@@ -197,7 +287,7 @@ def get_driver_match_offers(email):
         return abort(404, "user not found")
 
     matches = RideMatching.objects(driver=user)
-    return jsonify(list(map(lambda x: x.make_json(), matches)))
+    return paginate(matches, RideMatching.bulk_json)
 
 
 @mod.route('/user/<email>/ride/<ride_id>/match/accept', methods=['POST'])
@@ -237,38 +327,13 @@ def reject_ride_match(email, ride_id):
 def get_user_feed(email):
 
     user = User.find_with_email(email)
+    if not user:
+        return abort(404, "user not found")
 
-    user_driving_rides = Ride.find_for_user(user)
-    user_riding_rides = []
-
-    print(user_driving_rides)
-
-    matches = RideMatching.find_with_rider(user, status=RideMatchingStatus.accepted)
-    for match in matches:
-        if match.ride not in user_riding_rides:
-            user_riding_rides.append(match.ride)
-
-    ride_set = set(user_driving_rides).union(set(user_riding_rides))
-    result = []
-
-    for ride in ride_set:
-
-        if ride in user_driving_rides:
-            pickup = find_location({"latlng": f"{ride.location['coordinates'][1]}, {ride.location['coordinates'][0]}"})['formatted_address']
-            dest = find_location({"latlng": f"{ride.destination['coordinates'][1]}, {ride.destination['coordinates'][0]}"})['formatted_address']
-        else:
-            match = RideMatching.objects.get(ride=ride, rider=user, status=RideMatchingStatus.accepted.value)
-            pickup = find_location({"latlng": f"{match.request.location['coordinates'][1]}, {match.request.location['coordinates'][0]}"})['formatted_address']
-            dest = find_location({"latlng": f"{match.request.destination['coordinates'][1]}, {match.request.destination['coordinates'][0]}"})['formatted_address']
-
-        temp = {'ride': ride.make_json(),
-                'pickup': pickup,
-                'destination': dest,
-                'matches': list(map(lambda x: x.make_json(), RideMatching.find_with_ride(ride, status=RideMatchingStatus.accepted)))}
-        result.append(temp)
+    if request.args.get('rebuild'):
+        return jsonify(UserFeed.rebuild(user))
 
-    pprint(result)
-    return jsonify(result)
+    return jsonify(UserFeed.get(user))
 
 
 @mod.route('/geo/address', methods=['GET'])
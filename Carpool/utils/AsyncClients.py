@@ -0,0 +1,60 @@
+try:
+    from motor.motor_asyncio import AsyncIOMotorClient
+except ImportError:
+    AsyncIOMotorClient = None
+
+try:
+    import aioredis
+except ImportError:
+    aioredis = None
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+
+class AsyncClients:
+
+    def __init__(self, config):
+        """
+        asyncio mongo, redis and http clients of the async app, they are
+        bound to the running event loop so they are opened once it started
+        :param config: application config
+        """
+        self._config = config
+        self.mongo = None
+        self.db = None
+        self.redis = None
+        self.http = None
+
+    async def open(self):
+        """ open the clients, a no-op if they are open """
+        if self.mongo is not None:
+            return
+        if AsyncIOMotorClient is None or aioredis is None or httpx is None:
+            raise ValueError("the async app requires the motor, aioredis and httpx packages")
+
+        database = self._config['database']
+        self.mongo = AsyncIOMotorClient(database['mongo']['url'])
+        # same database as mongoengine, named by the url or "db"
+        self.db = self.mongo.get_default_database("db")
+        self.redis = aioredis.Redis(host=database['redis']['url'])
+        google = self._config['google']
+        self.http = httpx.AsyncClient(
+            timeout=google.get('timeout', 5),
+            limits=httpx.Limits(max_connections=google.get('workers', 8) * 4))
+
+    async def close(self):
+        """ close the clients """
+        if self.mongo is None:
+            return
+
+        await self.http.aclose()
+        await self.redis.close()
+        self.mongo.close()
+        self.mongo = self.db = self.redis = self.http = None
+
+    def collection(self, document):
+        """ :returns: motor collection of a mongoengine document class """
+        return self.db[document._get_collection_name()]
@@ -0,0 +1,63 @@
+import json
+
+from .TieredCache import TieredCache, _MISSING
+
+
+class GeoCache(TieredCache):
+
+    def __init__(self, redis=None, precision=4, ttl=86400, negative_ttl=600,
+                 max_size=10000, prefix="geocode"):
+        """
+        initialize a new two tier geocoding cache
+        :param redis: optional redis client used as the shared tier
+        :param precision: decimal places kept when quantizing coordinates
+        :param ttl: seconds a found result is cached
+        :param negative_ttl: seconds an empty result is cached
+        :param max_size: size of the local lru tier
+        :param prefix: redis key prefix
+        """
+        super().__init__(redis, ttl=ttl, max_size=max_size, prefix=prefix)
+        self._precision = precision
+        self._negative_ttl = negative_ttl
+
+    def key(self, query):
+        """
+        cache key for a geocoding query
+        latlng queries are quantized, addresses are normalized
+        """
+        if 'latlng' in query:
+            lat, lng = (float(x) for x in str(query['latlng']).split(','))
+            value = f"latlng:{round(lat, self._precision)},{round(lng, self._precision)}"
+        elif 'address' in query:
+            value = "address:" + " ".join(str(query['address']).lower().split())
+        else:
+            value = json.dumps(query, sort_keys=True)
+        return super().key(value)
+
+    def _ttl_of(self, value):
+        # None results are cached as negative entries
+        return self._ttl if value is not None else self._negative_ttl
+
+    def cached(self, query, fetch):
+        """
+        get the result of a query, calling fetch(query) on a miss
+        """
+        key = self.key(query)
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = fetch(query)
+            self.set(key, value)
+        return value
+
+    async def cached_async(self, query, fetch, redis=None):
+        """
+        same as cached from a coroutine
+        :param fetch: coroutine function called with the query on a miss
+        :param redis: optional asyncio redis client used as the shared tier
+        """
+        key = self.key(query)
+        value = await self.get_async(key, redis, _MISSING)
+        if value is _MISSING:
+            value = await fetch(query)
+            await self.set_async(key, value, redis)
+        return value
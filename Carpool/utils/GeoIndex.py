@@ -0,0 +1,321 @@
+import time
+
+from redis.exceptions import ResponseError
+
+
+def _decode(member):
+    return member.decode() if isinstance(member, bytes) else member
+
+
+class GeoIndex:
+
+    def __init__(self, redis, name, ttl=None, purge_interval=1):
+        """
+        initialize a new redis GEO backed proximity index
+        :param redis: redis client, any client speaking the redis
+            protocol works, e.g. a local stand-in in tests
+        :param name: key of the geo set, expiries are kept in <name>:expires
+        :param ttl: optional seconds after which a member added without
+            an explicit expiry is considered stale
+        :param purge_interval: minimal seconds between purges of stale
+            members done by queries
+        """
+        self._redis = redis
+        self._name = name
+        self._expires = f"{name}:expires"
+        self._ttl = ttl
+        self._purge_interval = purge_interval
+        self._purged = 0
+        self._geosearch = True
+
+    def __len__(self):
+        """get the number of indexed members"""
+        return self._redis.zcard(self._name)
+
+    def _expiry(self, expires_at):
+        if expires_at is None and self._ttl is not None:
+            return time.time() + self._ttl
+        return expires_at
+
+    def _add_commands(self, entries):
+        """
+        :param entries: iterable of (member, lon, lat, expires_at)
+        :returns: GEOADD and ZADD commands adding the entries
+        """
+        positions, expiries = [], []
+        for member, lon, lat, expires_at in entries:
+            positions += [lon, lat, member]
+            expires_at = self._expiry(expires_at)
+            if expires_at is not None:
+                expiries += [expires_at, member]
+
+        commands = []
+        if positions:
+            commands.append(("GEOADD", self._name, *positions))
+        if expiries:
+            commands.append(("ZADD", self._expires, *expiries))
+        return commands
+
+    def add(self, member, lon, lat, expires_at=None):
+        """
+        add a member or move it to a new position
+        :param member: member name, e.g. a user or request uid
+        :param lon: longitude
+        :param lat: latitude
+        :param expires_at: optional timestamp after which the member is stale
+        """
+        self.add_many([(member, lon, lat, expires_at)])
+
+    def add_many(self, entries):
+        """
+        add many members with a single round trip
+        :param entries: iterable of (member, lon, lat, expires_at)
+        """
+        pipe = self._redis.pipeline(transaction=False)
+        for command in self._add_commands(entries):
+            pipe.execute_command(*command)
+        pipe.execute()
+
+    async def add_many_async(self, redis, entries):
+        """
+        same as add_many from a coroutine
+        :param redis: asyncio redis client connected to the same server
+        """
+        for command in self._add_commands(entries):
+            await redis.execute_command(*command)
+
+    def remove(self, *members):
+        """ remove members from the index """
+        if not members:
+            return
+        pipe = self._redis.pipeline(transaction=False)
+        pipe.zrem(self._name, *members)
+        pipe.zrem(self._expires, *members)
+        pipe.execute()
+
+    def expire(self, now=None):
+        """
+        remove members whose expiry has passed
+        :returns: number of removed members
+        """
+        now = now if now is not None else time.time()
+        self._purged = time.monotonic()
+        stale = self._redis.zrangebyscore(self._expires, 0, now)
+        if stale:
+            self.remove(*stale)
+        return len(stale)
+
+    async def expire_async(self, redis, now=None):
+        """
+        same as expire from a coroutine
+        :param redis: asyncio redis client connected to the same server
+        """
+        now = now if now is not None else time.time()
+        self._purged = time.monotonic()
+        stale = await redis.zrangebyscore(self._expires, 0, now)
+        if stale:
+            await redis.zrem(self._name, *stale)
+            await redis.zrem(self._expires, *stale)
+        return len(stale)
+
+    def _purge_due(self):
+        return time.monotonic() - self._purged >= self._purge_interval
+
+    def _search_command(self, lon, lat, radius, count):
+        if self._geosearch:
+            command = ["GEOSEARCH", self._name, "FROMLONLAT", lon, lat,
+                       "BYRADIUS", radius, "m", "ASC", "WITHDIST"]
+        else:
+            command = ["GEORADIUS", self._name, lon, lat, radius, "m", "WITHDIST", "ASC"]
+        if count:
+            command += ["COUNT", count]
+        return command
+
+    def _unknown_command(self, error):
+        """ servers older than 6.2 only know GEORADIUS, any other error is raised """
+        if "unknown command" not in str(error).lower():
+            raise error
+        self._geosearch = False
+
+    def query(self, lon, lat, radius, count=None):
+        """
+        find members within radius of a point, nearest first
+        :param radius: radius in meters
+        :param count: optional maximal number of members
+        :returns: list of (member, distance in meters)
+        """
+        if self._purge_due():
+            self.expire()
+
+        try:
+            found = self._redis.execute_command(*self._search_command(lon, lat, radius, count))
+        except ResponseError as e:
+            if not self._geosearch:
+                raise
+            self._unknown_command(e)
+            found = self._redis.execute_command(*self._search_command(lon, lat, radius, count))
+        return [(_decode(member), float(dist)) for member, dist in found]
+
+    async def query_async(self, redis, lon, lat, radius, count=None):
+        """
+        same as query from a coroutine
+        :param redis: asyncio redis client connected to the same server
+        """
+        if self._purge_due():
+            await self.expire_async(redis)
+
+        try:
+            found = await redis.execute_command(*self._search_command(lon, lat, radius, count))
+        except Exception as e:
+            # the asyncio client raises its own ResponseError type
+            if not self._geosearch:
+                raise
+            self._unknown_command(e)
+            found = await redis.execute_command(*self._search_command(lon, lat, radius, count))
+        return [(_decode(member), float(dist)) for member, dist in found]
+
+    def members(self):
+        """ :returns: set of all indexed members """
+        return {_decode(member) for member in self._redis.zrange(self._name, 0, -1)}
+
+    def members_within(self, lon, lat, radius):
+        """ :returns: set of members within radius meters of a point """
+        return {member for member, _ in self.query(lon, lat, radius)}
+
+
+class BucketedGeoIndex:
+
+    def __init__(self, redis, name, bucket=3600, **kwargs):
+        """
+        initialize a GeoIndex split in time buckets, a member is added to
+        every bucket its [start, end] window overlaps and a query only reads
+        the buckets of its own window, each bucket key expires once its
+        time has passed
+        :param redis: redis client
+        :param name: key prefix, bucket n is kept in <name>:<n>
+        :param bucket: seconds covered by a bucket
+        :param kwargs: passed to the GeoIndex of each bucket
+        """
+        self._redis = redis
+        self._name = name
+        self._bucket = bucket
+        self._kwargs = kwargs
+        self._indexes = dict()
+
+    def _numbers(self, start, end):
+        return range(int(start // self._bucket), int(end // self._bucket) + 1)
+
+    def _index(self, number):
+        index = self._indexes.get(number)
+        if index is None:
+            # buckets whose time has passed are never queried again
+            current = int(time.time() // self._bucket)
+            for old in [n for n in self._indexes if n < current]:
+                del self._indexes[old]
+            index = self._indexes[number] = GeoIndex(self._redis, f"{self._name}:{number}", **self._kwargs)
+        return index
+
+    def _add_commands(self, entries):
+        """
+        :param entries: iterable of (member, lon, lat, start, end)
+        :returns: commands adding the entries to their buckets
+        """
+        buckets = dict()
+        for member, lon, lat, start, end in entries:
+            for number in self._numbers(start, end):
+                buckets.setdefault(number, []).append((member, lon, lat, end))
+
+        commands = []
+        for number, bucket in buckets.items():
+            index = self._index(number)
+            commands += index._add_commands(bucket)
+            expires_at = int((number + 1) * self._bucket)
+            commands += [("EXPIREAT", index._name, expires_at), ("EXPIREAT", index._expires, expires_at)]
+        return commands
+
+    def add(self, member, lon, lat, start, end):
+        """
+        add a member to the buckets of its window
+        :param start: start of the window, a timestamp
+        :param end: end of the window, the member is stale after it
+        """
+        self.add_many([(member, lon, lat, start, end)])
+
+    def add_many(self, entries):
+        """
+        add many members with a single round trip
+        :param entries: iterable of (member, lon, lat, start, end)
+        """
+        pipe = self._redis.pipeline(transaction=False)
+        for command in self._add_commands(entries):
+            pipe.execute_command(*command)
+        pipe.execute()
+
+    async def add_many_async(self, redis, entries):
+        """
+        same as add_many from a coroutine
+        :param redis: asyncio redis client connected to the same server
+        """
+        for command in self._add_commands(entries):
+            await redis.execute_command(*command)
+
+    def remove(self, member, start, end):
+        """ remove a member from the buckets of its window """
+        for number in self._numbers(start, end):
+            self._index(number).remove(member)
+
+    @staticmethod
+    def _merge(found, count):
+        """ nearest first, a member found in several buckets is kept once """
+        distances = dict()
+        for member, dist in found:
+            distances[member] = min(dist, distances.get(member, dist))
+        ranked = sorted(distances.items(), key=lambda x: x[1])
+        return ranked[:count] if count else ranked
+
+    def query(self, lon, lat, radius, start, end, count=None):
+        """
+        find members within radius of a point whose buckets overlap [start, end]
+        :param radius: radius in meters
+        :param count: optional maximal number of members read from each bucket
+            and returned
+        :returns: list of (member, distance in meters), nearest first
+        """
+        found = []
+        for number in self._numbers(start, end):
+            found += self._index(number).query(lon, lat, radius, count)
+        return self._merge(found, count)
+
+    async def query_async(self, redis, lon, lat, radius, start, end, count=None):
+        """
+        same as query from a coroutine
+        :param redis: asyncio redis client connected to the same server
+        """
+        found = []
+        for number in self._numbers(start, end):
+            found += await self._index(number).query_async(redis, lon, lat, radius, count)
+        return self._merge(found, count)
+
+    def members_within(self, lon, lat, radius, start, end):
+        """ :returns: set of members within radius meters of a point in the buckets of [start, end] """
+        return {member for member, _ in self.query(lon, lat, radius, start, end)}
+
+    def _live(self):
+        """ GeoIndex of every bucket still in redis """
+        numbers = set()
+        for key in self._redis.scan_iter(f"{self._name}:*"):
+            number = _decode(key)[len(self._name) + 1:]
+            if number.isdigit():
+                numbers.add(int(number))
+        return [self._index(number) for number in sorted(numbers)]
+
+    def expire(self, now=None):
+        """
+        remove members whose window has ended from every bucket
+        :returns: number of removed memberships
+        """
+        return sum(index.expire(now) for index in self._live())
+
+    def members(self):
+        """ :returns: set of all indexed members """
+        return set().union(*(index.members() for index in self._live()))
@@ -0,0 +1,142 @@
+import json
+import time
+from secrets import token_hex
+from threading import Thread, Event
+
+
+class LocationBuffer:
+
+    def __init__(self, redis, name="locations"):
+        """
+        initialize a new redis backed buffer of location pings,
+        only the latest ping of each user is kept
+        :param redis: redis client
+        :param name: key of the pending pings hash
+        """
+        self._redis = redis
+        self._pending = name
+
+    def __len__(self):
+        """get the number of users with a pending ping"""
+        return self._redis.hlen(self._pending)
+
+    @staticmethod
+    def _encode(pings):
+        """
+        :param pings: iterable of (uid, email, lon, lat, at)
+        :returns: hash mapping of uid and encoded ping
+        """
+        now = time.time()
+        mapping = dict()
+        for uid, email, lon, lat, at in pings:
+            # client clocks are not trusted past the server's, a clock
+            # ahead or a timestamp in ms would freeze the user's location
+            at = min(float(at), now) if at is not None else now
+            mapping[uid] = json.dumps({"email": email, "lon": lon, "lat": lat, "at": at})
+        return mapping
+
+    def push(self, uid, email, lon, lat, at=None):
+        """
+        buffer the location of a user
+        :param uid: user id
+        :param email: user email, used to invalidate cached users
+        :param lon: longitude
+        :param lat: latitude
+        :param at: optional ping timestamp, defaults to and is capped at now
+        """
+        return self.push_many([(uid, email, lon, lat, at)])
+
+    def push_many(self, pings):
+        """
+        buffer many locations with a single round trip
+        :param pings: iterable of (uid, email, lon, lat, at)
+        :returns: number of buffered pings
+        """
+        mapping = self._encode(pings)
+        if mapping:
+            self._redis.hmset(self._pending, mapping)
+        return len(mapping)
+
+    async def push_many_async(self, redis, pings):
+        """
+        same as push_many from a coroutine
+        :param redis: asyncio redis client connected to the same server
+        """
+        mapping = self._encode(pings)
+        if mapping:
+            await redis.hset(self._pending, mapping=mapping)
+        return len(mapping)
+
+    def take(self):
+        """
+        atomically take every pending ping, pings pushed meanwhile
+        are kept for the next take
+        :returns: dictionary of uid and ping
+        """
+        key = f"{self._pending}:taking:{token_hex(4)}"
+        pipe = self._redis.pipeline()
+        pipe.rename(self._pending, key)
+        pipe.hgetall(key)
+        pipe.delete(key)
+        # rename fails when nothing is pending
+        _, items, _ = pipe.execute(raise_on_error=False)
+        if not isinstance(items, dict):
+            return dict()
+        return {uid.decode(): json.loads(ping) for uid, ping in items.items()}
+
+    def restore(self, pings):
+        """
+        put taken pings back after a failed write, without
+        replacing pings pushed since they were taken
+        :param pings: dictionary of uid and ping
+        """
+        pipe = self._redis.pipeline()
+        for uid, ping in pings.items():
+            pipe.hsetnx(self._pending, uid, json.dumps(ping))
+        pipe.execute()
+
+
+class LocationFlusher(Thread):
+
+    def __init__(self, buffer, write, interval=1, batch_size=1000):
+        """
+        periodically write buffered locations in the background
+        :param buffer: LocationBuffer instance
+        :param write: callable(pings) storing a dictionary of uid and ping
+        :param interval: seconds between flushes
+        :param batch_size: pings written per call of write
+        """
+        super().__init__(daemon=True)
+        self._buffer = buffer
+        self._write = write
+        self._interval = interval
+        self._batch_size = batch_size
+        self._stopped = Event()
+
+    def flush(self):
+        """
+        write every pending ping
+        :returns: number of written pings
+        """
+        pings = list(self._buffer.take().items())
+        for i in range(0, len(pings), self._batch_size):
+            try:
+                self._write(dict(pings[i:i + self._batch_size]))
+            except Exception:
+                self._buffer.restore(dict(pings[i:]))
+                raise
+        return len(pings)
+
+    def run(self):
+        while not self._stopped.wait(self._interval):
+            try:
+                self.flush()
+            except Exception as e:
+                print(e)
+
+    def stop(self):
+        self._stopped.set()
+        try:
+            self.flush()
+        except Exception as e:
+            print(e)
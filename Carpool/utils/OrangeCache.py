@@ -0,0 +1,178 @@
+from collections import OrderedDict
+from heapq import heappush, heappop, heapify
+
+
+class ExpiryTable:
+
+    def __init__(self):
+        """ expiry timestamps of keys, grouped by database path """
+        self._by_path = dict()
+        self._heap = []
+        self._count = 0
+
+    def __len__(self):
+        """get the number of keys with an expiry"""
+        return self._count
+
+    def get(self, path, key):
+        """ :returns: expiry timestamp of a key or None """
+        return self._by_path.get(tuple(path), {}).get(key)
+
+    def set(self, path, key, at):
+        """
+        set the expiry of a key
+        :param path: database path of the key
+        :param key: targeted key
+        :param at: expiry timestamp, None removes the expiry
+        """
+        if at is None:
+            return self.discard(path, key)
+
+        keys = self._by_path.setdefault(tuple(path), dict())
+        if key not in keys:
+            self._count += 1
+        keys[key] = at
+        heappush(self._heap, (at, tuple(path), key))
+        self._compact()
+
+    def discard(self, path, key):
+        """ remove the expiry of a key """
+        keys = self._by_path.get(tuple(path))
+        if keys is None or key not in keys:
+            return
+        del keys[key]
+        self._count -= 1
+        if not keys:
+            del self._by_path[tuple(path)]
+        self._compact()
+
+    def discard_prefix(self, prefix):
+        """ remove the expiry of every key under a path """
+        prefix = tuple(prefix)
+        for path in [p for p in self._by_path if p[:len(prefix)] == prefix]:
+            self._count -= len(self._by_path.pop(path))
+        self._compact()
+
+    def _compact(self):
+        """
+        rebuild the heap once its stale entries of changed or removed
+        expiries outnumber the live ones
+        """
+        if len(self._heap) <= 2 * self._count:
+            return
+        self._heap = [(at, path, key) for path, keys in self._by_path.items()
+                      for key, at in keys.items()]
+        heapify(self._heap)
+
+    def next_due(self):
+        """ :returns: the earliest expiry timestamp or None """
+        while self._heap:
+            at, path, key = self._heap[0]
+            if self.get(path, key) == at:
+                return at
+            # stale heap entry of a changed or removed expiry
+            heappop(self._heap)
+        return None
+
+    def pop_due(self, now):
+        """
+        remove and return keys that expired at now
+        :returns: list of (path, key)
+        """
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            at, path, key = heappop(self._heap)
+            if self.get(path, key) == at:
+                self.discard(path, key)
+                due.append((path, key))
+        return due
+
+    def dump(self):
+        """ :returns: json serializable list of expiries """
+        return [[list(path), key, at] for path, keys in self._by_path.items()
+                for key, at in keys.items()]
+
+    def load(self, entries):
+        """ replace the table with dumped entries """
+        self._by_path = dict()
+        self._heap = []
+        self._count = 0
+        for path, key, at in entries:
+            self.set(path, key, at)
+
+
+class LRUPolicy:
+
+    def __init__(self):
+        """ evicts the least recently used key """
+        self._order = OrderedDict()
+
+    def add(self, key):
+        self._order[key] = None
+        self._order.move_to_end(key)
+
+    def touch(self, key):
+        if key in self._order:
+            self._order.move_to_end(key)
+
+    def remove(self, key):
+        self._order.pop(key, None)
+
+    def clear(self):
+        self._order.clear()
+
+    def victim(self):
+        """ :returns: key to evict or None """
+        return next(iter(self._order), None)
+
+
+class LFUPolicy:
+
+    def __init__(self):
+        """ evicts the least frequently used key, oldest first on ties """
+        self._freq = dict()
+        self._buckets = dict()
+        self._min = 0
+
+    def _bump(self, key, freq):
+        bucket = self._buckets.setdefault(freq, OrderedDict())
+        bucket[key] = None
+        self._freq[key] = freq
+
+    def _unlink(self, key):
+        freq = self._freq.pop(key)
+        bucket = self._buckets[freq]
+        del bucket[key]
+        if not bucket:
+            del self._buckets[freq]
+            if self._min == freq:
+                self._min = min(self._buckets, default=0)
+        return freq
+
+    def add(self, key):
+        freq = self._unlink(key) + 1 if key in self._freq else 1
+        self._bump(key, freq)
+        self._min = min(self._min, freq) if self._min else freq
+
+    def touch(self, key):
+        if key in self._freq:
+            freq = self._unlink(key) + 1
+            self._bump(key, freq)
+            self._min = min(self._buckets)
+
+    def remove(self, key):
+        if key in self._freq:
+            self._unlink(key)
+
+    def clear(self):
+        self._freq.clear()
+        self._buckets.clear()
+        self._min = 0
+
+    def victim(self):
+        """ :returns: key to evict or None """
+        bucket = self._buckets.get(self._min)
+        return next(iter(bucket), None) if bucket else None
+
+
+EVICTION_POLICIES = {"lru": LRUPolicy, "lfu": LFUPolicy}
@@ -1,10 +1,382 @@
+import atexit
+import io
 import json
+import mmap
 import os
-from threading import Thread
+import struct
+import tempfile
+import time
+from contextlib import contextmanager, nullcontext
+from threading import Thread, RLock, Event, Condition, Lock, local, get_ident
+
+from .OrangeIndex import INDEX_KINDS, _field, _MISSING as _MISSING_FIELD
+from .OrangeCache import ExpiryTable, EVICTION_POLICIES
+from .OrangeTypes import SortedSet, encode, decode, hashable
+from .OrangeSerializers import SERIALIZERS, COMPRESSORS, detect_compression, detect_serializer
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+BINARY_MAGIC = b"ORANGE\x00\x01"
+BINARY_HEADER = struct.Struct("<QQ")
+
+# dictionaries with fewer entries are stored inline instead of as a lazy table
+LAZY_TABLE_SIZE = 16
+
+# keys of the snapshot wrapper holding the journal sequence and key expiries
+_WRAPPER_KEYS = {"__seq__", "__data__", "__expires__"}
+
+_NO_LOCK = nullcontext()
+
+
+class ReadWriteLock:
+    """
+    lock shared by readers and held exclusively by one writer,
+    the writer side is reentrant and waiting writers go first
+    """
+
+    def __init__(self):
+        self._cond = Condition(Lock())
+        self._readers = 0
+        self._writer = None
+        self._depth = 0
+        self._waiting = 0
+        self._local = local()
+
+    def reading(self):
+        """ :returns: True if the current thread holds the lock as a reader """
+        return bool(getattr(self._local, "reading", 0))
+
+    @contextmanager
+    def read(self):
+        """ hold the lock as a reader """
+        if self._writer == get_ident() or getattr(self._local, "reading", 0):
+            yield
+            return
+
+        with self._cond:
+            while self._writer is not None or self._waiting:
+                self._cond.wait()
+            self._readers += 1
+        self._local.reading = 1
+        try:
+            yield
+        finally:
+            self._local.reading = 0
+            with self._cond:
+                self._readers -= 1
+                if not self._readers:
+                    self._cond.notify_all()
+
+    def __enter__(self):
+        """ hold the lock as the writer """
+        me = get_ident()
+        with self._cond:
+            if self._writer == me:
+                self._depth += 1
+                return self
+
+            self._waiting += 1
+            while self._writer is not None or self._readers:
+                self._cond.wait()
+            self._waiting -= 1
+            self._writer = me
+            self._depth = 1
+        return self
+
+    def __exit__(self, *exc):
+        with self._cond:
+            self._depth -= 1
+            if not self._depth:
+                self._writer = None
+                self._cond.notify_all()
+        return False
+
+
+class _Ref:
+    """ location of an undecoded value in a binary snapshot """
+
+    __slots__ = ("kind", "offset", "length")
+
+    def __init__(self, kind, offset, length):
+        self.kind = kind
+        self.offset = offset
+        self.length = length
+
+
+class LazyDict(dict):
+    """
+    dictionary backed by a binary snapshot,
+    values are decoded on first access
+    """
+
+    def __init__(self, buffer, index):
+        super().__init__((key, _Ref(*ref)) for key, ref in index.items())
+        self._buffer = buffer
+
+    def _decode(self, key, value):
+        if type(value) is _Ref:
+            value = _read_value(self._buffer, value)
+            dict.__setitem__(self, key, value)
+        return value
+
+    def _materialize(self):
+        for key in self:
+            self._decode(key, dict.__getitem__(self, key))
+
+    def __getitem__(self, key):
+        return self._decode(key, dict.__getitem__(self, key))
+
+    def __iter__(self):
+        # overriding __iter__ keeps dict(lazy) and {**lazy} off the
+        # dict fast path, which would copy the undecoded _Ref values
+        return dict.__iter__(self)
+
+    def __eq__(self, other):
+        self._materialize()
+        return dict.__eq__(self, other)
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __repr__(self):
+        self._materialize()
+        return dict.__repr__(self)
+
+    def get(self, key, default=None):
+        if key not in self:
+            return default
+        return self[key]
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            dict.__setitem__(self, key, default)
+            return default
+        return self[key]
+
+    def pop(self, key, *default):
+        value = dict.pop(self, key, *default)
+        return _read_value(self._buffer, value) if type(value) is _Ref else value
+
+    def popitem(self):
+        key, value = dict.popitem(self)
+        return key, _read_value(self._buffer, value) if type(value) is _Ref else value
+
+    def values(self):
+        self._materialize()
+        return dict.values(self)
+
+    def items(self):
+        self._materialize()
+        return dict.items(self)
+
+    def copy(self):
+        self._materialize()
+        return dict(self)
+
+
+def _dumps(value):
+    """ json encode a value, native sets and sorted sets included """
+    return json.dumps(value, default=encode)
+
+
+def _loads(data):
+    """ decode a value encoded by _dumps """
+    return json.loads(data, object_hook=decode)
+
+
+def _read_value(buffer, ref):
+    """ decode a value of a binary snapshot """
+    data = buffer[ref.offset:ref.offset + ref.length]
+    if ref.kind == "T":
+        return LazyDict(buffer, json.loads(data))
+    return _loads(data)
+
+
+def _write_value(value, f, table=False):
+    """
+    write a value into a binary snapshot, dictionaries are written
+    as tables so that their entries can be decoded lazily
+    :returns: [kind, offset, length] reference
+    """
+    if isinstance(value, LazyDict):
+        index = dict()
+        for key, item in dict.items(value):
+            if type(item) is _Ref:
+                # untouched since load, copy it without decoding
+                item = _read_value(value._buffer, item) if item.kind == "T" else item
+            index[key] = _copy_ref(value._buffer, item, f) if type(item) is _Ref else _write_value(item, f)
+        data = json.dumps(index).encode()
+    elif type(value) is dict and (table or len(value) >= LAZY_TABLE_SIZE):
+        index = {key: _write_value(item, f) for key, item in value.items()}
+        data = json.dumps(index).encode()
+    else:
+        data = _dumps(value).encode()
+        offset = f.tell()
+        f.write(data)
+        return ["J", offset, len(data)]
+
+    offset = f.tell()
+    f.write(data)
+    return ["T", offset, len(data)]
+
+
+def _copy_ref(buffer, ref, f):
+    """ copy an undecoded inline value into another snapshot """
+    offset = f.tell()
+    f.write(buffer[ref.offset:ref.offset + ref.length])
+    return [ref.kind, offset, ref.length]
+
+
+class BinarySerializer:
+    """ snapshots whose keys and child databases are decoded lazily """
+
+    magic = BINARY_MAGIC
+    available = True
+    package = None
+
+    def dumps(self, db):
+        f = io.BytesIO()
+        f.write(BINARY_MAGIC + BINARY_HEADER.pack(0, 0))
+        kind, offset, length = _write_value(db, f, table=True)
+        f.seek(len(BINARY_MAGIC))
+        f.write(BINARY_HEADER.pack(offset, length))
+        return f.getvalue()
+
+    def loads(self, buffer):
+        offset, length = BINARY_HEADER.unpack_from(buffer, len(BINARY_MAGIC))
+        return _read_value(buffer, _Ref("T", offset, length))
+
+
+SNAPSHOT_FORMATS = dict(SERIALIZERS, binary=BinarySerializer())
+
+
+def _codec(codecs, name):
+    """ :returns: named serializer or compressor, if its module is installed """
+    codec = codecs[name]
+    if not codec.available:
+        raise ValueError(f"{name} snapshots require the {codec.package} package")
+    return codec
+
+
+def _serialize(db, snapshot_format, compression=None):
+    """ serialize a database dictionary into bytes """
+    data = _codec(SNAPSHOT_FORMATS, snapshot_format).dumps(db)
+    if compression is not None:
+        data = _codec(COMPRESSORS, compression).compress(data)
+    return data
+
+
+def _read_snapshot(path):
+    """
+    load a snapshot, the format and compression are detected,
+    uncompressed binary snapshots are memory mapped
+    """
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return dict()
+
+    with open(path, "rb") as f:
+        head = f.read(len(BINARY_MAGIC))
+        compression = detect_compression(head)
+        if compression is None and detect_serializer(head, SNAPSHOT_FORMATS) == "binary":
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            return SNAPSHOT_FORMATS["binary"].loads(buffer)
+
+        f.seek(0)
+        data = f.read()
+
+    if compression is not None:
+        data = _codec(COMPRESSORS, compression).decompress(data)
+    return _codec(SNAPSHOT_FORMATS, detect_serializer(data, SNAPSHOT_FORMATS)).loads(data)
+
+
+def _atomic_write(path, data):
+    """
+    replace the file at path with data, the file is never
+    left empty or partially written
+    """
+    directory, name = os.path.split(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=name + ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def _apply(db, op, path, args):
+    """
+    apply a mutation to a database dictionary, used for
+    live updates as well as for replaying the journal
+    :param db: root dictionary
+    :param op: operation name
+    :param path: path of the child database the mutation targets
+    :param args: operation arguments
+    :returns: result of the operation
+    """
+    node = db
+    for div in path:
+        node = node.setdefault(div, dict())
+
+    if op == "set":
+        node[args[0]] = args[1]
+    elif op == "del":
+        return node.pop(args[0], None)
+    elif op == "clear":
+        node.clear()
+    elif op == "append":
+        node[args[0]].append(args[1])
+    elif op == "extend":
+        node[args[0]].extend(args[1])
+    elif op == "remove":
+        node[args[0]].remove(args[1])
+    elif op == "delindex":
+        del node[args[0]][args[1]]
+    elif op == "lpop":
+        return node[args[0]].pop()
+    elif op == "sadd":
+        # members replayed from a json journal come back as lists
+        members = node.setdefault(args[0], set())
+        size = len(members)
+        members.update(hashable(member) for member in args[1])
+        return len(members) - size
+    elif op == "srem":
+        members = node.get(args[0])
+        if not members:
+            return 0
+        removed = {hashable(member) for member in args[1]} & members
+        members.difference_update(removed)
+        return len(removed)
+    elif op == "zadd":
+        return node.setdefault(args[0], SortedSet()).update(args[1])
+    elif op == "zrem":
+        scores = node.get(args[0])
+        return sum(scores.remove(hashable(member)) for member in args[1]) if scores else 0
+    else:
+        raise ValueError(f"unknown operation {op}")
 
 
 class OrangeBase:
 
+    _path = []
+
     def __setitem__(self, key, value):
         """set a new item to the database"""
         return self.set(key, value)
@@ -15,7 +387,8 @@ class OrangeBase:
 
     def __len__(self):
         """get the size of the database"""
-        return len(self._db)
+        with self._root._reading():
+            return len(self._db)
 
     def __delitem__(self, key):
         """delete an item from the database"""
@@ -23,7 +396,8 @@ class OrangeBase:
 
     def __iter__(self):
         """make an iterable from the database"""
-        return iter(self._db)
+        with self._root._reading():
+            return iter(list(self._db) if self._root._concurrency else self._db)
 
     def __contains__(self, key):
         """check whether database contains a key"""
@@ -36,27 +410,83 @@ class OrangeBase:
         :param default: default value
         :returns: value or default value
         """
-        if key not in self._db:
-            return default
+        root = self._root
+        if root._tracking:
+            root._touch(self._path, key)
+
+        with root._reading():
+            if key not in self._db:
+                root._misses += 1
+                return default
 
-        return self._db[key]
+            root._hits += 1
+            return self._db[key]
 
-    def set(self, key, value, overwrite=True, dump=True):
+    def set(self, key, value, overwrite=True, dump=True, ttl=None):
         """
         set a new value for the given key
         :param key: targeted key
         :param value: associated value
         :param overwrite: would not overwrite if set to False
-        :param dump: would not dump if set to True, for bulk set
+        :param dump: would not dump if set to False, for bulk set
+        :param ttl: optional time to live in seconds, setting
+            a key without ttl removes its previous ttl
         :returns True: on success
         """
-        if not overwrite and key in self._db:
-            return False
+        with self._root._writing():
+            if not overwrite and self.has(key):
+                return False
+
+            self._mutate("set", key, value, dump=dump and ttl is None)
+            if ttl is not None:
+                self._mutate("expire", key, time.time() + ttl, dump=dump)
+        return True
+
+    def expire(self, key, ttl):
+        """
+        set a timeout on a key
+        :param key: targeted key
+        :param ttl: time to live in seconds
+        :returns: True if the key exists
+        """
+        with self._root._writing():
+            if not self.has(key):
+                return False
+
+            self._mutate("expire", key, time.time() + ttl)
+        return True
+
+    def persist(self, key):
+        """
+        remove the timeout of a key
+        :param key: targeted key
+        :returns: True if the key had a timeout
+        """
+        with self._root._writing():
+            if self._root._expires.get(self._path, key) is None:
+                return False
 
-        self._db[key] = value
-        self.dump(force=False)
+            self._mutate("expire", key, None)
         return True
 
+    def ttl(self, key):
+        """
+        get the remaining time to live of a key
+        :param key: targeted key
+        :returns: seconds left, -1 without timeout, -2 if key does not exist
+        """
+        if not self.has(key):
+            return -2
+
+        at = self._root._expires.get(self._path, key)
+        if at is None:
+            return -1
+        return max(0.0, at - time.time())
+
+    def stats(self):
+        """:returns: cache hit, miss, eviction and expiration counters"""
+        return self._root._stats()
+
     def setm(self, *args, overwrite=True):
         """
         set many new value and keys
@@ -64,10 +494,11 @@ class OrangeBase:
         :param overwrite: would not overwrite if set to False
         :returns: True on success
         """
-        for key, value in args:
-            self.set(key, value, overwrite, False)
+        with self._root._writing():
+            for key, value in args:
+                self.set(key, value, overwrite, False)
 
-        self.dump(force=False)
+            self._root._commit()
         return True
 
     def delete(self, key):
@@ -76,11 +507,11 @@ class OrangeBase:
         :param key: targeted key
         :returns: True on success
         """
-        if not key in self._db:
-            return False
+        with self._root._writing():
+            if not self.has(key):
+                return False
 
-        del self._db[key]
-        self.dump(force=False)
+            self._mutate("del", key)
         return True
 
     def clear(self):
@@ -88,8 +519,7 @@ class OrangeBase:
         clear the entire database
         :returns: True on success
         """
-        self._db.clear()
-        self.dump(force=False)
+        self._mutate("clear")
         return True
 
     def has(self, key):
@@ -98,7 +528,8 @@ class OrangeBase:
         :param key: targeted key
         :returns: True if key exists
         """
-        return key in self._db
+        with self._root._reading():
+            return key in self._db
 
     def pop(self, key, default=None):
         """
@@ -107,9 +538,11 @@ class OrangeBase:
         :param default: default value
         :returns: value or default
         """
-        value = self._db.pop(key, default)
-        self.dump(force=False)
-        return value
+        with self._root._writing():
+            if not self.has(key):
+                return default
+
+            return self._mutate("del", key)
 
     def incrby(self, key, increment):
         """
@@ -119,14 +552,15 @@ class OrangeBase:
         :param incremenet: increment value
         :returns: True on success
         """
-        if key not in self._db:
-            return False
+        with self._root._writing():
+            if key not in self._db:
+                return False
 
-        value = self.get(key)
-        if isinstance(value, int):
-            value += increment
-            self.set(key, value)
-            return True
+            value = self.get(key)
+            if isinstance(value, int):
+                value += increment
+                self.set(key, value)
+                return True
 
         return False
 
@@ -148,12 +582,78 @@ class OrangeBase:
         :param value: associated value
         :returns: True if value was set
         """
-        if key in self._db:
-            return False
+        with self._root._writing():
+            if self.has(key):
+                return False
 
-        self.set(key, value)
+            self.set(key, value)
         return True
 
+    def _mutate(self, op, *args, dump=True):
+        """
+        apply and persist a mutation of this database
+        :param op: operation name
+        :param args: operation arguments
+        :param dump: would not dump if set to False, for bulk updates
+        :returns: result of the operation
+        """
+        return self._root._mutate_path(op, self._path, args, dump)
+
+    def create_index(self, field, kind="hash"):
+        """
+        index a field of the dictionary values of this database, the index
+        is kept up to date by updates made through the database, such as
+        set, delete or hset, but not by in-place changes to stored values,
+        and it is not persisted
+        :param field: field of the dictionary values
+        :param kind: "hash" for equality or "sorted" for range lookups
+        :returns: True on success
+        """
+        return self._root._create_index(self._path, field, kind)
+
+    def drop_index(self, field):
+        """
+        drop the index of a field
+        :param field: indexed field
+        :returns: True if the index existed
+        """
+        return self._root._drop_index(self._path, field)
+
+    def find(self, range=None, **fields):
+        """
+        find dictionary values by their fields, indexed fields are
+        looked up in the index, other fields are scanned
+        :param range: optional (field, low, high) inclusive range,
+            None bounds are open, results are ordered by the field
+        :param fields: field=value equality conditions
+        :returns: dictionary of matching keys and values
+        """
+        indexes = self._root._indexes_for(self._path)
+        with self._root._reading():
+            keys = None
+            for field, value in fields.items():
+                if field in indexes:
+                    found = indexes[field].lookup(value)
+                else:
+                    found = {k for k, v in self._db.items() if _field(v, field) == value}
+                keys = found if keys is None else keys & found
+
+            if range is not None:
+                field, low, high = range
+                if field in indexes and hasattr(indexes[field], "range"):
+                    ordered = indexes[field].range(low, high)
+                else:
+                    ordered = [k for k, v in self._db.items()
+                               if _field(v, field) is not _MISSING_FIELD
+                               and (low is None or _field(v, field) >= low)
+                               and (high is None or _field(v, field) <= high)]
+                    ordered.sort(key=lambda k: _field(self._db[k], field))
+                keys = [k for k in ordered if keys is None or k in keys]
+            elif keys is None:
+                keys = list(self._db)
+
+            return {key: self._db[key] for key in keys if key in self._db}
+
     def child(self, path):
         """
         initialize a new child database
@@ -202,8 +702,7 @@ class OrangeBase:
         :param value: new value
         :returns: True on success
         """
-        self._db[key].append(value)
-        self.dump(force=False)
+        self._mutate("append", key, value)
         return True
 
     def ldellist(self, key):
@@ -223,8 +722,7 @@ class OrangeBase:
         :param value: targetd value
         :returns: True on success
         """
-        self[key].remove(value)
-        self.dump(force=False)
+        self._mutate("remove", key, value)
         return True
 
     def ldelindex(self, key, index):
@@ -234,8 +732,7 @@ class OrangeBase:
         :param index: value's index in list
         :returns: True on success
         """
-        del self[key][index]
-        self.dump(force=False)
+        self._mutate("delindex", key, index)
         return True
 
     def lhas(self, key, value):
@@ -254,8 +751,7 @@ class OrangeBase:
         :param sec: new sequence
         :returns: True on success
         """
-        self[key].extend(sec)
-        self.dump(force=False)
+        self._mutate("extend", key, list(sec))
         return True
 
     def lpop(self, key):
@@ -264,55 +760,902 @@ class OrangeBase:
         :param key: list's key
         :returns: popped value from list
         """
-        val = self[key].pop()
-        self.dump(force=False)
-        return val
+        return self._mutate("lpop", key)
+
+    def sadd(self, key, *members):
+        """
+        add members to a set, the set is created if needed
+        :param key: set's key
+        :param members: new members
+        :returns: number of added members
+        """
+        return self._mutate("sadd", key, list(members))
+
+    def srem(self, key, *members):
+        """
+        remove members from a set
+        :param key: set's key
+        :param members: targeted members
+        :returns: number of removed members
+        """
+        return self._mutate("srem", key, list(members))
+
+    def sismember(self, key, member):
+        """
+        check whether a member is in a set
+        :param key: set's key
+        :param member: targeted member
+        :returns: True if exists
+        """
+        with self._root._reading():
+            return member in self._db.get(key, ())
+
+    def smembers(self, key):
+        """
+        get the members of a set
+        :param key: set's key
+        :returns: copy of the set
+        """
+        with self._root._reading():
+            return set(self._db.get(key, ()))
+
+    def scard(self, key):
+        """
+        get set's size
+        :param key: set's key
+        :returns: number of members
+        """
+        with self._root._reading():
+            return len(self._db.get(key, ()))
+
+    def hset(self, key, field, value, dump=True):
+        """
+        set a field of a hash, only the field is written to the journal
+        :param key: hash's key
+        :param field: targeted field
+        :param value: associated value
+        :param dump: would not dump if set to False, for bulk set
+        :returns: True on success
+        """
+        self._root._mutate_path("set", self._path + [key], (field, value), dump)
+        return True
+
+    def hget(self, key, field, default=None):
+        """
+        get a field of a hash
+        :param key: hash's key
+        :param field: targeted field
+        :param default: default value
+        :returns: value or default value
+        """
+        with self._root._reading():
+            return self._db.get(key, {}).get(field, default)
+
+    def hdel(self, key, field):
+        """
+        delete a field of a hash
+        :param key: hash's key
+        :param field: targeted field
+        :returns: True if the field existed
+        """
+        with self._root._writing():
+            if field not in self._db.get(key, {}):
+                return False
+
+            self._root._mutate_path("del", self._path + [key], (field,))
+        return True
+
+    def hgetall(self, key):
+        """
+        get every field of a hash
+        :param key: hash's key
+        :returns: copy of the hash
+        """
+        with self._root._reading():
+            return dict(self._db.get(key, {}))
+
+    def hlen(self, key):
+        """
+        get hash's size
+        :param key: hash's key
+        :returns: number of fields
+        """
+        with self._root._reading():
+            return len(self._db.get(key, {}))
+
+    def hincrby(self, key, field, increment):
+        """
+        increment the integer value of a field of a hash,
+        a missing field starts at 0
+        :param key: hash's key
+        :param field: targeted field
+        :param increment: increment value
+        :returns: new value
+        """
+        with self._root._writing():
+            value = self.hget(key, field, 0) + increment
+            self.hset(key, field, value)
+        return value
+
+    def zadd(self, key, scores):
+        """
+        add members to a sorted set or update their scores,
+        the sorted set is created if needed
+        :param key: sorted set's key
+        :param scores: dictionary of members and scores
+        :returns: number of added members
+        """
+        return self._mutate("zadd", key, dict(scores))
+
+    def zrem(self, key, *members):
+        """
+        remove members from a sorted set
+        :param key: sorted set's key
+        :param members: targeted members
+        :returns: number of removed members
+        """
+        return self._mutate("zrem", key, list(members))
+
+    def zscore(self, key, member):
+        """
+        get the score of a member
+        :param key: sorted set's key
+        :param member: targeted member
+        :returns: score or None
+        """
+        with self._root._reading():
+            scores = self._db.get(key)
+            return scores.score(member) if scores else None
+
+    def zincrby(self, key, member, increment):
+        """
+        increment the score of a member, a missing member starts at 0
+        :param key: sorted set's key
+        :param member: targeted member
+        :param increment: increment value
+        :returns: new score
+        """
+        with self._root._writing():
+            score = (self.zscore(key, member) or 0) + increment
+            self.zadd(key, {member: score})
+        return score
+
+    def zrank(self, key, member):
+        """
+        get the position of a member in score order
+        :param key: sorted set's key
+        :param member: targeted member
+        :returns: rank or None
+        """
+        with self._root._reading():
+            scores = self._db.get(key)
+            return scores.rank(member) if scores else None
+
+    def zrange(self, key, start=0, stop=-1):
+        """
+        get members by position, both ends inclusive
+        :param key: sorted set's key
+        :param start: first position, negative counts from the end
+        :param stop: last position, negative counts from the end
+        :returns: list of (member, score)
+        """
+        with self._root._reading():
+            scores = self._db.get(key)
+            return scores.range(start, stop) if scores else []
+
+    def zrangebyscore(self, key, low=None, high=None):
+        """
+        get members whose score is within [low, high]
+        :param key: sorted set's key
+        :param low: lower bound, None for unbounded
+        :param high: upper bound, None for unbounded
+        :returns: list of (member, score) in score order
+        """
+        with self._root._reading():
+            scores = self._db.get(key)
+            return scores.range_by_score(low, high) if scores else []
+
+    def zcard(self, key):
+        """
+        get sorted set's size
+        :param key: sorted set's key
+        :returns: number of members
+        """
+        with self._root._reading():
+            scores = self._db.get(key)
+            return len(scores) if scores else 0
 
     def copy(self):
         """make a copy of the database's dictionary"""
-        return self._db.copy()
+        with self._root._reading():
+            return self._db.copy()
 
     def keys(self):
         """:returns: a list of the keys in the database"""
-        return self._db.keys()
+        with self._root._reading():
+            return list(self._db.keys()) if self._root._concurrency else self._db.keys()
 
     def values(self):
         """:returns: a list of the values in the database"""
-        return self._db.values()
+        with self._root._reading():
+            return list(self._db.values()) if self._root._concurrency else self._db.values()
 
     def items(self):
         """:returns: returns a list of tuples of key values"""
-        return self._db.items()
+        with self._root._reading():
+            return list(self._db.items()) if self._root._concurrency else self._db.items()
 
 
 class Orange(OrangeBase):
 
-    def __init__(self, file_path, auto_dump=True, load=True):
+    def __init__(self, file_path, auto_dump=True, load=True,
+                 storage="snapshot", compact_threshold=10000,
+                 flush_interval=None, flush_every=None, snapshot_format="json",
+                 concurrency=None, check_interval=0.1, max_entries=None,
+                 max_bytes=None, eviction="lru", expire_interval=1.0,
+                 compression=None):
         """
         initialize a new Orange database
         :param file_path: path to the db file
         :param auto_dump: automatically store db on updates
         :param load: will load database if is True
+        :param storage: "snapshot" rewrites the file on every update,
+            "log" appends each update to a journal next to the file
+        :param compact_threshold: number of journal records that
+            triggers a background compaction in log mode
+        :param flush_interval: if set, updates are written by a
+            background thread at most every flush_interval ms
+        :param flush_every: if set, updates are written once every
+            flush_every mutations
+        :param snapshot_format: "json", "msgpack" for a compact binary
+            encoding, or "binary" for a memory mapped snapshot whose keys
+            and child databases are decoded lazily, or any other name
+            of SNAPSHOT_FORMATS, the format is detected on load
+        :param concurrency: None, "thread" for a reader/writer lock shared
+            by threads, or "process" to also lock the file between
+            processes and reload changes made by other processes
+        :param check_interval: seconds between checks for changes made
+            by other processes, in process mode
+        :param max_entries: optional limit of top level keys
+        :param max_bytes: optional limit of the approximate serialized
+            size of the top level values
+        :param eviction: "lru" or "lfu", used when a limit is exceeded
+        :param expire_interval: seconds between background removals
+            of expired keys
+        :param compression: None, "gzip" or "zstd" for compressed
+            snapshots, the compression is detected on load
         """
+        if storage not in ("snapshot", "log"):
+            raise ValueError("storage must be snapshot or log")
+        if snapshot_format not in SNAPSHOT_FORMATS:
+            raise ValueError(f"snapshot_format must be one of {', '.join(SNAPSHOT_FORMATS)}")
+        if compression is not None and compression not in COMPRESSORS:
+            raise ValueError(f"compression must be None or one of {', '.join(COMPRESSORS)}")
+        _codec(SNAPSHOT_FORMATS, snapshot_format)
+        if compression is not None:
+            _codec(COMPRESSORS, compression)
+        if concurrency not in (None, "thread", "process"):
+            raise ValueError("concurrency must be None, thread or process")
+        if concurrency == "process" and fcntl is None:
+            raise ValueError("process concurrency requires fcntl")
+        if eviction not in EVICTION_POLICIES:
+            raise ValueError(f"eviction must be one of {', '.join(EVICTION_POLICIES)}")
+
         self._file_path = os.path.expanduser(file_path)
+        self._journal_path = self._file_path + ".journal"
         self._auto_dump = auto_dump
+        self._storage = storage
+        self._snapshot_format = snapshot_format
+        self._compression = compression
+        self._compact_threshold = compact_threshold
+        self._flush_interval = flush_interval
+        self._flush_every = flush_every
+        self._concurrency = concurrency
+        self._process = concurrency == "process"
+        self._check_interval = check_interval
+        self._journal = None
+        self._journal_size = 0
+        self._journal_offset = 0
+        self._compacting = False
+        # one compaction at a time, taken before _lock
+        self._compact_lock = Lock()
+        self._seq = 0
+        self._dirty = 0
+        self._batches = 0
+        self._lock = ReadWriteLock() if concurrency else RLock()
+        self._lock_file = open(self._file_path + ".lock", "a") if self._process else None
+        self._file_locked = False
+        self._signature = None
+        self._checked = 0
+        self._batch_contexts = []
+        self._closed = Event()
+        self._writer = None
+        self._generation = 0
+        self._indexes = dict()
+        self._expires = ExpiryTable()
+        self._expire_interval = expire_interval
+        self._expirer = None
+        self._max_entries = max_entries
+        self._max_bytes = max_bytes
+        self._policy = EVICTION_POLICIES[eviction]() if max_entries or max_bytes else None
+        self._policy_lock = Lock()
+        self._sizes = dict()
+        self._bytes = 0
+        self._tracking = self._policy is not None
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+        self._root = self
         self._db = None
         if load:
+            if self._process:
+                with self._file_lock(fcntl.LOCK_SH):
+                    self._load()
+            else:
+                self._load()
+        if flush_interval or flush_every:
+            atexit.register(self.flush)
+
+    def __enter__(self):
+        """
+        defer writes until the end of the block, in process
+        mode the block also holds the file lock
+        """
+        with self._lock:
+            if self._process:
+                context = self._writing()
+                context.__enter__()
+                self._batch_contexts.append(context)
+            self._batches += 1
+        return self
+
+    def __exit__(self, *exc):
+        """ write everything updated inside the block """
+        with self._lock:
+            self._batches -= 1
+            if not self._batches:
+                self.flush()
+            if self._process:
+                self._batch_contexts.pop().__exit__(*exc)
+        return False
+
+    @contextmanager
+    def _file_lock(self, operation):
+        """ hold an advisory lock on the lock file """
+        fcntl.flock(self._lock_file.fileno(), operation)
+        self._file_locked = True
+        try:
+            yield
+        finally:
+            self._file_locked = False
+            fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_UN)
+
+    @contextmanager
+    def _writing(self):
+        """
+        exclusive access for a read-modify-write, in process mode
+        changes from other processes are loaded first and every
+        update is written before the file lock is released
+        """
+        with self._lock:
+            if not self._process or self._file_locked:
+                yield
+                return
+
+            with self._file_lock(fcntl.LOCK_EX):
+                self._sync()
+                try:
+                    yield
+                finally:
+                    if self._dirty:
+                        self._write()
+                    self._signature = self._current_signature()
+
+    def _reading(self):
+        """ shared access for reads, a no-op without concurrency """
+        if self._process and time.monotonic() - self._checked >= self._check_interval:
+            self.refresh()
+        if self._tracking and not (self._concurrency and self._lock.reading()):
+            self.purge()
+
+        if self._concurrency is None:
+            return _NO_LOCK
+        return self._lock.read()
+
+    def _current_signature(self):
+        """ identity and size of the files, changes when another process writes """
+        signature = []
+        for path in (self._file_path, self._journal_path):
+            try:
+                st = os.stat(path)
+            except OSError:
+                signature.append(None)
+                continue
+            signature.append((st.st_ino, st.st_mtime_ns, st.st_size))
+        return tuple(signature)
+
+    def _sync(self):
+        """
+        load changes made by other processes, the file lock must be held
+        :returns: True if anything was reloaded
+        """
+        signature = self._current_signature()
+        if signature == self._signature:
+            return False
+
+        old = self._signature
+        if (self._storage == "log" and old is not None and old[0] == signature[0]
+                and old[1] is not None and signature[1] is not None
+                and old[1][0] == signature[1][0] and signature[1][2] >= self._journal_offset):
+            # only the journal grew, replay the new records
+            self._replay_journal()
+        else:
             self._load()
 
+        self._signature = signature
+        return True
+
+    def refresh(self):
+        """
+        reload the database if another process changed it
+        :returns: True if anything was reloaded
+        """
+        self._checked = time.monotonic()
+        if not self._process or self._file_locked:
+            return False
+        if self._current_signature() == self._signature:
+            return False
+
+        with self._lock:
+            with self._file_lock(fcntl.LOCK_SH):
+                return self._sync()
+
     def _load(self):
         """
         load the database from local storage
         :returns: True on success
         """
-        if os.path.exists(self._file_path):
-            try:
-                self._db = json.load(open(self._file_path, "r"))
-            except ValueError:
-                # in case the file is empty
-                self._db = dict()
+        self._db = _read_snapshot(self._file_path)
+        self._generation += 1
+
+        self._seq = 0
+        self._expires.load([])
+        if isinstance(self._db, dict) and "__data__" in self._db and set(self._db) <= _WRAPPER_KEYS:
+            wrapper = self._db
+            self._seq = wrapper.get("__seq__", 0)
+            self._expires.load(wrapper.get("__expires__", []))
+            self._db = wrapper["__data__"]
+
+        if self._storage == "log":
+            self._replay()
+        self._reset_cache()
+        if self._process:
+            self._signature = self._current_signature()
+        return True
+
+    def _replay(self):
+        """ replay the whole journal on top of the snapshot """
+        self._journal_size = 0
+        self._journal_offset = 0
+        self._replay_journal()
+
+        if self._journal is not None:
+            self._journal.close()
+        self._journal = open(self._journal_path, "a")
+
+    def _replay_journal(self):
+        """ replay the journal records after _journal_offset """
+        if not os.path.exists(self._journal_path):
+            return
+
+        valid = self._journal_offset
+        with open(self._journal_path, "rb") as f:
+            f.seek(valid)
+            for line in f:
+                try:
+                    record = _loads(line)
+                except ValueError:
+                    # torn write at the end of the journal
+                    break
+                valid += len(line)
+                if record["s"] <= self._seq:
+                    continue
+                if record["o"] == "expire":
+                    self._expires.set(record["p"], *record["a"])
+                else:
+                    _apply(self._db, record["o"], record["p"], record["a"])
+                    self._track(record["o"], record["p"], record["a"])
+                self._seq = record["s"]
+                # indexes are rebuilt after a replay
+                self._generation += 1
+                self._journal_size += 1
+
+        if valid < os.path.getsize(self._journal_path):
+            with open(self._journal_path, "ab") as f:
+                f.truncate(valid)
+        self._journal_offset = valid
+
+    def _mutate_path(self, op, path, args, dump=True):
+        """
+        apply a mutation to the database at path and persist it, by
+        rewriting the snapshot or by appending a record to the journal
+        """
+        with self._writing():
+            parent = None
+            if self._indexes:
+                self._unindex(op, path, args)
+                parent = self._parent_indexes(op, path)
+                if parent:
+                    self._reindex(parent, path, remove=True)
+
+            if op == "expire":
+                result = self._expires.set(path, *args)
+                if args[1] is not None:
+                    self._tracking = True
+                    self._start_expirer()
+            else:
+                result = _apply(self._db, op, path, args)
+                if self._indexes and op == "set":
+                    for index in self._indexes.get(tuple(path), {}).values():
+                        index.add(args[0], args[1])
+                if parent:
+                    self._reindex(parent, path)
+                self._track(op, path, args)
+
+            self._record(op, path, args)
+            if self._policy is not None and op == "set":
+                self._evict()
+            if dump:
+                self._commit()
+        return result
+
+    def _parent_indexes(self, op, path):
+        """ indexes of the database holding the value changed in place by op """
+        if not path or op == "expire":
+            return None
+        return self._indexes.get(tuple(path[:-1]))
+
+    def _reindex(self, indexes, path, remove=False):
+        """ remove or add the value at path to the indexes of its database """
+        node = self._node(path[:-1])
+        if node is None or path[-1] not in node:
+            return
+        for index in indexes.values():
+            if remove:
+                index.remove(path[-1], node[path[-1]])
+            else:
+                index.add(path[-1], node[path[-1]])
+
+    def _node(self, path):
+        """ dictionary at path or None """
+        node = self._db
+        for div in path:
+            node = node.get(div) if isinstance(node, dict) else None
+        return node if isinstance(node, dict) else None
+
+    def _track(self, op, path, args):
+        """ update expiries and the eviction policy after a mutation """
+        path = tuple(path)
+        if self._expires:
+            if op in ("set", "del"):
+                self._expires.discard(path, args[0])
+                self._expires.discard_prefix(path + (args[0],))
+            elif op == "clear":
+                self._expires.discard_prefix(path)
+
+        if self._policy is None:
+            return
+
+        with self._policy_lock:
+            self._track_policy(op, path, args)
+
+    def _track_policy(self, op, path, args):
+        key = path[0] if path else (args[0] if args else None)
+        if not path and op == "del":
+            self._policy.remove(key)
+            self._bytes -= self._sizes.pop(key, 0)
+        elif not path and op == "clear":
+            self._policy.clear()
+            self._sizes.clear()
+            self._bytes = 0
+        elif key is not None:
+            self._policy.add(key)
+            if self._max_bytes and op in ("set", "append", "extend", "sadd", "zadd"):
+                size = len(json.dumps(args[-1], default=repr))
+                if not path and op == "set":
+                    self._bytes -= self._sizes.get(key, 0)
+                    self._sizes[key] = size
+                else:
+                    # nested updates only grow the estimate
+                    self._sizes[key] = self._sizes.get(key, 0) + size
+                self._bytes += size
+
+    def _reset_cache(self):
+        """ rebuild the eviction policy after a load """
+        if self._expires:
+            self._tracking = True
+            self._start_expirer()
+        if self._policy is None:
+            return
+
+        with self._policy_lock:
+            self._policy.clear()
+            self._sizes.clear()
+            self._bytes = 0
+            for key in list(self._db):
+                self._policy.add(key)
+                if self._max_bytes:
+                    self._sizes[key] = len(json.dumps(self._db[key], default=repr))
+                    self._bytes += self._sizes[key]
+
+    def _evict(self):
+        """ evict keys until the limits are met """
+        while ((self._max_entries and len(self._db) > self._max_entries) or
+               (self._max_bytes and self._bytes > self._max_bytes)):
+            with self._policy_lock:
+                victim = self._policy.victim()
+            if victim is None:
+                break
+            self._mutate_path("del", [], (victim,), dump=False)
+            self._evictions += 1
+
+    def _touch(self, path, key):
+        """ record an access for the eviction policy """
+        if self._policy is not None:
+            with self._policy_lock:
+                self._policy.touch(path[0] if path else key)
+
+    def _start_expirer(self):
+        """ start the background expiry thread once """
+        if self._expirer is not None:
+            return
+
+        self._expirer = Thread(target=self._expire_loop, daemon=True)
+        self._expirer.start()
+
+    def _expire_loop(self):
+        while not self._closed.wait(self._expire_interval):
+            self.purge()
+
+    def purge(self):
+        """
+        delete every expired key now
+        :returns: number of deleted keys
+        """
+        at = self._expires.next_due()
+        if at is None or at > time.time():
+            return 0
+
+        with self._writing():
+            due = self._expires.pop_due(time.time())
+            for path, key in due:
+                node = self._node(path)
+                if node is not None and key in node:
+                    self._mutate_path("del", list(path), (key,), dump=False)
+            self._expirations += len(due)
+            if due:
+                self._commit()
+        return len(due)
+
+    def _stats(self):
+        return {
+            "hits": self._hits,
+            "misses": self._misses,
+            "evictions": self._evictions,
+            "expirations": self._expirations,
+            "keys": len(self._db),
+            "bytes": self._bytes,
+        }
+
+    def _snapshot(self, seq=False):
+        """ what is written to the snapshot file, expired keys are left out """
+        self.purge()
+        if not seq and not self._expires:
+            return self._db
+
+        wrapper = {"__data__": self._db}
+        if seq:
+            wrapper["__seq__"] = self._seq
+        if self._expires:
+            wrapper["__expires__"] = self._expires.dump()
+        return wrapper
+
+    def _create_index(self, path, field, kind):
+        """ create an index on the database at path """
+        if kind not in INDEX_KINDS:
+            raise ValueError(f"index kind must be one of {', '.join(INDEX_KINDS)}")
+
+        with self._lock:
+            self._indexes.setdefault(tuple(path), dict())[field] = INDEX_KINDS[kind](field)
+        return True
+
+    def _drop_index(self, path, field):
+        """ drop an index of the database at path """
+        with self._lock:
+            return self._indexes.get(tuple(path), {}).pop(field, None) is not None
+
+    def _indexes_for(self, path):
+        """ indexes of the database at path, rebuilding the stale ones """
+        indexes = self._indexes.get(tuple(path))
+        if not indexes:
+            return {}
+
+        with self._lock:
+            for index in indexes.values():
+                if index.stale or index.generation != self._generation:
+                    node = self._node(path)
+                    index.build(node.items() if node is not None else ())
+                    index.generation = self._generation
+        return indexes
+
+    def _unindex(self, op, path, args):
+        """ update indexes before a mutation is applied """
+        path = tuple(path)
+        if op in ("set", "del"):
+            node = self._db
+            for div in path:
+                node = node.get(div) if isinstance(node, dict) else None
+            if isinstance(node, dict) and args[0] in node:
+                for index in self._indexes.get(path, {}).values():
+                    index.remove(args[0], node[args[0]])
+            target = path + (args[0],)
+        elif op == "clear":
+            target = path
         else:
-            self._db = dict()
+            return
+
+        # indexes inside a replaced or cleared subtree are rebuilt on use
+        for indexed, indexes in self._indexes.items():
+            if indexed[:len(target)] == target:
+                for index in indexes.values():
+                    index.stale = True
+
+    def _record(self, op, path, args):
+        """ mark an applied mutation as dirty, journaling it in log mode """
+        if not self._auto_dump:
+            return False
+
+        with self._lock:
+            self._dirty += 1
+            if self._storage != "log":
+                return True
+
+            if self._journal is None:
+                self._journal = open(self._journal_path, "a")
+            self._seq += 1
+            self._journal.write(_dumps({"s": self._seq, "o": op, "p": path, "a": args}) + "\n")
+            self._journal_size += 1
+
+            if self._journal_size >= self._compact_threshold and not self._compacting:
+                self._compacting = True
+                if self._process:
+                    # the file lock is held, compact before releasing it
+                    self.compact()
+                else:
+                    Thread(target=self.compact, daemon=True).start()
+        return True
+
+    def _commit(self):
+        """ write dirty updates according to the flush policy """
+        with self._lock:
+            if not self._dirty or self._batches or self._process:
+                # process mode writes when the file lock is released
+                return False
+
+            if self._flush_every and self._dirty >= self._flush_every:
+                return self._write()
+
+            if self._flush_interval:
+                self._start_writer()
+                return False
+
+            if self._flush_every:
+                return False
+            return self._write()
+
+    def _start_writer(self):
+        """ start the background writer thread once """
+        if self._writer is not None:
+            return
+
+        self._writer = Thread(target=self._write_loop, daemon=True)
+        self._writer.start()
+
+    def _write_loop(self):
+        """ coalesce dirty updates and write them every flush_interval ms """
+        while not self._closed.wait(self._flush_interval / 1000):
+            with self._lock:
+                if self._dirty and not self._batches:
+                    self._write()
+
+    def _write(self):
+        """ write dirty updates to the file """
+        with self._lock:
+            if self._storage == "log":
+                self._journal.flush()
+                self._journal_offset = self._journal.tell()
+            else:
+                self._dump_to(self._file_path)
+            self._dirty = 0
+        return True
+
+    def _dump_to(self, path):
+        """ serialize the database into path """
+        _atomic_write(path, _serialize(self._snapshot(), self._snapshot_format,
+                                       self._compression))
+
+    def flush(self):
+        """
+        durability barrier, write every pending update now
+        :returns: True on success
+        """
+        with self._lock:
+            if self._dirty:
+                self._write()
+            if self._storage == "log" and self._journal is not None:
+                self._journal.flush()
+                os.fsync(self._journal.fileno())
+        return True
+
+    def close(self):
+        """
+        flush pending updates and stop the background writer
+        :returns: True on success
+        """
+        self.flush()
+        self._closed.set()
+        with self._lock:
+            if self._journal is not None:
+                self._journal.close()
+                self._journal = None
+            if self._lock_file is not None:
+                self._lock_file.close()
+                self._lock_file = None
+        return True
+
+    def compact(self):
+        """
+        fold the journal into the snapshot, records written while
+        the snapshot is stored are kept in the journal
+        :returns: True on success
+        """
+        if self._process:
+            with self._writing():
+                return self._compact()
+        return self._compact()
+
+    def _compact(self):
+        with self._compact_lock:
+            try:
+                with self._lock:
+                    data = _serialize(self._snapshot(seq=True), self._snapshot_format,
+                                      self._compression)
+                    if self._journal is not None:
+                        self._journal.flush()
+                        offset = self._journal.tell()
+                    else:
+                        offset = 0
+
+                _atomic_write(self._file_path, data)
+
+                with self._lock:
+                    tail = ""
+                    if self._journal is not None:
+                        self._journal.flush()
+                    if os.path.exists(self._journal_path):
+                        with open(self._journal_path, "r") as f:
+                            f.seek(offset)
+                            tail = f.read()
+
+                    if self._journal is not None:
+                        self._journal.close()
+                    _atomic_write(self._journal_path, tail.encode())
+                    self._journal = open(self._journal_path, "a")
+                    self._journal_size = tail.count("\n")
+                    self._journal_offset = len(tail.encode())
+            finally:
+                self._compacting = False
         return True
 
     def dump(self, force=True, path=None):
@@ -322,16 +1665,56 @@ class Orange(OrangeBase):
         :param path: optional path could also be provided
         :returns: True on success
         """
+        if self._storage == "log" and not path:
+            # updates are already journaled, a forced dump compacts
+            return self.compact() if force else False
+
         if force or self._auto_dump:
-            path = os.path.expanduser(path) if path else self._file_path
-            thread = Thread(target=json.dump,
-                            args=(self._db, open(path, "w")))
-            thread.start()
-            thread.join()
-            return True
+            if path:
+                with self._lock:
+                    self._dump_to(os.path.expanduser(path))
+                return True
+            with self._writing():
+                return self._write()
 
         return False
 
+    def migrate(self, snapshot_format=None, compression=None):
+        """
+        rewrite the snapshot in another format, later dumps keep it
+        :param snapshot_format: new snapshot format, unchanged if None
+        :param compression: new compression, None for uncompressed
+        :returns: True on success
+        """
+        snapshot_format = snapshot_format or self._snapshot_format
+        _codec(SNAPSHOT_FORMATS, snapshot_format)
+        if compression is not None:
+            _codec(COMPRESSORS, compression)
+
+        with self._writing():
+            self._snapshot_format = snapshot_format
+            self._compression = compression
+            if self._storage != "log":
+                self._dump_to(self._file_path)
+                return True
+        return self.compact()
+
+
+def migrate(file_path, snapshot_format="json", compression=None, **kwargs):
+    """
+    convert a database file to another snapshot format
+    :param file_path: path to the db file
+    :param snapshot_format: new snapshot format
+    :param compression: None, "gzip" or "zstd"
+    :param kwargs: passed to Orange, e.g. storage="log"
+    :returns: True on success
+    """
+    db = Orange(file_path, **kwargs)
+    try:
+        return db.migrate(snapshot_format, compression)
+    finally:
+        db.close()
+
 
 class OrangeChild(OrangeBase):
 
@@ -346,9 +1729,21 @@ class OrangeChild(OrangeBase):
             raise Exception("path is not valid")
 
         self._parent = parent
-        self._db = None
+        self._root = parent._root
+        self._path = parent._path + self._path
         self._load_child_db()
 
+    @property
+    def _db(self):
+        """ the child dictionary, looked up from the root on every access
+        so that reloads and replaced parents are picked up """
+        node = self._root._db
+        for div in self._path:
+            node = node.get(div)
+            if not isinstance(node, dict):
+                return self._load_child_db()
+        return node
+
     @staticmethod
     def _parse_path(path):
         """ parses the path """
@@ -361,24 +1756,13 @@ class OrangeChild(OrangeBase):
 
     def _load_child_db(self):
         """ process and load child db """
-        curr_db = self._parent._db
+        curr_db = self._root._db
         for div in self._path:
             if not div in curr_db:
                 curr_db[div] = dict()
             curr_db = curr_db[div]
-        self._db = curr_db
+        return curr_db
 
     def dump(self, *args, **kwargs):
         """ dumpt the child database """
         return self._parent.dump(*args, **kwargs)
-
-    def clear(self):
-        """ clear child database """
-        parent = self._parent._db
-        for div in self._path[:-1]:
-            parent = parent[div]
-
-        parent[self._path[-1]] = dict()
-        self.dump(force=False)
-        self._load_child_db()
-        return True
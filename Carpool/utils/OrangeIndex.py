@@ -0,0 +1,142 @@
+from bisect import bisect_left, bisect_right, insort
+
+_MISSING = object()
+
+
+def _field(value, field):
+    """ value of a field of a dictionary value, or _MISSING """
+    if not isinstance(value, dict):
+        return _MISSING
+    return value.get(field, _MISSING)
+
+
+class HashIndex:
+
+    def __init__(self, field):
+        """
+        initialize a new hash index, maps field values to keys
+        :param field: indexed field of the dictionary values
+        """
+        self.field = field
+        self.stale = True
+        self.generation = None
+        self._map = dict()
+
+    def build(self, items):
+        """
+        rebuild the index
+        :param items: (key, value) pairs of the indexed database
+        """
+        self._map = dict()
+        for key, value in items:
+            self.add(key, value)
+        self.stale = False
+
+    def add(self, key, value):
+        """ index a value stored under key """
+        field = _field(value, self.field)
+        if field is _MISSING:
+            return
+        try:
+            self._map.setdefault(field, set()).add(key)
+        except TypeError:
+            # unhashable field values are not indexed
+            pass
+
+    def remove(self, key, value):
+        """ drop a value stored under key from the index """
+        field = _field(value, self.field)
+        if field is _MISSING:
+            return
+        try:
+            keys = self._map.get(field)
+        except TypeError:
+            return
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._map[field]
+
+    def lookup(self, value):
+        """ :returns: set of keys whose field equals value """
+        try:
+            return set(self._map.get(value, ()))
+        except TypeError:
+            return set()
+
+
+class SortedIndex(HashIndex):
+
+    def __init__(self, field):
+        """
+        initialize a new sorted index, supports range lookups
+        over numbers and strings, numbers sort before strings
+        :param field: indexed field of the dictionary values
+        """
+        super().__init__(field)
+        self._entries = []
+
+    @staticmethod
+    def _sort_key(value):
+        if isinstance(value, (int, float)):
+            return (0, value)
+        if isinstance(value, str):
+            return (1, value)
+        return None
+
+    def build(self, items):
+        entries = []
+        for key, value in items:
+            sort_key = self._sort_key(_field(value, self.field))
+            if sort_key is not None:
+                entries.append((sort_key, key))
+        entries.sort()
+        self._entries = entries
+        self.stale = False
+
+    def add(self, key, value):
+        sort_key = self._sort_key(_field(value, self.field))
+        if sort_key is not None:
+            insort(self._entries, (sort_key, key))
+
+    def remove(self, key, value):
+        sort_key = self._sort_key(_field(value, self.field))
+        if sort_key is None:
+            return
+        i = bisect_left(self._entries, (sort_key, key))
+        if i < len(self._entries) and self._entries[i] == (sort_key, key):
+            del self._entries[i]
+
+    def lookup(self, value):
+        return set(self.range(value, value))
+
+    def range(self, low=None, high=None):
+        """
+        keys whose field is within [low, high], in field order
+        :param low: lower bound, None for unbounded
+        :param high: upper bound, None for unbounded
+        :returns: list of keys
+        """
+        start, end = 0, len(self._entries)
+        if low is not None:
+            start = bisect_left(self._entries, (self._sort_key(low),))
+        if high is not None:
+            # every entry with an equal field sorts before this probe
+            end = bisect_right(self._entries, (self._sort_key(high), _Greatest()))
+        return [key for _, key in self._entries[start:end]]
+
+
+class _Greatest:
+    """ compares greater than any key """
+
+    def __lt__(self, other):
+        return False
+
+    def __gt__(self, other):
+        return True
+
+    def __eq__(self, other):
+        return isinstance(other, _Greatest)
+
+
+INDEX_KINDS = {"hash": HashIndex, "sorted": SortedIndex}
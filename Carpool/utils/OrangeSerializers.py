@@ -0,0 +1,146 @@
+import gzip
+import json
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+from .OrangeTypes import SortedSet, encode, decode
+
+# msgpack extension codes of the native types
+_EXT_SET = 1
+_EXT_ZSET = 2
+_EXT_TUPLE = 3
+
+
+class JsonSerializer:
+    """ readable json snapshots, the default and fallback format """
+
+    magic = b""
+    available = True
+    package = None
+
+    def dumps(self, value):
+        """ :returns: bytes of an encoded value """
+        return json.dumps(value, default=encode).encode()
+
+    def loads(self, data):
+        """ :returns: value decoded from bytes """
+        return json.loads(data, object_hook=decode)
+
+
+class MsgpackSerializer:
+    """ compact msgpack snapshots, also keep bytes and tuples """
+
+    magic = b"ORANGE\x00\x02"
+    available = msgpack is not None
+    package = "msgpack"
+
+    @staticmethod
+    def _default(value):
+        if isinstance(value, dict):
+            # lazily loaded dictionaries are decoded before packing
+            return dict(value.items())
+        if isinstance(value, (set, frozenset)):
+            return msgpack.ExtType(_EXT_SET, MsgpackSerializer._pack(list(value)))
+        if isinstance(value, SortedSet):
+            return msgpack.ExtType(_EXT_ZSET, MsgpackSerializer._pack(value.items()))
+        if isinstance(value, tuple):
+            return msgpack.ExtType(_EXT_TUPLE, MsgpackSerializer._pack(list(value)))
+        raise TypeError(f"Object of type {type(value).__name__} is not serializable")
+
+    @staticmethod
+    def _ext_hook(code, data):
+        value = MsgpackSerializer._unpack(data)
+        if code == _EXT_SET:
+            return set(value)
+        if code == _EXT_ZSET:
+            return SortedSet(dict(value))
+        if code == _EXT_TUPLE:
+            return tuple(value)
+        return msgpack.ExtType(code, data)
+
+    @staticmethod
+    def _pack(value):
+        return msgpack.packb(value, default=MsgpackSerializer._default,
+                             use_bin_type=True, strict_types=True)
+
+    @staticmethod
+    def _unpack(data):
+        return msgpack.unpackb(data, ext_hook=MsgpackSerializer._ext_hook,
+                               raw=False, strict_map_key=False)
+
+    def dumps(self, value):
+        return self.magic + self._pack(value)
+
+    def loads(self, data):
+        return self._unpack(bytes(data[len(self.magic):]))
+
+
+class GzipCompressor:
+    """ gzip compression, always available """
+
+    magic = b"\x1f\x8b"
+    available = True
+    package = None
+
+    def __init__(self, level=6):
+        self._level = level
+
+    def compress(self, data):
+        return gzip.compress(data, compresslevel=self._level)
+
+    def decompress(self, data):
+        return gzip.decompress(data)
+
+
+class ZstdCompressor:
+    """ zstandard compression, faster than gzip at a similar ratio """
+
+    magic = b"\x28\xb5\x2f\xfd"
+    available = zstandard is not None
+    package = "zstandard"
+
+    def __init__(self, level=3):
+        self._level = level
+
+    def compress(self, data):
+        return zstandard.ZstdCompressor(level=self._level).compress(data)
+
+    def decompress(self, data):
+        # streamed so that frames without a content size are supported
+        return zstandard.ZstdDecompressor().decompressobj().decompress(data)
+
+
+SERIALIZERS = {"json": JsonSerializer(), "msgpack": MsgpackSerializer()}
+COMPRESSORS = {"gzip": GzipCompressor(), "zstd": ZstdCompressor()}
+
+
+def detect_compression(data):
+    """
+    find the compression of a snapshot by its leading bytes
+    :returns: compressor name or None
+    """
+    for name, compressor in COMPRESSORS.items():
+        if data[:len(compressor.magic)] == compressor.magic:
+            return name
+    return None
+
+
+def detect_serializer(data, serializers):
+    """
+    find the format of an uncompressed snapshot by its leading bytes
+    :param data: bytes or buffer of the snapshot
+    :param serializers: dictionary of the candidate serializers
+    :returns: serializer name, json when no magic matches
+    """
+    for name, serializer in serializers.items():
+        if serializer.magic and data[:len(serializer.magic)] == serializer.magic:
+            return name
+    return "json"
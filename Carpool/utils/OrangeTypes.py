@@ -0,0 +1,146 @@
+from base64 import b64decode, b64encode
+from bisect import bisect_left, bisect_right, insort
+
+from .OrangeIndex import _Greatest
+
+
+class SortedSet:
+
+    def __init__(self, scores=None):
+        """
+        initialize a new sorted set, members are ordered by score
+        and members with equal scores by their value
+        :param scores: optional dictionary of members and scores
+        """
+        self._scores = dict()
+        self._entries = []
+        if scores:
+            self.update(scores)
+
+    def __len__(self):
+        """get the number of members"""
+        return len(self._scores)
+
+    def __contains__(self, member):
+        """check whether a member is in the set"""
+        return member in self._scores
+
+    def __iter__(self):
+        """iterate over the members in score order"""
+        return (member for _, member in self._entries)
+
+    def __eq__(self, other):
+        return isinstance(other, SortedSet) and self._scores == other._scores
+
+    def __repr__(self):
+        return f"SortedSet({self.items()})"
+
+    def score(self, member):
+        """ :returns: score of a member or None """
+        return self._scores.get(member)
+
+    def add(self, member, score):
+        """
+        add a member or update its score
+        :returns: True if the member is new
+        """
+        old = self._scores.get(member)
+        if old is not None:
+            if old == score:
+                return False
+            del self._entries[bisect_left(self._entries, (old, member))]
+        self._scores[member] = score
+        insort(self._entries, (score, member))
+        return old is None
+
+    def update(self, scores):
+        """
+        add members or update their scores
+        :returns: number of new members
+        """
+        return sum(self.add(member, score) for member, score in scores.items())
+
+    def remove(self, member):
+        """
+        remove a member
+        :returns: True if the member existed
+        """
+        score = self._scores.pop(member, None)
+        if score is None:
+            return False
+        del self._entries[bisect_left(self._entries, (score, member))]
+        return True
+
+    def rank(self, member):
+        """ :returns: position of a member in score order or None """
+        score = self._scores.get(member)
+        if score is None:
+            return None
+        return bisect_left(self._entries, (score, member))
+
+    def range(self, start=0, stop=-1):
+        """
+        members by position, both ends inclusive like redis ZRANGE
+        :returns: list of (member, score)
+        """
+        length = len(self._entries)
+        start = max(start + length if start < 0 else start, 0)
+        stop = stop + length if stop < 0 else stop
+        return [(member, score) for score, member in self._entries[start:stop + 1]]
+
+    def range_by_score(self, low=None, high=None):
+        """
+        members whose score is within [low, high]
+        :param low: lower bound, None for unbounded
+        :param high: upper bound, None for unbounded
+        :returns: list of (member, score) in score order
+        """
+        start, end = 0, len(self._entries)
+        if low is not None:
+            start = bisect_left(self._entries, (low,))
+        if high is not None:
+            end = bisect_right(self._entries, (high, _Greatest()))
+        return [(member, score) for score, member in self._entries[start:end]]
+
+    def items(self):
+        """ :returns: list of (member, score) in score order """
+        return [(member, score) for score, member in self._entries]
+
+    def copy(self):
+        return SortedSet(self._scores)
+
+
+def hashable(value):
+    """
+    json turns tuples into lists, so set and sorted set members
+    read back from json are turned back into tuples
+    """
+    if isinstance(value, list):
+        return tuple(hashable(item) for item in value)
+    return value
+
+
+def encode(value):
+    """
+    json default hook, native types are stored as single key
+    objects tagged with their type
+    """
+    if isinstance(value, (set, frozenset)):
+        return {"__set__": list(value)}
+    if isinstance(value, SortedSet):
+        return {"__zset__": [[member, score] for member, score in value.items()]}
+    if isinstance(value, bytes):
+        return {"__bytes__": b64encode(value).decode()}
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def decode(obj):
+    """ json object hook, restores tagged native types """
+    if len(obj) == 1:
+        if "__set__" in obj:
+            return set(hashable(member) for member in obj["__set__"])
+        if "__zset__" in obj:
+            return SortedSet(dict((hashable(member), score) for member, score in obj["__zset__"]))
+        if "__bytes__" in obj:
+            return b64decode(obj["__bytes__"])
+    return obj
@@ -0,0 +1,209 @@
+import json
+import time
+from hashlib import sha1
+from secrets import token_hex
+from threading import Thread, Event
+
+
+class Outbox:
+
+    def __init__(self, redis, name="outbox", dedup_window=300):
+        """
+        initialize a new redis backed outbox of background jobs,
+        such as text messages
+        :param redis: redis client
+        :param name: key prefix for the outbox
+        :param dedup_window: seconds during which a job of the same
+            kind and payload is dropped, None keeps them all
+        """
+        self._redis = redis
+        self._queue = name
+        self._retry = f"{name}:retry"
+        self._dead = f"{name}:dead"
+        self._dedup = f"{name}:dedup"
+        self._processing = f"{name}:processing"
+        self._alive = f"{name}:alive"
+        self._dedup_window = dedup_window
+
+    def __len__(self):
+        """get the number of queued jobs"""
+        return self._redis.llen(self._queue)
+
+    def enqueue(self, kind, payload):
+        """
+        queue a new job
+        :param kind: job kind, picks the handler of the workers
+        :param payload: json serializable argument of the handler
+        :returns: True if queued, False if it was a duplicate
+        """
+        dedup, message = self._message(kind, payload)
+        if self._dedup_window and not self._redis.set(dedup, 1, nx=True, ex=self._dedup_window):
+            return False
+
+        self._redis.lpush(self._queue, message)
+        return True
+
+    async def enqueue_async(self, redis, kind, payload):
+        """
+        same as enqueue from a coroutine
+        :param redis: asyncio redis client connected to the same server
+        :returns: True if queued, False if it was a duplicate
+        """
+        dedup, message = self._message(kind, payload)
+        if self._dedup_window and not await redis.set(dedup, 1, nx=True, ex=self._dedup_window):
+            return False
+
+        await redis.lpush(self._queue, message)
+        return True
+
+    def _message(self, kind, payload):
+        """ :returns: dedup key and encoded message """
+        digest = sha1(f"{kind}:{json.dumps(payload, sort_keys=True)}".encode()).hexdigest()
+        message = {"kind": kind, "payload": payload, "attempts": 0}
+        return f"{self._dedup}:{digest}", json.dumps(message)
+
+    def pop(self, worker, timeout=1):
+        """
+        move the next message to the processing list of a worker, waiting
+        up to timeout seconds, it stays there until it is acknowledged
+        :param worker: worker id
+        :returns: (item, message dict) or None
+        """
+        item = self._redis.brpoplpush(self._queue, f"{self._processing}:{worker}", timeout)
+        if item is None:
+            return None
+        return item, json.loads(item)
+
+    def ack(self, worker, item):
+        """
+        remove a message from the processing list of a worker once
+        it is sent, retried or dead
+        :param item: item returned by pop
+        """
+        self._redis.lrem(f"{self._processing}:{worker}", 1, item)
+
+    def heartbeat(self, worker, ttl):
+        """
+        mark a worker alive for ttl seconds, the messages of a
+        worker that is not alive are requeued by requeue_orphans
+        """
+        self._redis.set(f"{self._alive}:{worker}", 1, ex=ttl)
+
+    def requeue_orphans(self):
+        """
+        move the messages left in the processing list of dead
+        workers back into the queue
+        :returns: number of moved messages
+        """
+        moved = 0
+        for key in self._redis.scan_iter(f"{self._processing}:*"):
+            worker = key.decode().rsplit(":", 1)[1]
+            if self._redis.exists(f"{self._alive}:{worker}"):
+                continue
+            while self._redis.rpoplpush(key, self._queue):
+                moved += 1
+        return moved
+
+    def retry(self, message, delay):
+        """
+        schedule a failed message for another attempt
+        :param message: message dict
+        :param delay: seconds to wait before retrying
+        """
+        message["attempts"] += 1
+        self._redis.zadd(self._retry, {json.dumps(message): time.time() + delay})
+
+    def fail(self, message):
+        """ move a message to the dead letter list """
+        self._redis.rpush(self._dead, json.dumps(message))
+
+    def requeue_due(self):
+        """
+        move retries that are due back into the queue
+        :returns: number of moved messages
+        """
+        moved = 0
+        for item in self._redis.zrangebyscore(self._retry, 0, time.time()):
+            # only the worker that removes the item requeues it
+            if self._redis.zrem(self._retry, item):
+                self._redis.lpush(self._queue, item)
+                moved += 1
+        return moved
+
+
+class OutboxWorker(Thread):
+
+    def __init__(self, outbox, handlers, max_attempts=5, backoff=2, heartbeat=60, on_fail=None):
+        """
+        drain an outbox in the background, a job is run at least
+        once, even if its worker dies while running it
+        :param outbox: Outbox instance
+        :param handlers: dictionary of job kind and callable(payload)
+            running a job, jobs of other kinds are dropped
+        :param max_attempts: attempts before a job is dropped
+        :param backoff: base of the exponential retry delay in seconds
+        :param heartbeat: seconds without a heartbeat after which the
+            worker is considered dead, longer than the slowest job
+        :param on_fail: optional callable(message) called once a job
+            is dropped after its last attempt
+        """
+        super().__init__(daemon=True)
+        self._outbox = outbox
+        self._handlers = handlers
+        self._max_attempts = max_attempts
+        self._backoff = backoff
+        self._heartbeat = heartbeat
+        self._on_fail = on_fail
+        self._id = token_hex(4)
+        self._stopped = Event()
+
+    def run(self):
+        recovered = None
+        while not self._stopped.is_set():
+            self._outbox.heartbeat(self._id, self._heartbeat)
+            if recovered is None or time.monotonic() - recovered >= self._heartbeat:
+                recovered = time.monotonic()
+                self._outbox.requeue_orphans()
+            self._outbox.requeue_due()
+
+            popped = self._outbox.pop(self._id)
+            if popped is None:
+                continue
+
+            item, message = popped
+            handler = self._handlers.get(message["kind"])
+            if handler is None:
+                print(f"no handler for {message['kind']} jobs")
+                self._outbox.fail(message)
+                self._outbox.ack(self._id, item)
+                continue
+
+            try:
+                handler(message["payload"])
+            except Exception as e:
+                print(e)
+                if message["attempts"] + 1 >= self._max_attempts:
+                    self._outbox.fail(message)
+                    if self._on_fail is not None:
+                        try:
+                            self._on_fail(message)
+                        except Exception as e:
+                            print(e)
+                else:
+                    self._outbox.retry(message, self._backoff ** (message["attempts"] + 1))
+            self._outbox.ack(self._id, item)
+
+    def stop(self):
+        self._stopped.set()
+
+
+def start_workers(outbox, handlers, count=4, **kwargs):
+    """
+    start a pool of outbox workers
+    :param handlers: dictionary of job kind and callable(payload)
+    :returns: list of started workers
+    """
+    workers = [OutboxWorker(outbox, handlers, **kwargs) for _ in range(count)]
+    for worker in workers:
+        worker.start()
+    return workers
@@ -0,0 +1,80 @@
+import numpy as np
+
+# mean earth radius in meters
+EARTH_RADIUS = 6371008.8
+
+
+def haversine_many(lon1, lat1, lon2, lat2):
+    """
+    great circle distance over arrays, shapes are broadcast so
+    a column of rides against a row of requests gives a matrix
+    :returns: array of distances in meters
+    """
+    lon1, lat1, lon2, lat2 = map(np.radians, (lon1, lat1, lon2, lat2))
+    a = (np.sin((lat2 - lat1) / 2) ** 2 +
+         np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2)
+    return 2 * EARTH_RADIUS * np.arcsin(np.sqrt(np.minimum(a, 1)))
+
+
+def flat_pricing(trip, detour, wait, fare_rate=0.4, detour_rate=0.4, time_rate=0.01):
+    """
+    default pricing function, any callable with the same first three
+    parameters can be used instead, it is called with arrays
+    :param trip: length of the requested trip in km
+    :param detour: detour of the driver in km, pickup plus dropoff legs
+    :param wait: waiting of the rider in minutes
+    :returns: costs
+    """
+    return fare_rate * trip + detour_rate * detour + time_rate * wait
+
+
+def _points(points):
+    """ (n, 2) array of [lon, lat] pairs """
+    return np.asarray(points, dtype=float).reshape(-1, 2)
+
+
+def trip_lengths(locations, destinations):
+    """
+    :param locations: list of [lon, lat] pickups
+    :param destinations: list of [lon, lat] destinations
+    :returns: array of trip lengths in km
+    """
+    loc, dest = _points(locations), _points(destinations)
+    return haversine_many(loc[:, 0], loc[:, 1], dest[:, 0], dest[:, 1]) / 1000
+
+
+def trip_costs(locations, destinations, pricing=flat_pricing):
+    """
+    cost of each trip on its own, without detour nor waiting
+    :returns: array of costs
+    """
+    trip = trip_lengths(locations, destinations)
+    zeros = np.zeros_like(trip)
+    return pricing(trip, zeros, zeros)
+
+
+def cost_matrix(rides, requests, pricing=flat_pricing):
+    """
+    cost of serving every request with every ride at once
+    :param rides: dictionary of arrays, location and destination
+        as [lon, lat] pairs and start, one item per ride
+    :param requests: dictionary of arrays, location and destination
+        as [lon, lat] pairs, start and time, one item per request
+    :returns: (pickup distance in meters, cost), two arrays of
+        shape (rides, requests)
+    """
+    ride_loc, ride_dest = _points(rides['location']), _points(rides['destination'])
+    req_loc, req_dest = _points(requests['location']), _points(requests['destination'])
+
+    pickup = haversine_many(ride_loc[:, 0, None], ride_loc[:, 1, None],
+                            req_loc[None, :, 0], req_loc[None, :, 1])
+    dropoff = haversine_many(req_dest[None, :, 0], req_dest[None, :, 1],
+                             ride_dest[:, 0, None], ride_dest[:, 1, None])
+
+    ride_start = np.asarray(rides['start'], dtype=float)[:, None]
+    req_start = np.asarray(requests['start'], dtype=float)[None, :]
+    req_time = np.asarray(requests['time'], dtype=float)[None, :]
+    wait = np.abs(req_time - np.maximum(ride_start, req_start)) / 60
+
+    trip = np.broadcast_to(trip_lengths(req_loc, req_dest)[None, :], pickup.shape)
+    return pickup, pricing(trip, (pickup + dropoff) / 1000, wait)
@@ -0,0 +1,161 @@
+import json
+import time
+from collections import OrderedDict
+from threading import Lock
+
+_MISSING = object()
+
+
+class TieredCache:
+
+    def __init__(self, redis=None, ttl=3600, max_size=10000, prefix="cache", local_ttl=None):
+        """
+        initialize a new two tier cache, a local lru tier in front
+        of a redis tier shared by every process
+        :param redis: optional redis client used as the shared tier
+        :param ttl: seconds a value is cached
+        :param max_size: size of the local lru tier
+        :param prefix: redis key prefix
+        :param local_ttl: optional shorter lifetime of local entries, bounds
+            how long other processes keep a value after it was invalidated
+        """
+        self._redis = redis
+        self._ttl = ttl
+        self._local_ttl = local_ttl
+        self._max_size = max_size
+        self._prefix = prefix
+        self._local = OrderedDict()
+        self._lock = Lock()
+
+    def key(self, value):
+        """ cache key of a value """
+        return f"{self._prefix}:{value}"
+
+    def get(self, key, default=None):
+        """
+        get a cached value, checking the local tier first
+        :returns: value or default
+        """
+        value = self._get_local(key, _MISSING)
+        if value is not _MISSING:
+            return value
+
+        if self._redis is None:
+            return default
+
+        try:
+            raw = self._redis.get(key)
+        except Exception as e:
+            print(e)
+            return default
+
+        if raw is None:
+            return default
+
+        value = json.loads(raw)
+        self._set_local(key, value, self._ttl_of(value))
+        return value
+
+    def set(self, key, value):
+        """ cache a json serializable value in both tiers """
+        ttl = self._ttl_of(value)
+        self._set_local(key, value, ttl)
+        if self._redis is not None:
+            try:
+                self._redis.set(key, json.dumps(value), ex=ttl)
+            except Exception as e:
+                print(e)
+
+    def set_many(self, items):
+        """
+        cache many json serializable values with a single round trip
+        :param items: dictionary of key and value
+        """
+        pipe = self._redis.pipeline(transaction=False) if self._redis is not None else None
+        for key, value in items.items():
+            ttl = self._ttl_of(value)
+            self._set_local(key, value, ttl)
+            if pipe is not None:
+                pipe.set(key, json.dumps(value), ex=ttl)
+        if pipe is not None and items:
+            try:
+                pipe.execute()
+            except Exception as e:
+                print(e)
+
+    def delete(self, key):
+        """ drop a value from both tiers """
+        self._delete_local(key)
+        if self._redis is not None:
+            try:
+                self._redis.delete(key)
+            except Exception as e:
+                print(e)
+
+    async def get_async(self, key, redis=None, default=None):
+        """
+        same as get from a coroutine
+        :param redis: optional asyncio redis client used as the shared tier
+        """
+        value = self._get_local(key, _MISSING)
+        if value is not _MISSING or redis is None:
+            return default if value is _MISSING else value
+
+        try:
+            raw = await redis.get(key)
+        except Exception as e:
+            print(e)
+            return default
+
+        if raw is None:
+            return default
+
+        value = json.loads(raw)
+        self._set_local(key, value, self._ttl_of(value))
+        return value
+
+    async def set_async(self, key, value, redis=None):
+        """ same as set from a coroutine """
+        ttl = self._ttl_of(value)
+        self._set_local(key, value, ttl)
+        if redis is not None:
+            try:
+                await redis.set(key, json.dumps(value), ex=ttl)
+            except Exception as e:
+                print(e)
+
+    async def delete_async(self, key, redis=None):
+        """ same as delete from a coroutine """
+        self._delete_local(key)
+        if redis is not None:
+            try:
+                await redis.delete(key)
+            except Exception as e:
+                print(e)
+
+    def _ttl_of(self, value):
+        return self._ttl
+
+    def _get_local(self, key, default):
+        now = time.time()
+        with self._lock:
+            entry = self._local.get(key)
+            if entry is not None:
+                if entry[1] > now:
+                    self._local.move_to_end(key)
+                    return entry[0]
+                del self._local[key]
+        return default
+
+    def _set_local(self, key, value, ttl):
+        if self._local_ttl is not None:
+            ttl = min(ttl, self._local_ttl)
+        with self._lock:
+            self._local[key] = (value, time.time() + ttl)
+            self._local.move_to_end(key)
+            while len(self._local) > self._max_size:
+                self._local.popitem(last=False)
+
+    def _delete_local(self, key):
+        with self._lock:
+            self._local.pop(key, None)
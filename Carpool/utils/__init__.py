@@ -1,38 +1,152 @@
 from .OrangeDB import Orange
-from mongoengine import connect
+from .Outbox import Outbox
+from .GeoCache import GeoCache
+from .TieredCache import TieredCache
+from .LocationBuffer import LocationBuffer
+from .GeoIndex import GeoIndex, BucketedGeoIndex
+from .Pricing import flat_pricing
+from .AsyncClients import AsyncClients
+from mongoengine import connect, disconnect
 from redis import Redis
 from twilio.rest import Client
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from requests.adapters import HTTPAdapter
 import requests
+import asyncio
+import os
 
 config = Orange("config.json", load=True)
-connect("db", host=config['database']['mongo']['url'])
 redis = Redis(host=config['database']['redis']['url'])
 twilio_client = Client(config['twilio']['account_sid'], config['twilio']['auth_token'])
+outbox = Outbox(redis)
+# refresh jobs of the rides whose feed items changed, every change
+# is refreshed so none is dropped as a duplicate
+feed_outbox = Outbox(redis, name="outbox:feeds", dedup_window=None)
+geocode_cache = GeoCache(redis, **config.get('geocode_cache', {}))
+user_cache = TieredCache(redis, **{'prefix': 'user', 'ttl': 300, 'local_ttl': 5,
+                                   **config.get('user_cache', {})})
+async_clients = AsyncClients(config)
+location_buffer = LocationBuffer(redis)
+# live positions of users, stale after ttl seconds without a ping,
+# and pickup points of requests, in time buckets of their flex window
+user_positions = GeoIndex(redis, "geo:users", **{'ttl': 600, **config.get('user_positions', {})})
+request_points = BucketedGeoIndex(redis, "geo:requests", **config.get('request_points', {}))
+# pricing function of requests and matches, rates are set in config
+pricing = partial(flat_pricing, **config.get('pricing', {}))
+
+# shared keep-alive session and bounded pool for google api calls
+google_session = requests.Session()
+google_session.mount('https://', HTTPAdapter(pool_connections=4, pool_maxsize=16))
+google_timeout = config['google'].get('timeout', 5)
+google_executor = ThreadPoolExecutor(max_workers=config['google'].get('workers', 8))
+
+if 'api_url' in config['twilio']:
+    # point twilio at a local fake endpoint
+    twilio_client.api.base_url = config['twilio']['api_url']
+
+
+_connected_pid = None
+
+
+def init_connections():
+    """
+    connect to mongo from the current process, pymongo clients must not
+    be shared across fork so every worker calls this after forking
+    """
+    global _connected_pid
+    if _connected_pid == os.getpid():
+        return
+
+    # drop the client and redis sockets inherited from the parent
+    disconnect()
+    redis.connection_pool.reset()
+    connect("db", host=config['database']['mongo']['url'])
+    _connected_pid = os.getpid()
+
+
+def send_sms(to, body):
+    twilio_client.messages.create(body=body, to=to, from_=config['twilio']['from_number'])
+
+
+def sms_job(payload):
+    """ handler of the sms jobs of the outbox """
+    send_sms(payload["to"], payload["body"])
 
 
 def find_location(query):
+    return geocode_cache.cached(query, _find_location)
+
+
+def find_locations(queries):
+    """ resolve many find_location queries in parallel, keeping order """
+    return list(google_executor.map(find_location, queries))
+
+
+class GoogleApiError(Exception):
+    """ a google api call failed, e.g. OVER_QUERY_LIMIT or REQUEST_DENIED """
+
+
+def _first_result(resp):
+    """
+    first result of a google api response, None if nothing was found,
+    only ZERO_RESULTS is a negative result that the geocode cache keeps
+    :raises GoogleApiError: on any other status than OK
+    """
+    status = resp.get('status')
+    if status == 'ZERO_RESULTS':
+        return None
+    if status != 'OK':
+        raise GoogleApiError(f"{status}: {resp.get('error_message', '')}")
+    return resp['results'][0] if resp['results'] else None
+
+
+def _find_location(query):
     params = {'key': config['google']['api_key']}
     params.update(query)
 
-    resp = requests.get(
+    resp = google_session.get(
         'https://maps.googleapis.com/maps/api/geocode/json',
-        params=params,).json()
-
-    if len(resp['results']) < 1:
-        return
+        params=params, timeout=google_timeout).json()
 
-    return resp['results'][0]
+    return _first_result(resp)
 
 
 def find_business(query):
     params = {'key': config['google']['api_key']}
     params.update(query)
 
-    resp = requests.get(
+    resp = google_session.get(
         'https://maps.googleapis.com/maps/api/place/nearbysearch/json',
-        params=params,).json()
+        params=params, timeout=google_timeout).json()
 
-    if len(resp['results']) < 1:
-        return
+    return _first_result(resp)
+
+
+async def find_location_async(query):
+    return await geocode_cache.cached_async(query, _find_location_async, async_clients.redis)
+
+
+async def find_locations_async(queries):
+    """ resolve many find_location queries concurrently, keeping order """
+    return await asyncio.gather(*(find_location_async(query) for query in queries))
+
+
+async def _find_location_async(query):
+    params = {'key': config['google']['api_key']}
+    params.update(query)
+
+    resp = (await async_clients.http.get(
+        'https://maps.googleapis.com/maps/api/geocode/json', params=params)).json()
+
+    return _first_result(resp)
+
+
+async def find_business_async(query):
+    params = {'key': config['google']['api_key']}
+    params.update(query)
+
+    resp = (await async_clients.http.get(
+        'https://maps.googleapis.com/maps/api/place/nearbysearch/json', params=params)).json()
 
-    return resp['results'][0]
+    return _first_result(resp)
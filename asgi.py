@@ -0,0 +1,4 @@
+from Carpool.async_routes import create_async_app
+
+# served by gunicorn -c gunicorn.conf.py -k uvicorn.workers.UvicornWorker asgi:app
+app = create_async_app()
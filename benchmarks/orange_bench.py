@@ -0,0 +1,205 @@
+"""
+OrangeDB benchmarks
+
+    python -m benchmarks.orange_bench --sizes 1000,100000 --output results.json
+    python -m benchmarks.orange_bench --baseline results.json
+
+each operation runs until --ops operations are done or --max-time seconds
+have passed, throughput is reported in operations per second, dump and load
+latency in seconds and load memory in bytes. With --baseline the results are
+compared against a saved run and the exit status is 1 on a regression.
+"""
+import argparse
+import gc
+import importlib
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+import types
+
+
+def _import_orange():
+    """
+    import OrangeDB without running Carpool/__init__ and utils/__init__,
+    which build the app, read config.json and open the redis and twilio clients
+    :returns: OrangeDB module
+    """
+    package = types.ModuleType("_orange")
+    package.__path__ = [os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                     os.pardir, "Carpool", "utils")]
+    sys.modules.setdefault("_orange", package)
+    return importlib.import_module("_orange.OrangeDB")
+
+
+_OrangeDB = _import_orange()
+Orange, OrangeChild = _OrangeDB.Orange, _OrangeDB.OrangeChild
+
+HIGHER_IS_BETTER = {"ops_per_sec"}
+
+
+def _value(i):
+    return {"name": f"user{i}", "n": i, "tags": ["a", "b"]}
+
+
+def _timed(fn, ops, max_time):
+    """
+    call fn(i) until ops calls are done or max_time has passed
+    :returns: operations per second
+    """
+    start = time.perf_counter()
+    done = 0
+    while done < ops:
+        fn(done)
+        done += 1
+        if time.perf_counter() - start >= max_time:
+            break
+    return done / (time.perf_counter() - start)
+
+
+def _populate(path, size, options):
+    """ write a database of size keys """
+    db = Orange(path, auto_dump=False, **options)
+    db.setm(*((f"key{i}", _value(i)) for i in range(size)))
+    db.dump()
+    db.close()
+
+
+def bench_size(directory, size, options, ops, max_time):
+    """
+    run every benchmark against a database of size keys
+    :returns: dictionary of benchmark name and metrics
+    """
+    path = os.path.join(directory, f"bench_{size}")
+    _populate(path, size, options)
+    results = dict()
+
+    gc.collect()
+    start = time.perf_counter()
+    db = Orange(path, **options)
+    results["load"] = {"seconds": time.perf_counter() - start}
+
+    db.set("counter", 0)
+    db.lcreate("list")
+    results["get"] = {"ops_per_sec": _timed(lambda i: db.get(f"key{i % size}"), ops, max_time)}
+    results["set"] = {"ops_per_sec": _timed(lambda i: db.set(f"key{i % size}", _value(i)), ops, max_time)}
+    results["setm"] = {"ops_per_sec": _timed(
+        lambda i: db.setm(*((f"key{(i * 10 + j) % size}", _value(j)) for j in range(10))),
+        ops, max_time) * 10}
+    results["lappend"] = {"ops_per_sec": _timed(lambda i: db.lappend("list", i), ops, max_time)}
+    results["incrby"] = {"ops_per_sec": _timed(lambda i: db.incrby("counter", 1), ops, max_time)}
+
+    results["child"] = {"ops_per_sec": _timed(
+        lambda i: OrangeChild(db, f"children/c{i % 100}"), ops, max_time)}
+    deep = OrangeChild(db, "a/b/c/d/e")
+    deep.set("leaf", 1)
+    results["deep_get"] = {"ops_per_sec": _timed(lambda i: deep.get("leaf"), ops, max_time)}
+
+    start = time.perf_counter()
+    db.dump()
+    results["dump"] = {"seconds": time.perf_counter() - start,
+                       "bytes": os.path.getsize(path)}
+    db.close()
+
+    gc.collect()
+    tracemalloc.start()
+    db = Orange(path, **options)
+    # lazy snapshots are measured after every key is decoded
+    db.values()
+    results["load"]["memory"] = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    db.close()
+    return results
+
+
+def run(sizes, options, ops, max_time):
+    """
+    run the benchmarks for every size
+    :returns: list of result rows
+    """
+    directory = tempfile.mkdtemp(prefix="orange_bench_")
+    rows = []
+    try:
+        for size in sizes:
+            for name, metrics in bench_size(directory, size, options, ops, max_time).items():
+                for metric, value in metrics.items():
+                    rows.append({"name": name, "size": size, "metric": metric, "value": value})
+                    print(f"{name:>10} {size:>9} {metric:>12} {value:>16.6g}", file=sys.stderr)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+    return rows
+
+
+def compare(rows, baseline, threshold):
+    """
+    compare results against a baseline
+    :param rows: result rows of this run
+    :param baseline: saved output of an earlier run
+    :param threshold: tolerated relative slowdown
+    :returns: list of regressed rows with their baseline values
+    """
+    saved = {(row["name"], row["size"], row["metric"]): row["value"]
+             for row in baseline["results"]}
+    regressions = []
+    for row in rows:
+        old = saved.get((row["name"], row["size"], row["metric"]))
+        if not old:
+            continue
+        change = (row["value"] - old) / old
+        if row["metric"] in HIGHER_IS_BETTER:
+            change = -change
+        if change > threshold:
+            regressions.append(dict(row, baseline=old, change=change))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="OrangeDB benchmarks")
+    parser.add_argument("--sizes", default="1000,10000,100000",
+                        help="comma separated database sizes, e.g. 1000,1000000")
+    parser.add_argument("--storage", default="snapshot", choices=["snapshot", "log"])
+    parser.add_argument("--format", default="json", help="snapshot format")
+    parser.add_argument("--compression", default=None)
+    parser.add_argument("--flush-every", type=int, default=None)
+    parser.add_argument("--ops", type=int, default=10000, help="operations per benchmark")
+    parser.add_argument("--max-time", type=float, default=2.0, help="seconds per benchmark")
+    parser.add_argument("--output", help="write the json results to a file instead of stdout")
+    parser.add_argument("--baseline", help="json results of an earlier run to compare against")
+    parser.add_argument("--threshold", type=float, default=0.1,
+                        help="relative slowdown reported as a regression")
+    args = parser.parse_args(argv)
+
+    options = {"storage": args.storage, "snapshot_format": args.format,
+               "compression": args.compression, "flush_every": args.flush_every}
+    rows = run([int(size) for size in args.sizes.split(",")], options, args.ops, args.max_time)
+
+    output = {
+        "meta": {"python": platform.python_version(), "platform": platform.platform(),
+                 "time": time.time(), "options": options, "ops": args.ops,
+                 "max_time": args.max_time},
+        "results": rows,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(output, f, indent=2)
+    else:
+        json.dump(output, sys.stdout, indent=2)
+        print()
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(rows, json.load(f), args.threshold)
+        for row in regressions:
+            print(f"regression: {row['name']} size={row['size']} {row['metric']} "
+                  f"{row['baseline']:.6g} -> {row['value']:.6g} ({row['change']:.1%} worse)",
+                  file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
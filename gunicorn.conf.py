@@ -0,0 +1,38 @@
+import json
+import multiprocessing
+import os
+
+# server settings come from the "server" section of config.json,
+# environment variables take precedence
+with open("config.json") as f:
+    _server = json.load(f).get("server", {})
+
+
+def _setting(name, default):
+    value = os.environ.get(f"CARPOOL_{name.upper()}")
+    if value is None:
+        return _server.get(name, default)
+    return type(default)(value)
+
+
+bind = f"0.0.0.0:{_setting('port', 8080)}"
+workers = _setting('workers', multiprocessing.cpu_count() * 2 + 1)
+threads = _setting('threads', 4)
+# asgi.py is served with worker_class "uvicorn.workers.UvicornWorker"
+worker_class = _setting('worker_class', "gthread" if threads > 1 else "sync")
+keepalive = _setting('keepalive', 5)
+timeout = _setting('timeout', 30)
+graceful_timeout = _setting('graceful_timeout', 30)
+max_requests = _setting('max_requests', 10000)
+max_requests_jitter = _setting('max_requests_jitter', 1000)
+
+# the app is imported by each worker after fork, so no mongo client
+# or socket is shared between processes, send HUP for a graceful reload
+preload_app = False
+accesslog = "-"
+
+
+def post_worker_init(worker):
+    """ start the background services once the worker loaded the app """
+    from Carpool import start_services
+    start_services()
@@ -1,13 +1,15 @@
-from flask import Flask
-from Carpool import mod
+from Carpool import create_app, start_services
+from Carpool.utils import config
 
 
 def main():
+    """ single process development server, use wsgi.py in production """
 
-    app = Flask(__name__)
-    app.register_blueprint(mod)
+    app = create_app()
+    start_services()
 
-    app.run(host="0.0.0.0", port=8080, debug=True)
+    server = config.get('server', {})
+    app.run(host="0.0.0.0", port=server.get('port', 8080), debug=server.get('debug', False))
 
 
 if __name__ == '__main__':
@@ -0,0 +1,124 @@
+import math
+import os
+import sys
+import types
+
+import fakeredis
+import pytest
+import redis
+from fakeredis._server import FakeConnection, FakeSocket, Key, command
+from fakeredis._zset import ZSet
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _import_utils():
+    """
+    register Carpool/utils as the standalone _utils package, so that its
+    modules are tested without importing the app, see benchmarks/orange_bench.py
+    """
+    package = types.ModuleType("_utils")
+    package.__path__ = [os.path.join(ROOT, "Carpool", "utils")]
+    sys.modules.setdefault("_utils", package)
+
+
+_import_utils()
+
+
+class _GeoSocket(FakeSocket):
+    """
+    the pinned fakeredis has no GEO commands, these implement the ones
+    GeoIndex sends, members are kept in a sorted set like redis does
+    """
+
+    _BITS = 26
+    _LAT = 85.05112878
+
+    @classmethod
+    def _score(cls, lon, lat):
+        x = int((lon + 180) / 360 * (1 << cls._BITS))
+        y = int((lat + cls._LAT) / (2 * cls._LAT) * (1 << cls._BITS))
+        return float(x << cls._BITS | y)
+
+    @classmethod
+    def _position(cls, score):
+        x, y = int(score) >> cls._BITS, int(score) & ((1 << cls._BITS) - 1)
+        return ((x + 0.5) / (1 << cls._BITS) * 360 - 180,
+                (y + 0.5) / (1 << cls._BITS) * 2 * cls._LAT - cls._LAT)
+
+    @staticmethod
+    def _distance(lon1, lat1, lon2, lat2):
+        lon1, lat1, lon2, lat2 = map(math.radians, (lon1, lat1, lon2, lat2))
+        a = (math.sin((lat2 - lat1) / 2) ** 2 +
+             math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2)
+        return 2 * 6372797.560856 * math.asin(math.sqrt(a))
+
+    @command((Key(ZSet), bytes, bytes, bytes), (bytes,))
+    def geoadd(self, key, *args):
+        added = 0
+        for i in range(0, len(args), 3):
+            added += key.value.add(args[i + 2], self._score(float(args[i]), float(args[i + 1])))
+        key.updated()
+        return added
+
+    def _search(self, key, lon, lat, radius, args):
+        args = [arg.upper() for arg in args]
+        found = []
+        for member, score in key.value.items():
+            dist = self._distance(lon, lat, *self._position(score))
+            if dist <= radius:
+                found.append((dist, member))
+        found.sort(reverse=b"DESC" in args)
+        if b"COUNT" in args:
+            found = found[:int(args[args.index(b"COUNT") + 1])]
+        return [[member, b"%.4f" % dist] for dist, member in found]
+
+    @command((Key(ZSet), bytes, bytes, bytes, bytes, bytes), (bytes,))
+    def georadius(self, key, lon, lat, radius, unit, *args):
+        return self._search(key, float(lon), float(lat), float(radius), args)
+
+    @command((Key(ZSet), bytes, bytes, bytes, bytes, bytes, bytes), (bytes,))
+    def geosearch(self, key, origin, lon, lat, by, radius, unit, *args):
+        return self._search(key, float(lon), float(lat), float(radius), args)
+
+
+class GeoConnection(FakeConnection):
+
+    def _connect(self):
+        return _GeoSocket(self._server)
+
+
+@pytest.fixture
+def geo_redis():
+    """ fakeredis client that also answers the GEO commands of GeoIndex """
+    return redis.Redis(connection_pool=redis.ConnectionPool(
+        connection_class=GeoConnection, server=fakeredis.FakeServer()))
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / "db.json")
+
+
+@pytest.fixture
+def app(monkeypatch):
+    """ flask app on mongomock and fakeredis, see requirements-dev.txt """
+    import mongoengine
+
+    monkeypatch.chdir(ROOT)
+    from Carpool import create_app, models, utils
+
+    pool = redis.ConnectionPool(connection_class=GeoConnection, server=fakeredis.FakeServer())
+    monkeypatch.setattr(utils.redis, "connection_pool", pool)
+    monkeypatch.setattr(utils, "init_connections",
+                        lambda: mongoengine.connect("db", host="mongomock://localhost"))
+    for cache in (utils.user_cache, utils.geocode_cache):
+        cache._local.clear()
+
+    app = create_app()
+    yield app
+
+    mongoengine.connection.get_db().client.drop_database("db")
+    mongoengine.disconnect()
+    for document in (models.User, models.RideRequest, models.Ride, models.RideMatching):
+        document._collection = None
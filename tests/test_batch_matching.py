@@ -0,0 +1,88 @@
+import time
+
+
+def test_seats_taken_by_earlier_runs(app):
+    from Carpool.matching import batch_match, solve_assignment
+    from Carpool.models import User, Ride, RideRequest, RideMatching, RideMatchingStatus
+
+    driver = User(uid="d", email="d@x.com", first_name="d", last_name="d").save()
+    ride = Ride(by_user=driver, start=0, end=3600, location=[0, 0], destination=[1, 1]).save()
+    requests = []
+    for i in range(4):
+        rider = User(uid=f"r{i}", email=f"r{i}@x.com", first_name="r", last_name="r").save()
+        requests.append(RideRequest(by_user=rider, at_time=600, before_flex=5, after_flex=5,
+                                    start=300, end=900, location=[0, 0.001 * i],
+                                    destination=[1, 1]).save())
+    RideMatching(driver=driver, rider=requests[0].by_user, ride=ride, request=requests[0],
+                 cost=1, status=RideMatchingStatus.accepted.value).save()
+
+    assert len(batch_match(0, 3600, seats=2, notify=False)) == 1
+    assert batch_match(0, 3600, seats=2, notify=False) == []
+    assert RideMatching.seats_taken([ride]) == {ride.pk: 2}
+
+    assert solve_assignment([(1, 0, 0), (2, 0, 1), (3, 1, 2)], seats=2, taken=[1, 2]) == [(1, 0, 0)]
+
+
+class _Lock:
+    """ redis lock stand-in, keeps the value and ttl of the key """
+
+    def __init__(self):
+        self.value, self.ttl = None, None
+
+    def set(self, name, value, nx=False, ex=None):
+        if nx and self.value is not None:
+            return False
+        self.value, self.ttl = value, ex * 1000
+        return True
+
+    def eval(self, script, numkeys, name, token, ttl):
+        if self.value == token:
+            self.ttl = ttl
+            return 1
+        return 0
+
+
+def test_lock_outlives_the_run(app):
+    from Carpool.matching import BatchMatcher
+
+    lock = _Lock()
+    matcher = BatchMatcher(interval=60, lock=lock)
+    token = matcher._acquire()
+    assert token and lock.ttl == 600 * 1000
+    assert BatchMatcher(interval=60, lock=lock)._acquire() is None
+
+    matcher._release(token, time.time() - 20)
+    assert 39 * 1000 < lock.ttl <= 40 * 1000
+    # a run longer than the interval frees the lock right away
+    matcher._release(token, time.time() - 120)
+    assert lock.ttl == 1
+    # the lock taken by another process is left alone
+    lock.value = "other"
+    matcher._release(token, time.time())
+    assert lock.ttl == 1
+
+
+def test_chunks_price_the_same_pairs(app):
+    import numpy as np
+    from Carpool.matching import build_cost_matrix, _pair_costs
+    from Carpool.models import User, Ride, RideRequest
+
+    rng = np.random.RandomState(0)
+    users = [User(uid=str(i), email=f"{i}@x.com", first_name="u", last_name="u") for i in range(5)]
+
+    def point():
+        return [float(rng.uniform(0, 1)), float(rng.uniform(0, 2))]
+
+    rides = [Ride(by_user=users[i % 5], start=rng.uniform(0, 3000), end=rng.uniform(3000, 6000),
+                  location=point(), destination=point()) for i in range(40)]
+    requests = []
+    for i in range(60):
+        start = float(rng.uniform(0, 6000))
+        requests.append(RideRequest(by_user=users[i % 5], at_time=start + 300, before_flex=5,
+                                    after_flex=5, start=start, end=start + 600,
+                                    location=point(), destination=point()))
+
+    dense = _pair_costs(rides, requests, 20 * 1000, None, None)
+    assert dense
+    for chunk in (1, 7, 256):
+        assert sorted(build_cost_matrix(rides, requests, 20 * 1000, chunk=chunk)) == sorted(dense)
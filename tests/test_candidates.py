@@ -0,0 +1,37 @@
+import time
+
+
+def test_candidates_come_from_shared_index(app):
+    from Carpool.models import User, RideRequest
+
+    rider = User(uid="r", email="r@x.com", first_name="r", last_name="r").save()
+    now = time.time()
+    requests = {}
+    for name, lat, start, end in [("early", 0.002, 0, 100), ("a", 0.005, 300, 900),
+                                  ("b", 0.004, 500, 1200), ("c", 0.001, 600, 700),
+                                  ("far", 1, 600, 700), ("late", 0.001, 7200, 7300)]:
+        req = RideRequest.create(rider, now + start, 0, (end - start) / 60, 0, lat, 1, 1)
+        requests[req.uid] = name
+
+    def candidates(start, end, **kwargs):
+        found = RideRequest.find_candidates(0, 0, 1000, start=now + start, end=now + end, **kwargs)
+        return [requests[req.uid] for req in found]
+
+    assert candidates(200, 1000) == ["c", "b", "a"]
+    assert candidates(200, 1000, limit=2) == ["c", "b"]
+    # the nearer requests fail the exact window check
+    assert candidates(50, 100, limit=1) == ["early"]
+    assert candidates(7000, 8000) == ["late"]
+
+
+def test_index_follows_requests(app):
+    from Carpool.models import User, RideRequest
+
+    rider = User(uid="r", email="r@x.com", first_name="r", last_name="r").save()
+    req = RideRequest.create(rider, time.time(), 0, 60, 0, 0, 1, 1)
+    assert RideRequest.check_index() == (set(), set())
+    assert RideRequest.find_within(0, 0, 100, live=True) == [req]
+
+    req.delete()
+    assert RideRequest.find_within(0, 0, 100, live=True) == []
+    assert RideRequest.check_index() == (set(), set())
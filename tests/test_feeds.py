@@ -0,0 +1,77 @@
+import pytest
+
+
+@pytest.fixture
+def geocode(app, monkeypatch):
+    """ replaces geocoding, set geocode.error to make it fail """
+    from Carpool import models
+
+    def find_locations(queries):
+        if geocode.error:
+            raise geocode.error
+        return [{"formatted_address": query["latlng"]} for query in queries]
+
+    geocode.error = None
+    monkeypatch.setattr(models, "find_locations", find_locations)
+    return geocode
+
+
+def test_rides_are_refreshed_in_the_background(geocode):
+    from Carpool.models import User, Ride, UserFeed
+    from Carpool.utils import feed_outbox, redis
+
+    driver = User(uid="d", email="d@x.com", first_name="d", last_name="d").save()
+    assert UserFeed.get(driver) == []
+
+    geocode.error = RuntimeError("google is down")
+    ride = Ride.create(driver, 0, 3600, 0, 0, 1, 1)
+    assert len(feed_outbox) == 1
+
+    # a failed refresh is retried and leaves the feed as it was
+    with pytest.raises(RuntimeError):
+        UserFeed.refresh_job({"ride": ride.uid})
+    assert UserFeed.get(driver) == []
+
+    geocode.error = None
+    UserFeed.refresh_job({"ride": ride.uid})
+    assert [item["ride"]["uid"] for item in UserFeed.get(driver)] == [ride.uid]
+
+    # once the last attempt failed the feed is rebuilt on read
+    UserFeed.refresh_failed({"kind": "refresh", "payload": {"ride": ride.uid}, "attempts": 4})
+    assert not redis.exists(UserFeed._key(driver))
+    assert len(UserFeed.get(driver)) == 1
+
+
+def test_async_app_builds_the_same_feed(geocode, monkeypatch):
+    import asyncio
+    from Carpool import async_models, models
+    from Carpool.models import User, Ride, RideRequest, RideMatching, RideMatchingStatus, UserFeed
+
+    driver = User(uid="d", email="d@x.com", first_name="d", last_name="d").save()
+    rider = User(uid="r", email="r@x.com", first_name="r", last_name="r").save()
+    ride = Ride(by_user=driver, start=0, end=3600, location=[0, 0], destination=[1, 1]).save()
+    request = RideRequest(by_user=rider, at_time=600, before_flex=5, after_flex=5, start=300,
+                          end=900, location=[0, 0.1], destination=[1, 1.1]).save()
+    RideMatching(driver=driver, rider=rider, ride=ride, request=request, cost=1,
+                 status=RideMatchingStatus.accepted.value).save()
+
+    # motor is not available here, the async runner reads with mongoengine
+    async def load(document, ids):
+        return models._load(document, ids)
+
+    async def find(document, query, limit=None):
+        return models._execute(models.Find(document, query, limit))
+
+    async def find_locations(queries):
+        return models.find_locations(queries)
+
+    monkeypatch.setattr(async_models, "_load", load)
+    monkeypatch.setattr(async_models, "_find", find)
+    monkeypatch.setattr(async_models, "find_locations_async", find_locations)
+
+    for user in (driver, rider):
+        feed = UserFeed.get(user)
+        assert [item["matches"][0]["rider"]["uid"] for item in feed] == ["r"]
+        mapping = asyncio.get_event_loop().run_until_complete(
+            async_models.run(UserFeed.rebuild_plan(user)))
+        assert UserFeed.parse(mapping) == feed
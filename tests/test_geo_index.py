@@ -0,0 +1,91 @@
+import time
+
+import pytest
+from redis.exceptions import ResponseError
+
+from _utils.GeoIndex import GeoIndex, BucketedGeoIndex
+
+
+class _Redis:
+    """ records commands, GEOSEARCH fails with the given error """
+
+    def __init__(self, error):
+        self.error = error
+        self.commands = []
+
+    def execute_command(self, *command):
+        self.commands.append(command[0])
+        if command[0] == "GEOSEARCH":
+            raise ResponseError(self.error)
+        return [[b"a", b"1.5"]]
+
+    def zrangebyscore(self, name, low, high):
+        return []
+
+
+def test_falls_back_on_unknown_command():
+    redis = _Redis("ERR unknown command 'GEOSEARCH'")
+    index = GeoIndex(redis, "geo")
+    assert index.query(0, 0, 100) == [("a", 1.5)]
+    assert index.query(0, 0, 100) == [("a", 1.5)]
+    assert redis.commands == ["GEOSEARCH", "GEORADIUS", "GEORADIUS"]
+
+
+def test_other_errors_are_raised():
+    redis = _Redis("WRONGTYPE Operation against a key holding the wrong kind of value")
+    index = GeoIndex(redis, "geo")
+    for _ in range(2):
+        with pytest.raises(ResponseError):
+            index.query(0, 0, 100)
+    assert redis.commands == ["GEOSEARCH", "GEOSEARCH"]
+
+
+def test_query_is_nearest_first(geo_redis):
+    index = GeoIndex(geo_redis, "geo")
+    index.add_many([("far", 0.02, 0, None), ("near", 0.001, 0, None),
+                    ("mid", 0.01, 0, None), ("out", 1, 0, None)])
+    index.add("near", 0.002, 0)
+
+    found = index.query(0, 0, 5000)
+    assert [member for member, _ in found] == ["near", "mid", "far"]
+    assert abs(found[0][1] - 222.4) < 1
+    assert [member for member, _ in index.query(0, 0, 5000, count=2)] == ["near", "mid"]
+    assert geo_redis.execute_command("GEOSEARCH", "geo", "FROMLONLAT", 0, 0,
+                                     "BYRADIUS", 10, "m", "ASC") == []
+
+
+def test_expire(geo_redis):
+    index = GeoIndex(geo_redis, "geo", ttl=60)
+    index.add_many([("old", 0, 0, 10), ("new", 0, 0, 30), ("ttl", 0, 0, None)])
+    assert len(index) == 3
+
+    assert index.expire(20) == 1
+    assert index.members() == {"new", "ttl"}
+    index.remove("new")
+    assert index.members_within(0, 0, 100) == {"ttl"}
+    assert index.expire(time.time() + 120) == 1
+    assert len(index) == 0
+
+
+def test_buckets(geo_redis):
+    index = BucketedGeoIndex(geo_redis, "geo", bucket=3600)
+    # an hour boundary at least an hour ahead, every interval is still live
+    hour = (int(time.time()) // 3600 + 2) * 3600
+    index.add_many([("now", 0.001, 0, hour - 600, hour - 300),
+                    ("long", 0.003, 0, hour - 600, hour + 4000),
+                    ("next", 0.002, 0, hour + 100, hour + 200)])
+
+    assert index.query(0, 0, 1000, hour - 500, hour - 400) == [
+        ("now", pytest.approx(111, abs=1)), ("long", pytest.approx(334, abs=1))]
+    assert [m for m, _ in index.query(0, 0, 1000, hour - 500, hour + 500)] == ["now", "next", "long"]
+    assert [m for m, _ in index.query(0, 0, 1000, hour - 500, hour + 500, count=1)] == ["now"]
+    assert [m for m, _ in index.query(0, 0, 1000, hour + 3700, hour + 3800)] == ["long"]
+    assert index.members() == {"now", "long", "next"}
+
+    # bucket keys expire once their hour has passed
+    assert abs(geo_redis.ttl(f"geo:{hour // 3600 - 1}") - (hour - time.time())) <= 2
+
+    index.remove("long", hour - 600, hour + 4000)
+    assert index.members() == {"now", "next"}
+    assert index.expire(hour + 150) == 1
+    assert index.members() == {"next"}
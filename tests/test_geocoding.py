@@ -0,0 +1,45 @@
+import pytest
+
+
+class _Response:
+
+    def __init__(self, body):
+        self._body = body
+
+    def json(self):
+        return self._body
+
+
+@pytest.fixture
+def google(app, monkeypatch):
+    """ queue of google responses, one is served per call """
+    from Carpool import utils
+
+    responses = []
+    monkeypatch.setattr(utils.google_session, "get",
+                        lambda url, **kwargs: _Response(responses.pop(0)))
+    return responses
+
+
+def test_zero_results_are_cached(google):
+    from Carpool.utils import find_location
+
+    google.append({"status": "ZERO_RESULTS", "results": []})
+    assert find_location({"address": "nowhere"}) is None
+    assert find_location({"address": "Nowhere "}) is None
+    assert not google
+
+
+def test_errors_are_not_cached(google):
+    from Carpool.utils import find_location, find_business, GoogleApiError
+
+    result = {"formatted_address": "1 main st"}
+    google += [{"status": "OVER_QUERY_LIMIT", "results": []},
+               {"status": "OK", "results": [result]},
+               {"status": "REQUEST_DENIED", "results": []}]
+
+    with pytest.raises(GoogleApiError):
+        find_location({"latlng": "1.0, 2.0"})
+    assert find_location({"latlng": "1.0, 2.0"}) == result
+    with pytest.raises(GoogleApiError):
+        find_business({"name": "cafe"})
@@ -0,0 +1,54 @@
+import time
+
+import fakeredis
+import pytest
+
+
+@pytest.fixture
+def buffer():
+    from _utils.LocationBuffer import LocationBuffer
+    return LocationBuffer(fakeredis.FakeRedis())
+
+
+def test_client_times_are_capped(buffer):
+    before = time.time()
+    buffer.push_many([("a", "a@x.com", 1, 2, time.time() * 1000),
+                      ("b", "b@x.com", 1, 2, 100.0),
+                      ("c", "c@x.com", 1, 2, None)])
+    pings = buffer.take()
+    assert before <= pings["a"]["at"] <= time.time()
+    assert pings["b"]["at"] == 100.0
+    assert before <= pings["c"]["at"] <= time.time()
+    assert buffer.take() == {}
+
+
+def test_out_of_order_pings_are_not_mirrored(app, monkeypatch):
+    from Carpool.models import User
+    from Carpool.utils import user_positions
+
+    mirrored = []
+    monkeypatch.setattr(user_positions, "add_many", lambda entries: mirrored.extend(entries))
+    User(uid="a", email="a@x.com", first_name="a", last_name="a", location_at=200.0).save()
+    User(uid="b", email="b@x.com", first_name="b", last_name="b").save()
+
+    User.write_locations({"a": {"email": "a@x.com", "lon": 1, "lat": 2, "at": 100.0},
+                          "b": {"email": "b@x.com", "lon": 3, "lat": 4, "at": 100.0}})
+    assert mirrored == [("b", 3, 4, None)]
+    assert User.objects.get(uid="a").location_at == 200.0
+    assert User.objects.get(uid="b").location["coordinates"] == [3, 4]
+
+
+def test_flush_updates_cached_users(app, monkeypatch):
+    from Carpool.models import User
+    from Carpool.utils import user_cache
+
+    User(uid="a", email="a@x.com", first_name="a", last_name="a").save()
+    assert User.find_with_email("a@x.com").location is None
+    deleted = []
+    monkeypatch.setattr(user_cache, "delete", deleted.append)
+
+    User.write_locations({"a": {"email": "a@x.com", "lon": 1, "lat": 2, "at": 100.0}})
+    assert deleted == []
+    user_cache._local.clear()
+    user = User.find_with_email("a@x.com")
+    assert user.location["coordinates"] == [1, 2] and user.location_at == 100.0
@@ -0,0 +1,54 @@
+import pytest
+
+
+@pytest.fixture
+def pair(app):
+    from Carpool.models import User, Ride, RideRequest
+
+    driver = User(email="driver@x.com", first_name="d", last_name="d").save()
+    rider = User(email="rider@x.com", first_name="r", last_name="r").save()
+    ride = Ride(by_user=driver, start=0, end=3600, location=[0, 0], destination=[1, 1]).save()
+    req = RideRequest(by_user=rider, at_time=600, before_flex=5, after_flex=5, start=300, end=900,
+                      location=[0, 0.01], destination=[1, 1]).save()
+    return driver, rider, ride, req
+
+
+def _match(driver, rider, ride, req):
+    from Carpool.models import RideMatching
+    return RideMatching(driver=driver, rider=rider, ride=ride, request=req, cost=1)
+
+
+def test_bulk_create_is_idempotent(pair):
+    from Carpool.models import RideMatching
+
+    assert len(RideMatching.bulk_create([_match(*pair)])) == 1
+    assert RideMatching.bulk_create([_match(*pair)]) == []
+    assert RideMatching.objects.count() == 1
+
+
+def test_duplicate_upserts():
+    from pymongo.errors import BulkWriteError
+    from Carpool.models import RideMatching
+
+    details = {'writeErrors': [{'index': 0, 'code': 11000}], 'writeConcernErrors': [],
+               'upserted': [{'index': 1, '_id': 'b'}]}
+    assert RideMatching.duplicate_upserts(BulkWriteError(details)) == {1: 'b'}
+
+    details['writeErrors'].append({'index': 2, 'code': 121})
+    with pytest.raises(BulkWriteError):
+        RideMatching.duplicate_upserts(BulkWriteError(details))
+
+
+def test_dedupe_matchings(pair):
+    from Carpool.migrations import dedupe_matchings, _raw
+    from Carpool.models import RideMatching
+
+    driver, rider, ride, req = pair
+    _raw(RideMatching).insert_many([
+        {'_id': uid, 'ride': ride.pk, 'request': req.pk, 'driver': driver.pk,
+         'rider': rider.pk, 'status': status}
+        for uid, status in [('a', 'pending'), ('b', 'accepted'), ('c', 'rejected')]])
+
+    assert dedupe_matchings() == 2
+    assert [m.uid for m in RideMatching.objects] == ['b']
+    assert RideMatching.bulk_create([_match(*pair)]) == []
@@ -0,0 +1,88 @@
+from threading import Thread
+
+import pytest
+
+from _utils.OrangeDB import Orange
+from _utils.OrangeTypes import SortedSet
+
+
+@pytest.mark.parametrize("storage", ["snapshot", "log"])
+def test_set_of_tuples_reloads(db_path, storage):
+    db = Orange(db_path, storage=storage)
+    db.sadd("s", (1, 2), (3, (4, 5)), "a")
+    db.srem("s", (3, (4, 5)))
+    db.zadd("z", {"m": 1.0})
+    db.dump()
+
+    db = Orange(db_path, storage=storage)
+    assert db.get("s") == {(1, 2), "a"}
+    assert db.get("z") == SortedSet({"m": 1.0})
+
+
+def test_srem_missing_key(db_path):
+    db = Orange(db_path)
+    assert db.srem("missing", 1) == 0
+    assert not db.has("missing")
+
+
+@pytest.mark.parametrize("snapshot_format", ["json", "binary"])
+def test_snapshot_round_trip(db_path, snapshot_format):
+    fields = {f"f{i}": {"n": i} for i in range(20)}
+    db = Orange(db_path, snapshot_format=snapshot_format)
+    db.set("small", {"a": 1})
+    db.set("children", {f"c{i}": {"k": list(range(i))} for i in range(20)})
+    for field, value in fields.items():
+        db.hset("h", field, value)
+    db.dump()
+
+    db = Orange(db_path, snapshot_format=snapshot_format)
+    assert db.get("small") == {"a": 1}
+    assert db.hgetall("h") == fields
+    assert db.get("children")["c3"] == {"k": [0, 1, 2]}
+
+
+def test_binary_copies_are_decoded(db_path):
+    db = Orange(db_path, snapshot_format="binary")
+    for i in range(20):
+        db.hset("h", f"f{i}", [i])
+    db.dump()
+
+    db = Orange(db_path, snapshot_format="binary")
+    lazy = db._db["h"]
+    copies = [dict(lazy), {**lazy}, lazy.copy(), db.hgetall("h")]
+    for copy in copies:
+        assert type(copy) is dict
+        assert copy["f3"] == [3]
+        assert all(type(value) is list for value in copy.values())
+
+
+def test_forced_dumps_race_background_compactions(db_path, tmp_path):
+    db = Orange(db_path, storage="log", compact_threshold=20)
+    errors = []
+
+    def write(n):
+        try:
+            for i in range(200):
+                db.set(f"w{n}:{i}", i)
+        except Exception as e:
+            errors.append(e)
+
+    def dump():
+        try:
+            for _ in range(50):
+                db.dump()
+        except Exception as e:
+            errors.append(e)
+
+    threads = [Thread(target=write, args=(n,)) for n in range(4)] + [Thread(target=dump) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    db.close()
+
+    assert errors == []
+    assert not list(tmp_path.glob("*.tmp"))
+    db = Orange(db_path, storage="log")
+    assert len(db.keys()) == 800
+    assert db.get("w3:199") == 199
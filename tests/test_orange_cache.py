@@ -0,0 +1,103 @@
+import time
+
+import pytest
+
+from _utils.OrangeCache import ExpiryTable
+from _utils.OrangeDB import Orange
+
+
+def test_expiry_heap_is_compacted():
+    table = ExpiryTable()
+    table.set(["a"], "live", 1000)
+    for i in range(1000):
+        table.set([], "key", i)
+    assert len(table) == 2
+    assert len(table._heap) <= 4
+
+    table.discard([], "key")
+    table.discard_prefix(["a"])
+    assert len(table) == 0
+    assert table._heap == []
+    assert table.next_due() is None
+
+
+def test_compacted_heap_keeps_due_order():
+    table = ExpiryTable()
+    for i in range(10):
+        table.set([], f"k{i}", 10 - i)
+        table.set([], f"k{i}", 20 + i)
+    assert table.next_due() == 20
+    assert table.pop_due(22) == [((), "k0"), ((), "k1"), ((), "k2")]
+    assert len(table) == 7
+
+
+def test_ttl_expires_keys(db_path):
+    db = Orange(db_path, expire_interval=60)
+    db.set("a", 1, ttl=0.05)
+    db.set("b", 2, ttl=60)
+    db.set("c", 3)
+    assert 0 < db.ttl("a") <= 0.05
+    assert db.ttl("c") == -1
+
+    time.sleep(0.06)
+    assert db.purge() == 1
+    assert not db.has("a")
+    assert db.ttl("a") == -2
+    assert db.persist("b")
+    assert db.ttl("b") == -1
+    assert db.stats()["expirations"] == 1
+
+
+def test_ttl_expires_in_the_background(db_path):
+    db = Orange(db_path, expire_interval=0.01)
+    db.set("a", 1, ttl=0.02)
+    deadline = time.time() + 2
+    while db.has("a") and time.time() < deadline:
+        time.sleep(0.01)
+    assert not db.has("a")
+
+
+def test_set_without_ttl_keeps_the_key(db_path):
+    db = Orange(db_path, expire_interval=60)
+    db.set("a", 1, ttl=0.01)
+    db.set("a", 2)
+    time.sleep(0.02)
+    assert db.purge() == 0
+    assert db.get("a") == 2
+
+
+def test_lru_evicts_least_recently_used(db_path):
+    db = Orange(db_path, max_entries=2, eviction="lru")
+    db.set("a", 1)
+    db.set("b", 2)
+    db.get("a")
+    db.set("c", 3)
+    assert sorted(db.keys()) == ["a", "c"]
+    assert db.stats()["evictions"] == 1
+
+
+def test_lfu_evicts_least_frequently_used(db_path):
+    db = Orange(db_path, max_entries=3, eviction="lfu")
+    db.set("a", 1)
+    db.set("b", 2)
+    db.set("c", 3)
+    db.get("a")
+    db.get("c")
+    # b and d are both used once, ties are broken by age
+    db.set("d", 4)
+    assert sorted(db.keys()) == ["a", "c", "d"]
+
+    db.get("a")
+    db.set("e", 5)
+    assert sorted(db.keys()) == ["a", "c", "e"]
+    assert db.stats()["evictions"] == 2
+
+
+@pytest.mark.parametrize("eviction", ["lru", "lfu"])
+def test_max_bytes_evicts(db_path, eviction):
+    db = Orange(db_path, max_bytes=100, eviction=eviction)
+    for i in range(10):
+        db.set(f"k{i}", "x" * 30)
+    assert db.stats()["bytes"] <= 100
+    assert db.has("k9")
+    assert not db.has("k0")
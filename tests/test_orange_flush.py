@@ -0,0 +1,79 @@
+import time
+
+import pytest
+
+import _utils.OrangeDB as OrangeDB
+from _utils.OrangeDB import Orange
+
+
+def _on_disk(db_path, storage):
+    return dict(Orange(db_path, storage=storage).items())
+
+
+@pytest.mark.parametrize("storage", ["snapshot", "log"])
+def test_flush_every(db_path, storage):
+    db = Orange(db_path, storage=storage, flush_every=3)
+    db.set("a", 1)
+    db.set("b", 2)
+    assert _on_disk(db_path, storage) == {}
+
+    db.set("c", 3)
+    assert _on_disk(db_path, storage) == {"a": 1, "b": 2, "c": 3}
+
+
+@pytest.mark.parametrize("storage", ["snapshot", "log"])
+def test_flush_interval(db_path, storage):
+    db = Orange(db_path, storage=storage, flush_interval=100)
+    db.set("a", 1)
+    assert _on_disk(db_path, storage) == {}
+
+    deadline = time.time() + 2
+    while not _on_disk(db_path, storage) and time.time() < deadline:
+        time.sleep(0.02)
+    assert _on_disk(db_path, storage) == {"a": 1}
+    db.close()
+
+
+def test_interval_coalesces_writes(db_path, monkeypatch):
+    writes = []
+    atomic_write = OrangeDB._atomic_write
+    monkeypatch.setattr(OrangeDB, "_atomic_write", lambda *args: writes.append(args) or atomic_write(*args))
+
+    db = Orange(db_path, flush_interval=10000)
+    for i in range(50):
+        db.set(f"k{i}", i)
+    assert writes == []
+    db.close()
+    assert len(writes) == 1
+    assert len(_on_disk(db_path, "snapshot")) == 50
+
+
+def test_setm_writes_once(db_path, monkeypatch):
+    writes = []
+    atomic_write = OrangeDB._atomic_write
+    monkeypatch.setattr(OrangeDB, "_atomic_write", lambda *args: writes.append(args) or atomic_write(*args))
+
+    db = Orange(db_path)
+    db.setm(("a", 1), ("b", 2), ("c", 3))
+    assert len(writes) == 1
+    assert _on_disk(db_path, "snapshot") == {"a": 1, "b": 2, "c": 3}
+
+
+@pytest.mark.parametrize("storage", ["snapshot", "log"])
+def test_flush_is_a_barrier(db_path, storage):
+    db = Orange(db_path, storage=storage, flush_every=100)
+    db.set("a", 1)
+    assert _on_disk(db_path, storage) == {}
+    db.flush()
+    assert _on_disk(db_path, storage) == {"a": 1}
+
+
+@pytest.mark.parametrize("storage", ["snapshot", "log"])
+def test_block_defers_writes(db_path, storage):
+    db = Orange(db_path, storage=storage)
+    with db:
+        db.set("a", 1)
+        with db:
+            db.set("b", 2)
+        assert _on_disk(db_path, storage) == {}
+    assert _on_disk(db_path, storage) == {"a": 1, "b": 2}
@@ -0,0 +1,104 @@
+import pytest
+
+from _utils.OrangeDB import Orange
+
+
+def _scan(db, **fields):
+    """ find without indexes, the reference for the indexed lookups """
+    return {key: value for key, value in db.items()
+            if all(isinstance(value, dict) and value.get(f) == v for f, v in fields.items())}
+
+
+@pytest.fixture
+def db(db_path):
+    db = Orange(db_path)
+    db.set("u1", {"city": "a", "age": 30})
+    db.set("u2", {"city": "b", "age": 20})
+    db.set("u3", {"city": "a", "age": 40})
+    db.set("n", 1)
+    db.create_index("city")
+    db.create_index("age", kind="sorted")
+    return db
+
+
+def _index(db, field, path=()):
+    index = db._indexes_for(list(path))[field]
+    assert not index.stale
+    return index
+
+
+def test_find_by_index(db):
+    assert set(db.find(city="a")) == {"u1", "u3"}
+    assert list(db.find(range=("age", 25, None))) == ["u1", "u3"]
+    assert list(db.find(range=("age", None, None), city="a")) == ["u1", "u3"]
+    assert db.find(city="a", age=40) == {"u3": {"city": "a", "age": 40}}
+
+
+def test_set_updates_the_index(db):
+    _index(db, "city")
+    db.set("u1", {"city": "b", "age": 30})
+    db.set("u4", {"city": "c", "age": 10})
+    db.set("u3", "not a dictionary")
+
+    assert _index(db, "city").lookup("a") == set()
+    assert _index(db, "city").lookup("b") == {"u1", "u2"}
+    assert list(db.find(range=("age", None, 25))) == ["u4", "u2"]
+    for city in "abc":
+        assert db.find(city=city) == _scan(db, city=city)
+
+
+def test_pop_and_delete_update_the_index(db):
+    _index(db, "city")
+    db.pop("u1")
+    db.delete("u2")
+    assert _index(db, "city").lookup("a") == {"u3"}
+    assert _index(db, "city").lookup("b") == set()
+    assert list(db.find(range=("age", None, None))) == ["u3"]
+
+
+def test_child_updates_reindex_the_parent(db):
+    _index(db, "city")
+    db.child("u1").set("city", "c")
+    db.hset("u2", "age", 50)
+    db.hdel("u3", "city")
+
+    assert _index(db, "city").lookup("c") == {"u1"}
+    assert _index(db, "city").lookup("a") == set()
+    assert list(db.find(range=("age", 35, None))) == ["u3", "u2"]
+
+
+def test_index_of_a_child(db_path):
+    db = Orange(db_path)
+    users = db.child("users")
+    users.set("u1", {"city": "a"})
+    users.create_index("city")
+    users.set("u2", {"city": "a"})
+    assert set(users.find(city="a")) == {"u1", "u2"}
+
+    # replacing the subtree marks the child index stale, it is rebuilt on use
+    db.set("users", {"u3": {"city": "a"}})
+    assert set(users.find(city="a")) == {"u3"}
+    users.clear()
+    assert users.find(city="a") == {}
+
+
+def test_index_is_rebuilt_after_reload(db_path):
+    db = Orange(db_path, storage="log")
+    db.create_index("city")
+    db.set("u1", {"city": "a"})
+    assert set(db.find(city="a")) == {"u1"}
+
+    db.set("u2", {"city": "a"})
+    db._load()
+    assert set(db.find(city="a")) == {"u1", "u2"}
+
+
+def test_drop_index_falls_back_to_a_scan(db):
+    assert db.drop_index("city")
+    assert not db.drop_index("city")
+    assert set(db.find(city="a")) == {"u1", "u3"}
+
+
+def test_unknown_index_kind(db):
+    with pytest.raises(ValueError):
+        db.create_index("city", kind="btree")
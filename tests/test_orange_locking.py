@@ -0,0 +1,111 @@
+import multiprocessing
+from threading import Thread
+
+import pytest
+
+from _utils.OrangeDB import Orange
+
+
+def _increment(db_path, storage, times):
+    db = Orange(db_path, storage=storage, concurrency="process")
+    for _ in range(times):
+        db.incrby("count", 1)
+    db.close()
+
+
+@pytest.mark.parametrize("storage", ["snapshot", "log"])
+def test_threads_increment_exactly(db_path, storage):
+    db = Orange(db_path, storage=storage, concurrency="thread")
+    db.set("count", 0)
+
+    def increment():
+        for _ in range(200):
+            db.incrby("count", 1)
+
+    threads = [Thread(target=increment) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert db.get("count") == 1600
+    db.close()
+    assert Orange(db_path, storage=storage).get("count") == 1600
+
+
+def test_threads_setnx_once(db_path):
+    db = Orange(db_path, concurrency="thread")
+    won = []
+
+    def claim(n):
+        if db.setnx("owner", n):
+            won.append(n)
+
+    threads = [Thread(target=claim, args=(n,)) for n in range(16)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(won) == 1
+    assert db.get("owner") == won[0]
+
+
+def test_readers_wait_for_the_writer(db_path):
+    db = Orange(db_path, concurrency="thread")
+    db.setm(("a", 0), ("b", 0))
+    torn = []
+
+    def write():
+        for i in range(1, 300):
+            with db._lock:
+                db.set("a", i)
+                db.set("b", i)
+
+    def read():
+        for _ in range(300):
+            with db._lock.read():
+                if db.get("a") != db.get("b"):
+                    torn.append(1)
+
+    threads = [Thread(target=write), Thread(target=read), Thread(target=read)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert torn == []
+
+
+@pytest.mark.parametrize("storage", ["snapshot", "log"])
+def test_processes_increment_exactly(db_path, storage):
+    Orange(db_path, storage=storage, concurrency="process").set("count", 0)
+
+    context = multiprocessing.get_context("fork")
+    processes = [context.Process(target=_increment, args=(db_path, storage, 50)) for _ in range(4)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    assert [process.exitcode for process in processes] == [0] * 4
+    assert Orange(db_path, storage=storage).get("count") == 200
+
+
+@pytest.mark.parametrize("storage", ["snapshot", "log"])
+def test_process_mode_reloads_changes(db_path, storage):
+    reader = Orange(db_path, storage=storage, concurrency="process", check_interval=0)
+    writer = Orange(db_path, storage=storage, concurrency="process")
+    writer.set("a", 1)
+    assert reader.get("a") == 1
+
+    writer.set("a", 2)
+    child = reader.child("c")
+    writer.child("c").set("k", "v")
+    assert reader.get("a") == 2
+    assert child.get("k") == "v"
+
+
+def test_process_mode_checks_at_most_every_interval(db_path):
+    reader = Orange(db_path, concurrency="process", check_interval=60)
+    reader.get("a")
+    Orange(db_path, concurrency="process").set("a", 1)
+    assert reader.get("a") is None
+    assert reader.refresh()
+    assert reader.get("a") == 1
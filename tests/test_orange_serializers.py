@@ -0,0 +1,93 @@
+import pytest
+
+import _utils.OrangeSerializers as OrangeSerializers
+from _utils.OrangeDB import Orange, migrate
+from _utils.OrangeTypes import SortedSet
+
+FORMATS = ["json", "msgpack", "binary"]
+COMPRESSIONS = [None, "gzip", "zstd"]
+MAGIC = {"gzip": b"\x1f\x8b", "zstd": b"\x28\xb5\x2f\xfd", "msgpack": b"ORANGE\x00\x02",
+         "binary": b"ORANGE\x00\x01", "json": b"{"}
+
+VALUES = {
+    "int": 1,
+    "text": "grüße",
+    "list": [1, 2.5, None, True],
+    "set": {1, (2, 3)},
+    "zset": SortedSet({"a": 1.0, "b": 2.0}),
+    "bytes": b"\x00\xff",
+    "nested": {f"c{i}": {"k": list(range(i))} for i in range(20)},
+}
+
+
+def _magic(db_path):
+    with open(db_path, "rb") as f:
+        return f.read(8)
+
+
+@pytest.mark.parametrize("compression", COMPRESSIONS)
+@pytest.mark.parametrize("snapshot_format", FORMATS)
+def test_round_trip(db_path, snapshot_format, compression):
+    db = Orange(db_path, snapshot_format=snapshot_format, compression=compression)
+    for key, value in VALUES.items():
+        db.set(key, value, dump=False)
+    db.dump()
+
+    header = MAGIC[compression or snapshot_format]
+    assert _magic(db_path)[:len(header)] == header
+    # the format and the compression are detected on load
+    db = Orange(db_path)
+    for key, value in VALUES.items():
+        assert db.get(key) == value
+
+
+def test_msgpack_keeps_tuples(db_path):
+    db = Orange(db_path, snapshot_format="msgpack")
+    db.set("t", (1, (2, "a")))
+    db = Orange(db_path)
+    assert db.get("t") == (1, (2, "a"))
+
+
+@pytest.mark.parametrize("storage", ["snapshot", "log"])
+def test_migrate(db_path, storage):
+    db = Orange(db_path, storage=storage)
+    for key, value in VALUES.items():
+        db.set(key, value)
+    db.set("ttl", 1, ttl=60)
+    db.close()
+
+    assert migrate(db_path, "msgpack", "zstd", storage=storage)
+    assert _magic(db_path)[:4] == MAGIC["zstd"]
+
+    db = Orange(db_path, storage=storage)
+    assert db.get("set") == VALUES["set"]
+    assert db.get("nested") == VALUES["nested"]
+    assert 0 < db.ttl("ttl") <= 60
+
+    # later dumps keep the migrated format
+    db.migrate("binary")
+    db.set("more", 2)
+    db.dump()
+    assert _magic(db_path) == MAGIC["binary"]
+    assert Orange(db_path, storage=storage).get("more") == 2
+
+
+def test_journal_stays_json(db_path):
+    db = Orange(db_path, storage="log", snapshot_format="msgpack", compression="gzip")
+    db.set("a", {1, 2})
+    db.flush()
+    with open(db_path + ".journal") as f:
+        assert '"o": "set"' in f.readline()
+    assert Orange(db_path, storage="log").get("a") == {1, 2}
+
+
+@pytest.mark.parametrize("kwargs", [{"snapshot_format": "xml"}, {"compression": "lz4"}])
+def test_unknown_codecs(db_path, kwargs):
+    with pytest.raises(ValueError):
+        Orange(db_path, **kwargs)
+
+
+def test_missing_package(db_path, monkeypatch):
+    monkeypatch.setattr(OrangeSerializers.ZstdCompressor, "available", False)
+    with pytest.raises(ValueError, match="zstandard"):
+        Orange(db_path, compression="zstd")
@@ -0,0 +1,109 @@
+import json
+import time
+
+import fakeredis
+import pytest
+
+
+@pytest.fixture
+def outbox():
+    from _utils.Outbox import Outbox
+    return Outbox(fakeredis.FakeRedis())
+
+
+def test_messages_wait_for_ack(outbox):
+    outbox.enqueue("sms", {"to": "+1", "body": "first"})
+    outbox.enqueue("sms", {"to": "+1", "body": "second"})
+
+    item, message = outbox.pop("w1")
+    assert message == {"kind": "sms", "payload": {"to": "+1", "body": "first"}, "attempts": 0}
+    assert len(outbox) == 1
+
+    # w1 died before acknowledging, w2 is alive
+    outbox.heartbeat("w2", 60)
+    assert outbox.pop("w2")[1]["payload"]["body"] == "second"
+    assert outbox.requeue_orphans() == 1
+    assert outbox.pop("w2", timeout=1)[1]["payload"]["body"] == "first"
+    assert outbox.requeue_orphans() == 0
+
+
+def test_duplicates_are_dropped(outbox):
+    assert outbox.enqueue("sms", {"to": "+1", "body": "hi"})
+    assert not outbox.enqueue("sms", {"body": "hi", "to": "+1"})
+    assert outbox.enqueue("sms", {"to": "+2", "body": "hi"})
+    assert outbox.enqueue("push", {"to": "+1", "body": "hi"})
+    assert len(outbox) == 3
+
+
+def test_ack(outbox):
+    outbox.enqueue("sms", {"to": "+1", "body": "hi"})
+    item, message = outbox.pop("w1")
+    outbox.ack("w1", item)
+    assert outbox.requeue_orphans() == 0
+    assert outbox.pop("w1", timeout=1) is None
+
+
+def test_worker_delivers_and_retries(outbox):
+    from _utils.Outbox import OutboxWorker
+
+    sent = []
+
+    def send(payload):
+        sent.append(payload["body"])
+        if len(sent) == 1:
+            raise RuntimeError("twilio is down")
+
+    outbox.enqueue("sms", {"to": "+1", "body": "hi"})
+    worker = OutboxWorker(outbox, {"sms": send}, backoff=0.01)
+    worker.start()
+    deadline = time.time() + 5
+    while len(sent) < 2 and time.time() < deadline:
+        time.sleep(0.01)
+    worker.stop()
+    worker.join()
+
+    assert sent == ["hi", "hi"]
+    assert outbox.requeue_orphans() == 0
+
+
+def test_worker_reports_dropped_messages():
+    from _utils.Outbox import Outbox, OutboxWorker
+
+    outbox = Outbox(fakeredis.FakeRedis(), dedup_window=None)
+    assert outbox.enqueue("sms", {"to": "+1", "body": "hi"})
+    assert outbox.enqueue("sms", {"to": "+1", "body": "hi"})
+
+    def send(payload):
+        raise RuntimeError("twilio is down")
+
+    failed = []
+    worker = OutboxWorker(outbox, {"sms": send}, max_attempts=1, on_fail=failed.append)
+    worker.start()
+    deadline = time.time() + 5
+    while len(failed) < 2 and time.time() < deadline:
+        time.sleep(0.01)
+    worker.stop()
+    worker.join()
+
+    assert [message["payload"]["body"] for message in failed] == ["hi", "hi"]
+
+
+def test_worker_dispatches_by_kind(outbox):
+    from _utils.Outbox import OutboxWorker
+
+    ran = []
+    outbox.enqueue("unknown", {"n": 0})
+    outbox.enqueue("sms", {"n": 1})
+    outbox.enqueue("refresh", {"n": 2})
+    worker = OutboxWorker(outbox, {"sms": lambda p: ran.append(("sms", p["n"])),
+                                   "refresh": lambda p: ran.append(("refresh", p["n"]))})
+    worker.start()
+    deadline = time.time() + 5
+    while len(ran) < 2 and time.time() < deadline:
+        time.sleep(0.01)
+    worker.stop()
+    worker.join()
+
+    assert ran == [("sms", 1), ("refresh", 2)]
+    # jobs without a handler go straight to the dead letter list
+    assert [json.loads(item)["kind"] for item in outbox._redis.lrange(outbox._dead, 0, -1)] == ["unknown"]
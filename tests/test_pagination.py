@@ -0,0 +1,82 @@
+import pytest
+
+# uids are random, the pages follow the start times with the uid breaking ties
+STARTS = {"r6": 0, "r2": 1, "r5": 1, "r0": 2, "r4": 3, "r1": 4, "r3": 5}
+ORDER = ["r6", "r2", "r5", "r0", "r4", "r1", "r3"]
+
+
+@pytest.fixture
+def rides(app, monkeypatch):
+    from Carpool import routes
+    from Carpool.models import User, Ride
+
+    user = User(email="ann@x.com", first_name="a", last_name="a").save()
+    for uid, start in STARTS.items():
+        Ride(uid=uid, by_user=user, start=start, end=start + 1, location=[0, 0], destination=[1, 1]).save()
+    monkeypatch.setattr(routes, "DEFAULT_PAGE_SIZE", 3)
+    monkeypatch.setattr(routes, "MAX_PAGE_SIZE", 5)
+    return app.test_client()
+
+
+def _uids(response):
+    return [ride["uid"] for ride in response.get_json()]
+
+
+def test_default_page_size(rides):
+    response = rides.get("/user/ann@x.com/ride")
+    assert _uids(response) == ORDER[:3]
+    cursor = response.headers["X-Next-Cursor"]
+    response = rides.get(f"/user/ann@x.com/ride?after={cursor}&limit=2")
+    assert _uids(response) == ORDER[3:5]
+
+
+def test_cursor_breaks_ties_on_uid(rides):
+    cursor = rides.get("/user/ann@x.com/ride?limit=2").headers["X-Next-Cursor"]
+    assert _uids(rides.get(f"/user/ann@x.com/ride?after={cursor}&limit=2")) == ["r5", "r0"]
+
+
+def test_max_page_size(rides):
+    assert len(_uids(rides.get("/user/ann@x.com/ride?limit=100"))) == 5
+    assert _uids(rides.get("/user/ann@x.com/ride?stream=1")) == ORDER
+
+
+def test_stream_after_cursor(rides, monkeypatch):
+    from Carpool import routes
+
+    monkeypatch.setattr(routes, "STREAM_CHUNK_SIZE", 2)
+    cursor = rides.get("/user/ann@x.com/ride?limit=2").headers["X-Next-Cursor"]
+    assert _uids(rides.get(f"/user/ann@x.com/ride?stream=1&after={cursor}")) == ORDER[2:]
+
+
+@pytest.mark.parametrize("query", ["limit=0", "limit=-1", "after=r2"])
+def test_invalid_arguments(rides, query):
+    assert rides.get(f"/user/ann@x.com/ride?{query}").status_code == 400
+
+
+def test_async_pages_follow_the_same_order(rides, monkeypatch):
+    import asyncio
+    from Carpool import async_models, models
+    from Carpool.models import User, Ride
+
+    # motor is not available here, the async reads go through mongomock
+    async def find(document, query, sort=None, limit=None):
+        cursor = document._get_collection().find(query)
+        cursor = cursor.sort(sort) if sort else cursor
+        return [document._from_son(doc) for doc in (cursor.limit(limit) if limit else cursor)]
+
+    async def load(document, ids):
+        return models._load(document, ids)
+
+    monkeypatch.setattr(async_models, "_find", find)
+    monkeypatch.setattr(async_models, "_load", load)
+
+    loop = asyncio.get_event_loop()
+    user = User.find_with_email("ann@x.com")
+    pages, after = [], None
+    while True:
+        items = loop.run_until_complete(async_models.page(*async_models.user_rides(user), limit=3, after=after))
+        pages.append([item["uid"] for item in items])
+        if len(items) < 3:
+            break
+        after = models.page_cursor(Ride, items[-1])
+    assert pages == [ORDER[:3], ORDER[3:6], ORDER[6:]]
@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+from geopy import distance
+
+from _utils.Pricing import haversine_many, trip_lengths, trip_costs, cost_matrix, flat_pricing
+
+
+@pytest.fixture
+def trips():
+    rng = np.random.RandomState(0)
+    locations = np.c_[rng.uniform(-180, 180, 500), rng.uniform(-80, 80, 500)]
+    destinations = locations + rng.normal(0, 0.5, (500, 2))
+    destinations[:, 1] = destinations[:, 1].clip(-89, 89)
+    return locations, destinations
+
+
+def test_haversine_matches_geopy(trips):
+    locations, destinations = trips
+    lengths = trip_lengths(locations, destinations)
+
+    great_circle = np.array([distance.great_circle((a[1], a[0]), (b[1], b[0])).km
+                             for a, b in zip(locations, destinations)])
+    geodesic = np.array([distance.geodesic((a[1], a[0]), (b[1], b[0])).km
+                         for a, b in zip(locations, destinations)])
+
+    assert np.allclose(lengths, great_circle, rtol=1e-6)
+    # the sphere is off the ellipsoid by at most about half a percent
+    assert np.all(np.abs(lengths - geodesic) <= 0.006 * geodesic)
+
+
+def test_haversine_broadcasts(trips):
+    locations, destinations = trips
+    matrix = haversine_many(locations[:5, 0, None], locations[:5, 1, None],
+                            destinations[None, :3, 0], destinations[None, :3, 1])
+    assert matrix.shape == (5, 3)
+    assert np.allclose(matrix[2], haversine_many(locations[2, 0], locations[2, 1],
+                                                 destinations[:3, 0], destinations[:3, 1]))
+
+
+def test_cost_matrix_pairs():
+    rides = {'location': [[0, 0], [10, 10]], 'destination': [[1, 1], [11, 11]], 'start': [0, 600]}
+    requests = {'location': [[0, 0.01], [10, 10.01], [5, 5]], 'destination': [[1, 1], [11, 11], [6, 6]],
+                'start': [0, 0, 0], 'time': [300, 900, 0]}
+    pickup, costs = cost_matrix(rides, requests)
+    assert pickup.shape == costs.shape == (2, 3)
+
+    trip = trip_lengths(requests['location'], requests['destination'])
+    for i in range(2):
+        for j in range(3):
+            detour = (haversine_many(*rides['location'][i], *requests['location'][j]) +
+                      haversine_many(*requests['destination'][j], *rides['destination'][i])) / 1000
+            wait = abs(requests['time'][j] - max(rides['start'][i], requests['start'][j])) / 60
+            assert costs[i, j] == pytest.approx(flat_pricing(trip[j], detour, wait))
+
+
+def test_pricing_is_pluggable():
+    costs = trip_costs([[0, 0]], [[1, 0]], pricing=lambda trip, detour, wait: trip * 2)
+    assert costs[0] == pytest.approx(2 * distance.great_circle((0, 0), (0, 1)).km, rel=1e-6)
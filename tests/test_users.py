@@ -0,0 +1,27 @@
+def _register(client, email):
+    return client.post("/user", json={"email": email, "first_name": "ann", "last_name": "lee",
+                                      "phone_number": "5550100"})
+
+
+def test_register_conflict(app):
+    client = app.test_client()
+    assert _register(client, "Ann@x.com").status_code == 200
+    assert _register(client, "ann@X.com").status_code == 409
+    assert client.get("/user/ANN@x.com").get_json()["email"] == "ann@x.com"
+
+
+def test_normalize_emails(app):
+    from Carpool.migrations import normalize_emails, _raw
+    from Carpool.models import User, Ride
+
+    _raw(User).insert_many([
+        {'_id': 'a', 'email': 'Ann@x.com', 'first_name': 'a', 'last_name': 'a'},
+        {'_id': 'b', 'email': 'ann@x.com', 'first_name': 'b', 'last_name': 'b'},
+        {'_id': 'c', 'email': 'Bob@x.com', 'first_name': 'c', 'last_name': 'c'},
+    ])
+    _raw(Ride).insert_one({'_id': 'r', 'by_user': 'a', 'start': 0, 'end': 1})
+
+    assert normalize_emails() == 1
+    assert {(u.uid, u.email) for u in User.objects} == {('b', 'ann@x.com'), ('c', 'bob@x.com')}
+    assert Ride.objects.get(uid='r').by_user.uid == 'b'
+    assert User.find_with_email('BOB@x.com').uid == 'c'
@@ -0,0 +1,4 @@
+from Carpool import create_app
+
+# served by gunicorn -c gunicorn.conf.py wsgi:app
+app = create_app()